@@ -0,0 +1,135 @@
+# access_log.py (logs estruturados e amostrados de acesso, sem bloquear o worker)
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_app_context, request
+from pymongo import monitoring
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", 1.0))
+# preview do corpo só quando explicitamente ligado (lê o corpo da requisição)
+ACCESS_LOG_BODY = os.getenv("ACCESS_LOG_BODY", "false").lower() in ("1", "true", "yes")
+BODY_PREVIEW_CHARS = 500
+
+access_logger = logging.getLogger("notes.access")
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro; campos extras vão em `record.fields`."""
+
+    def format(self, record):
+        doc = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            doc.update(fields)
+        if record.exc_info:
+            doc["exc"] = self.formatException(record.exc_info)
+        return json.dumps(doc, default=str)
+
+
+def configure_logging(level=None, stream=None):
+    """
+    Configura o logging do processo: nível vindo de LOG_LEVEL e um QueueHandler na raiz,
+    cujo QueueListener (thread própria) faz a escrita. O worker só enfileira.
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(level or LOG_LEVEL)
+    if _listener is not None:
+        return _listener
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    root.addHandler(QueueHandler(log_queue))
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Esvazia a fila e para a thread de escrita (chamado no exit do processo/worker)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# ---------------------------------------------------------------------
+# Tempo gasto em dependências durante a requisição
+# ---------------------------------------------------------------------
+def add_timing(kind, seconds):
+    """Acumula o tempo (e o número de chamadas) de `kind` ("mongo", "upstream") na requisição atual."""
+    if not has_app_context():
+        return
+    timings = g.setdefault("dependency_timings", {})
+    total, calls = timings.get(kind, (0.0, 0))
+    timings[kind] = (total + seconds, calls + 1)
+
+
+class MongoTimingListener(monitoring.CommandListener):
+    """Soma a duração de cada comando do Mongo na requisição em que ele rodou."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        add_timing("mongo", event.duration_micros / 1e6)
+
+    def failed(self, event):
+        add_timing("mongo", event.duration_micros / 1e6)
+
+
+def should_log(status):
+    return status >= 500 or ACCESS_LOG_SAMPLE_RATE >= 1.0 or random.random() < ACCESS_LOG_SAMPLE_RATE
+
+
+def log_access(method, path, status, latency, timings=None, **extra):
+    if not access_logger.isEnabledFor(logging.INFO) or not should_log(status):
+        return
+    fields = {
+        "type": "access",
+        "method": method,
+        "path": path,
+        "status": status,
+        "latency_ms": round(latency * 1000, 3),
+    }
+    for kind, (total, calls) in (timings or {}).items():
+        fields[f"{kind}_ms"] = round(total * 1000, 3)
+        fields[f"{kind}_calls"] = calls
+    fields.update(extra)
+    access_logger.info("%s %s %s", method, path, status, extra={"fields": fields})
+
+
+def init_app(app):
+    """Registra os hooks de access log no app Flask."""
+
+    @app.before_request
+    def _start_access_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _log_access(response):
+        if request.method == "OPTIONS":
+            return response
+        started = g.get("request_started")
+        latency = time.perf_counter() - started if started is not None else 0.0
+        extra = {}
+        if ACCESS_LOG_BODY and request.content_length:
+            extra["body_preview"] = request.get_data(cache=True, as_text=True)[:BODY_PREVIEW_CHARS]
+        log_access(request.method, request.path, response.status_code, latency, g.get("dependency_timings"), **extra)
+        return response
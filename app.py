@@ -1,35 +1,88 @@
 # app.py (notes service - versão ajustada)
+import atexit
+import logging
+import math
 import os
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, make_response
+from flask import Blueprint, Flask, current_app, request, jsonify, make_response, Response, stream_with_context, g, has_request_context
 from flask_pymongo import PyMongo
 from bson.objectid import ObjectId
 from bson.errors import InvalidId
-from pymongo import ReturnDocument
 from flask_cors import CORS
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import time
-import logging
+import hmac
+from concurrent.futures import ThreadPoolExecutor
 
+import access_log
+import json_provider
+import metrics
 from auth import requires_auth, register_auth_error_handlers
+from task_cache import TaskValidationCache
+from singleflight import SingleFlight
+from circuit_breaker import CircuitBreaker
+from task_sync import TaskSnapshotSync, build_task_snapshot
+from task_verifier import UnverifiedNotesVerifier
+from idempotency import IdempotencyEngine, REPLAY, IN_PROGRESS, RESOURCE_FIELD, record_id
+from search import NoteSearch, TextIndexUnavailable
+import migrations
+from change_markers import NOTES_MARKER, compute_etag, task_marker
+from storage import create_stores, first_present
+from write_behind import WriteBehindNotesStore
 
 # ---------------------------------------------------------------------
 # Configuração inicial
 # ---------------------------------------------------------------------
 load_dotenv()
-app = Flask(__name__)
 
-# logging
-logging.basicConfig(level=logging.DEBUG)
-app.logger.setLevel(logging.DEBUG)
+# Sob o gunicorn (gunicorn.conf.py) o import pode acontecer no master, antes do fork (preload):
+# com NOTES_WORKER_INIT=post_fork, o que não sobrevive a um fork (MongoClient, sessões HTTP,
+# threads de fundo e a thread do logging) só é criado em init_worker(), no post_fork de cada worker.
+NOTES_WORKER_INIT = os.getenv("NOTES_WORKER_INIT", "import").lower()
+
+logger = logging.getLogger(__name__)  # o mesmo logger de app.logger (nome do app)
+
+# rotas do serviço; o app Flask é montado em create_app()
+bp = Blueprint("notes", __name__)
+
+# ---------------------------------------------------------------------
+# Configuração do MongoDB (o MongoClient é criado por processo em init_worker)
+# ---------------------------------------------------------------------
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/notesdb")
+# conexões por worker: gunicorn.conf.py ajusta ao número de threads/greenlets quando não definido
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+mongo = PyMongo()
 
 # ---------------------------------------------------------------------
-# Configuração do MongoDB
+# Armazenamento (ver storage.py): "mongo" (padrão) ou "memory" (testes de carga sem banco)
 # ---------------------------------------------------------------------
-app.config["MONGO_URI"] = os.getenv("MONGO_URI", "mongodb://localhost:27017/notesdb")
-mongo = PyMongo(app)
+NOTES_STORAGE = os.getenv("NOTES_STORAGE", "mongo").lower()
+
+# Write-behind opcional de PUT/DELETE (ver write_behind.py): escritas coalescidas por nota e
+# gravadas em lote; leituras do worker veem as pendentes. Desligado por padrão.
+NOTES_WRITE_BEHIND = os.getenv("NOTES_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+NOTES_WRITE_BEHIND_INTERVAL = float(os.getenv("NOTES_WRITE_BEHIND_INTERVAL", 0.5))
+NOTES_WRITE_BEHIND_MAX_PENDING = int(os.getenv("NOTES_WRITE_BEHIND_MAX_PENDING", 500))
+
+def _write_behind(store):
+    if not NOTES_WRITE_BEHIND:
+        return store
+    return WriteBehindNotesStore(store, interval=NOTES_WRITE_BEHIND_INTERVAL,
+                                 max_pending=NOTES_WRITE_BEHIND_MAX_PENDING, on_flush=metrics.write_behind_flush)
+
+def flush_pending_writes():
+    """Grava a fila do write-behind (saída do worker: worker_exit no gunicorn e atexit)."""
+    if isinstance(notes_store, WriteBehindNotesStore):
+        try:
+            notes_store.close()
+        except Exception as e:
+            logger.error("Write-behind: escritas pendentes não gravadas na saída: %s", e)
+
+notes_store, snapshot_store, idempotency_store = create_stores(NOTES_STORAGE, get_db=lambda: mongo.db)
+notes_store = _write_behind(notes_store)
+atexit.register(flush_pending_writes)
 
 # URL do tasks-service (respeita env TASKS_SERVICE_URL)
 TASKS_SERVICE_URL = os.getenv("TASKS_SERVICE_URL", os.getenv("TASKS_URL", "http://localhost:8080")).rstrip("/")
@@ -44,23 +97,10 @@ if _raw_origins == "*" or _raw_origins.lower() == "any":
 else:
     cors_origins = [o.strip() for o in _raw_origins.split(",") if o.strip()]
 
-CORS(
-    app,
-    resources={r"/*": {"origins": cors_origins}},
-    supports_credentials=True,
-    methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "Accept", "Idempotency-Key"],
-)
-
-# ---------------------------------------------------------------------
-# Registro de handlers de erro do Auth0 (assume auth.py presente)
-# ---------------------------------------------------------------------
-register_auth_error_handlers(app)
-
 # ---------------------------------------------------------------------
 # Preflight OPTIONS rápido (responde antes de decorators)
 # ---------------------------------------------------------------------
-@app.before_request
+@bp.before_app_request
 def handle_preflight():
     if request.method != "OPTIONS":
         return None
@@ -85,123 +125,566 @@ def handle_preflight():
     return resp
 
 # ---------------------------------------------------------------------
-# HTTP session com retry para calls ao tasks-service
+# HTTP session para calls ao tasks-service (criada por processo em init_worker)
+# (a validação no caminho da requisição usa retries=0: as novas tentativas ficam em
+#  _fetch_task_from_service, limitadas pelo prazo total da requisição)
 # ---------------------------------------------------------------------
-def make_http_session():
+# conexões mantidas por host; abaixo do nº de threads do worker, as excedentes seriam descartadas
+TASKS_HTTP_POOL_SIZE = int(os.getenv("TASKS_HTTP_POOL_SIZE", 10))
+
+def make_http_session(retries=2):
     session = requests.Session()
-    retries = Retry(total=2, backoff_factor=0.2, status_forcelist=[500,502,503,504], raise_on_status=False)
-    adapter = HTTPAdapter(max_retries=retries)
+    retries = Retry(total=retries, backoff_factor=0.2, status_forcelist=[500,502,503,504], raise_on_status=False)
+    adapter = HTTPAdapter(max_retries=retries, pool_maxsize=TASKS_HTTP_POOL_SIZE)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     return session
 
-_http_session = make_http_session()
+_http_session = None
+
+# ---------------------------------------------------------------------
+# Orçamento de latência + circuit breaker do fallback ao tasks-service
+# ---------------------------------------------------------------------
+# prazo total (s) de uma requisição para falar com o tasks-service, somando tentativas e backoff
+TASKS_DEADLINE = float(os.getenv("TASKS_DEADLINE", 1.5))
+TASKS_TRY_TIMEOUT = float(os.getenv("TASKS_TRY_TIMEOUT", 1.0))
+TASKS_RETRIES = int(os.getenv("TASKS_RETRIES", 2))
+TASKS_RETRY_BACKOFF = float(os.getenv("TASKS_RETRY_BACKOFF", 0.1))
+TASKS_RETRY_STATUSES = (500, 502, 503, 504)
+
+tasks_breaker = CircuitBreaker(
+    "tasks_service",
+    failure_rate=float(os.getenv("TASKS_BREAKER_FAILURE_RATE", 0.5)),
+    min_calls=int(os.getenv("TASKS_BREAKER_MIN_CALLS", 10)),
+    window=float(os.getenv("TASKS_BREAKER_WINDOW", 30)),
+    open_for=float(os.getenv("TASKS_BREAKER_OPEN_FOR", 15)),
+    on_state_change=metrics.breaker_transition,
+)
+
+def tasks_deadline():
+    """
+    Prazo (time.monotonic) para chamadas ao tasks-service. Dentro de uma requisição é um só,
+    contado a partir da primeira chamada e compartilhado por todas as validações dela.
+    """
+    if not has_request_context():
+        return time.monotonic() + TASKS_DEADLINE
+    deadline = g.get("tasks_deadline")
+    if deadline is None:
+        deadline = g.tasks_deadline = time.monotonic() + TASKS_DEADLINE
+    return deadline
+
+def current_author():
+    """`sub` do token verificado por requires_auth (g.current_user), ou None."""
+    return (g.get("current_user") or {}).get("sub")
 
 # ---------------------------------------------------------------------
 # Health / Ready
 # ---------------------------------------------------------------------
-@app.route("/health", methods=["GET"])
+@bp.route("/health", methods=["GET"])
 def health():
     return jsonify({"status": "ok", "service": "notes"}), 200
 
-@app.route("/ready", methods=["GET"])
+@bp.route("/ready", methods=["GET"])
 def ready():
+    # o breaker só é informado: com o tasks-service fora, o worker ainda serve leituras
+    # (e escritas com TASKS_ACCEPT_UNKNOWN), então não sai do balanceador por isso
+    status = {"tasks_service": tasks_breaker.snapshot()}
+    if isinstance(notes_store, WriteBehindNotesStore):
+        status["write_behind"] = notes_store.snapshot()
+    if NOTES_STORAGE != "mongo":
+        return jsonify({"ready": True, **status}), 200
     try:
         mongo.db.command("ping")
-        return jsonify({"ready": True}), 200
+        return jsonify({"ready": True, **status}), 200
     except Exception:
-        return jsonify({"ready": False}), 503
+        return jsonify({"ready": False, **status}), 503
 
 # ---------------------------------------------------------------------
-# Logging: não logar Authorization
+# Cache em processo da validação de tasks (LRU + TTL)
 # ---------------------------------------------------------------------
-@app.before_request
-def log_request_info():
-    if request.method == "OPTIONS":
-        return
-    hdrs = {k: v for k, v in request.headers.items() if k in ("Host", "Origin", "Content-Type")}
-    body_preview = request.get_data(as_text=True)[:500] if request.data else ""
-    app.logger.debug("Incoming request: %s %s headers=%s body_preview=%s", request.method, request.path, hdrs, body_preview)
+task_validation_cache = TaskValidationCache(
+    maxsize=int(os.getenv("TASK_CACHE_MAXSIZE", 4096)),
+    ttl=float(os.getenv("TASK_CACHE_TTL", 60)),
+    negative_ttl=float(os.getenv("TASK_CACHE_NEGATIVE_TTL", 5)),
+    on_evict=metrics.eviction_counter("task_validation"),
+    on_hit=metrics.hit_counter("task_validation"),
+    on_miss=metrics.miss_counter("task_validation"),
+)
+
+# lookups em andamento por task_id (coalescência entre threads do worker)
+_task_lookups = SingleFlight()
 
 # ---------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------
 def validate_task_id_hybrid(task_id):
+    started = time.perf_counter()
     # 1) tenta ObjectId local
     try:
         _id = ObjectId(task_id)
     except Exception:
         return False, "invalid_id", None
 
-    snap = mongo.db.task_snapshots.find_one({"_id": _id})
+    # 2) cache em processo (evita Mongo e rede para tasks quentes)
+    cache_key = str(_id)
+    cached = task_validation_cache.get(cache_key)
+    if cached is not None:
+        metrics.observe_stage("validate_task:cache", time.perf_counter() - started)
+        return cached
+
+    # 3) single-flight: requisições concorrentes pela mesma task compartilham
+    #    uma única consulta ao snapshot/tasks-service e uma única escrita do snapshot
+    (result, path), shared = _task_lookups.do(cache_key, _lookup_task, _id, task_id, True, tasks_deadline())
+    metrics.observe_stage(f"validate_task:{'coalesced' if shared else path}", time.perf_counter() - started)
+    return result
+
+def _lookup_task(_id, task_id, check_snapshot=True, deadline=None):
+    """Retorna (resultado, caminho), caminho em cache/snapshot/http_fallback/circuit_open."""
+    # outra thread pode ter acabado de preencher o cache (peek: a consulta já contou como miss)
+    cached = task_validation_cache.peek(str(_id))
+    if cached is not None:
+        return cached, "cache"
+    if check_snapshot:
+        result, path = _validate_task_uncached(_id, task_id, deadline)
+    else:
+        result, path = _fetch_or_fail_fast(_id, task_id, deadline)
+    task_validation_cache.store(str(_id), result)
+    return result, path
+
+def _validate_task_uncached(_id, task_id, deadline=None):
+    snap = snapshot_store.get(_id)
     if snap:
-        return True, "ok", snap
+        return (True, "ok", snap), "snapshot"
+
+    # 4) fallback sync para tasks-service
+    return _fetch_or_fail_fast(_id, task_id, deadline)
 
-    # 2) fallback sync para tasks-service
+def _fetch_or_fail_fast(_id, task_id, deadline=None):
+    """Fallback atrás do circuit breaker: com o circuito aberto responde "unavailable" sem rede."""
+    if not tasks_breaker.allow():
+        return (None, "unavailable", None), "circuit_open"
+    result = _fetch_task_from_service(_id, task_id, deadline)
+    if result[0] is None:
+        tasks_breaker.record_failure()
+    else:
+        tasks_breaker.record_success()
+    return result, "http_fallback"
+
+def _get_task_with_deadline(url, deadline):
+    """
+    GET com novas tentativas (5xx/erro de rede) enquanto couber no prazo: cada tentativa usa
+    o menor entre TASKS_TRY_TIMEOUT e o tempo restante. Levanta requests.Timeout se o prazo acabar.
+    """
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.Timeout(f"Prazo de {TASKS_DEADLINE}s esgotado")
+        try:
+            r = _http_session.get(url, timeout=min(TASKS_TRY_TIMEOUT, remaining))
+            if r.status_code not in TASKS_RETRY_STATUSES:
+                return r
+            error = None
+        except requests.RequestException as e:
+            r, error = None, e
+        backoff = TASKS_RETRY_BACKOFF * (2 ** attempt)
+        if attempt >= TASKS_RETRIES or time.monotonic() + backoff >= deadline:
+            if error is not None:
+                raise error
+            return r
+        time.sleep(backoff)
+        attempt += 1
+
+def _fetch_task_from_service(_id, task_id, deadline=None):
     try:
         url = f"{TASKS_SERVICE_URL}/tarefas/{task_id}"
-        r = _http_session.get(url, timeout=1.0)
+        started = time.perf_counter()
+        try:
+            r = _get_task_with_deadline(url, deadline or tasks_deadline())
+        finally:
+            access_log.add_timing("upstream", time.perf_counter() - started)
         if r.status_code == 200:
             task = r.json()
             # persist snapshot local (não falha a criação da nota)
             try:
-                doc = {
-                    "_id": ObjectId(task_id),
-                    "titulo": task.get("titulo") or task.get("title"),
-                    "descricao": task.get("descricao") or task.get("description"),
-                    "owner": task.get("owner") if isinstance(task, dict) else None,
-                    "status": task.get("status", "open"),
-                    "criado_em": task.get("criado_em", time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())),
-                    "atualizado_em": task.get("atualizado_em", time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
-                }
-                mongo.db.task_snapshots.replace_one({"_id": ObjectId(task_id)}, doc, upsert=True)
+                doc = build_task_snapshot(task_id, task)
+                snapshot_store.upsert(doc)
             except Exception as e:
-                app.logger.warning("Falha ao persistir snapshot vindo do tasks-service: %s", e)
+                logger.warning("Falha ao persistir snapshot vindo do tasks-service: %s", e)
             return True, "ok", task
         elif r.status_code == 404:
             return False, "not_found", None
         else:
             return None, "unavailable", None
     except requests.RequestException as e:
-        app.logger.warning("Fallback sync para tasks-service falhou: %s", e)
+        logger.warning("Fallback sync para tasks-service falhou: %s", e)
         return None, "unavailable", None
 
-# Idempotency helpers
-def get_idempotency_record(collection_name, idempotency_key):
-    if not idempotency_key:
-        return None
-    return mongo.db.idempotency.find_one({"collection": collection_name, "idempotency_key": idempotency_key})
+# fan-out concorrente ao tasks-service para validações em lote
+TASK_FALLBACK_CONCURRENCY = int(os.getenv("TASK_FALLBACK_CONCURRENCY", 8))
+_fallback_pool = ThreadPoolExecutor(max_workers=TASK_FALLBACK_CONCURRENCY, thread_name_prefix="tasks-fallback")
 
-def save_idempotency_record(collection_name, idempotency_key, resource):
-    if not idempotency_key:
-        return
-    mongo.db.idempotency.replace_one(
-        {"collection": collection_name, "idempotency_key": idempotency_key},
-        {"collection": collection_name, "idempotency_key": idempotency_key, "resource": resource},
-        upsert=True
-    )
+def validate_task_ids_bulk(task_ids):
+    """
+    Valida várias tasks de uma vez: cache em processo, uma única consulta `$in`
+    em task_snapshots e fallback concorrente ao tasks-service só para as que faltarem.
+    Retorna {task_id: (valid, reason, snapshot)} com os mesmos valores de validate_task_id_hybrid.
+    """
+    results = {}
+    pending = {}  # ObjectId -> [task_id como veio no payload]
+    for task_id in dict.fromkeys(task_ids):
+        try:
+            _id = ObjectId(task_id)
+        except Exception:
+            results[task_id] = (False, "invalid_id", None)
+            continue
+        cached = task_validation_cache.get(str(_id))
+        if cached is not None:
+            results[task_id] = cached
+        else:
+            pending.setdefault(_id, []).append(task_id)
+
+    if pending:
+        for snap in snapshot_store.get_many(list(pending)):
+            result = (True, "ok", snap)
+            task_validation_cache.store(str(snap["_id"]), result)
+            for task_id in pending.pop(snap["_id"], []):
+                results[task_id] = result
+
+    if pending:
+        deadline = tasks_deadline()  # um prazo para o lote todo, não por task
+        futures = {
+            _id: _fallback_pool.submit(_task_lookups.do, str(_id), _lookup_task, _id, str(_id), False, deadline)
+            for _id in pending
+        }
+        for _id, future in futures.items():
+            try:
+                (result, _path), _shared = future.result()
+            except Exception as e:
+                logger.warning("Validação em lote falhou para %s: %s", _id, e)
+                result = (None, "unavailable", None)
+            for task_id in pending[_id]:
+                results[task_id] = result
+    return results
+
+# ---------------------------------------------------------------------
+# Sincronização antecipada de task_snapshots (eventos + pull incremental)
+# ---------------------------------------------------------------------
+TASK_EVENTS_TOKEN = os.getenv("TASK_EVENTS_TOKEN")
+TASK_SYNC_INTERVAL = float(os.getenv("TASK_SYNC_INTERVAL", 0))  # 0 = pull desligado
+
+task_sync = TaskSnapshotSync(
+    store=snapshot_store,
+    base_url=TASKS_SERVICE_URL,
+    session=None,  # sessão do processo: criada em init_worker
+    on_change=task_validation_cache.invalidate,
+    batch_size=int(os.getenv("TASK_SYNC_BATCH", 500)),
+    path=os.getenv("TASK_SYNC_PATH", "/tarefas"),
+    since_param=os.getenv("TASK_SYNC_SINCE_PARAM", "atualizado_desde"),
+    after_id_param=os.getenv("TASK_SYNC_AFTER_ID_PARAM", "apos_id"),
+    page_size=int(os.getenv("TASK_SYNC_PAGE_SIZE", 500)),
+)
+
+# ---------------------------------------------------------------------
+# Modo "aceita task desconhecida": com o tasks-service indisponível (erro, prazo esgotado ou
+# circuito aberto), notas são gravadas com `task_unverified` e verificadas depois (task_verifier.py)
+# ---------------------------------------------------------------------
+TASKS_ACCEPT_UNKNOWN = os.getenv("TASKS_ACCEPT_UNKNOWN", "false").lower() in ("1", "true", "yes")
+TASK_VERIFY_INTERVAL = float(os.getenv("TASK_VERIFY_INTERVAL", 30))
+
+task_verifier = UnverifiedNotesVerifier(
+    notes_store,
+    validate_task_ids_bulk,
+    breaker=tasks_breaker,
+    batch_size=int(os.getenv("TASK_VERIFY_BATCH", 200)),
+)
+
+# ---------------------------------------------------------------------
+# Idempotência: reserva atômica da chave + expiração por TTL (ver idempotency.py)
+# ---------------------------------------------------------------------
+idempotency = IdempotencyEngine(idempotency_store)
+
+def _note_exists(note_id):
+    return notes_store.exists(note_id)
+
+def _claim_idempotency_key(key, note_id, resource):
+    """
+    Reserva `key` para esta criação. Retorna None se a reserva foi feita, ou a resposta a
+    devolver: replay (200), requisição original em andamento (409) ou reserva instável (503).
+    """
+    for _attempt in range(2):
+        reserved, existing = idempotency.reserve("notes", key, note_id, resource)
+        if reserved:
+            return None
+        if existing is None:
+            return jsonify({"error": "Could not reserve the Idempotency-Key. Tente novamente."}), 503
+        outcome = idempotency.resolve(existing, _note_exists)
+        if outcome == REPLAY:
+            idempotency.mark_done(existing)
+            return jsonify(existing["resource"]), 200
+        if outcome == IN_PROGRESS:
+            break
+        idempotency.take_over(existing)  # reserva abandonada: tenta de novo
+    return jsonify({"error": "A request with this Idempotency-Key is still in progress"}), 409
+
+# ---------------------------------------------------------------------
+# ETag / GET condicional: marcadores de mudança por coleção e por task (ver change_markers.py)
+# ---------------------------------------------------------------------
+# autenticado: só cache privado, sempre revalidando com If-None-Match
+NOTES_CACHE_CONTROL = os.getenv("NOTES_CACHE_CONTROL", "private, no-cache")
+
+def _bump_change_markers(task_ids):
+    """Chamado depois de gravar notas: invalida os ETags da coleção e das tasks afetadas."""
+    try:
+        notes_store.bump_markers(task_ids)
+    except Exception as e:
+        logger.warning("Falha ao atualizar marcadores de mudança: %s", e)
+
+def _conditional(marker):
+    """ETag da leitura atual e, se o cliente já tem essa versão (If-None-Match), a resposta 304."""
+    etag = compute_etag(notes_store.marker(marker), request.full_path)
+    if etag in request.if_none_match:
+        return etag, _cacheable(Response(status=304), etag)
+    return etag, None
+
+def _cacheable(response, etag):
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = NOTES_CACHE_CONTROL
+    return response
+
+# ---------------------------------------------------------------------
+# Listagem: paginação por cursor, projeção e streaming
+# ---------------------------------------------------------------------
+NOTES_PAGE_DEFAULT = int(os.getenv("NOTES_PAGE_DEFAULT", 100))
+NOTES_PAGE_MAX = int(os.getenv("NOTES_PAGE_MAX", 1000))
+NOTES_STREAM_CHUNK = int(os.getenv("NOTES_STREAM_CHUNK", 200))
+
+# campo público -> campos no Mongo (inclui os legados pt-br)
+NOTE_FIELDS = {
+    "title": ("title", "titulo"),
+    "content": ("content", "conteudo"),
+    "task_id": ("task_id",),
+    "autor": ("autor",),
+    "criado_em": ("criado_em",),
+}
+DEFAULT_NOTE_FIELDS = ("title", "content", "task_id")
+
+def use_normalized_note_fields():
+    """Chamado quando a migração de titulo/conteudo terminou: leituras e projeções usam só os campos novos."""
+    global NOTE_FIELDS
+    NOTE_FIELDS = {field: sources[:1] for field, sources in NOTE_FIELDS.items()}
+
+def parse_note_fields(raw):
+    """Converte `fields=title,content` em tupla de campos públicos (ValueError se inválido)."""
+    if not raw:
+        return DEFAULT_NOTE_FIELDS
+    fields = tuple(dict.fromkeys(f.strip() for f in raw.split(",") if f.strip() and f.strip() != "id"))
+    unknown = [f for f in fields if f not in NOTE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def note_projection(fields):
+    projection = {"_id": 1}
+    for field in fields:
+        for src in NOTE_FIELDS[field]:
+            projection[src] = 1
+    return projection
+
+def serialize_note(note, fields=DEFAULT_NOTE_FIELDS):
+    out = {"id": str(note["_id"])}
+    for field in fields:
+        value = first_present(note, NOTE_FIELDS[field])
+        if isinstance(value, ObjectId):
+            value = str(value)
+        out[field] = value
+    return out
+
+def note_shape(fields):
+    """
+    Formato de cada nota em GET /notes, para o store (storage.shape_projection): o Mongo devolve
+    o documento pronto para o JSON, sem um dict intermediário por nota no worker.
+    """
+    shape = {"id": ("_id",)}
+    for field in fields:
+        shape[field] = NOTE_FIELDS[field]
+    return shape
+
+# formato das notas em /tarefas/<id>/notes e no batchGet (o mesmo de serialize_task_note)
+TASK_NOTE_SHAPE = {
+    "id": ("_id",),
+    "title": ("title",),
+    "content": ("content",),
+    "task_id": ("task_id",),
+    "autor": ("autor",),
+    "criado_em": ("criado_em",),
+}
+
+def serialize_task_note(n):
+    """Formato das notas em /tarefas/<id>/notes (e no batchGet)."""
+    return {
+        "id": str(n["_id"]),
+        "title": n.get("title"),
+        "content": n.get("content"),
+        "task_id": str(n.get("task_id")) if n.get("task_id") else None,
+        "autor": n.get("autor"),
+        "criado_em": n.get("criado_em")
+    }
+
+def _parse_page_args(args):
+    """Lê `limit`/`after` da query string. Retorna (limit, after_oid)."""
+    try:
+        limit = int(args.get("limit", NOTES_PAGE_DEFAULT))
+    except ValueError:
+        raise ValueError("Invalid limit")
+    if limit < 1:
+        raise ValueError("Invalid limit")
+    limit = min(limit, NOTES_PAGE_MAX)
+
+    after = args.get("after")
+    if after:
+        try:
+            after = ObjectId(after)
+        except (InvalidId, TypeError):
+            raise ValueError("Invalid cursor")
+    return limit, after or None
+
+def _stream_notes(cursor, limit):
+    """
+    Escreve o array JSON em pedaços de NOTES_STREAM_CHUNK notas, direto do cursor,
+    para que a memória do worker não cresça com o tamanho do resultado.
+    As notas já vêm no formato da resposta (note_shape): um dumps por pedaço.
+    Com `limit` (modo paginado) o envelope {"items": [...], "next_cursor": ...} é mantido.
+    """
+    dumps = current_app.json.dumps
+    buf = []
+    count = 0
+    last_id = None
+    next_cursor = None
+    try:
+        yield '{"items":[' if limit is not None else "["
+        for note in cursor:
+            if limit is not None and count == limit:
+                next_cursor = str(last_id)
+                break
+            last_id = note["id"]
+            buf.append(note)
+            count += 1
+            if len(buf) >= NOTES_STREAM_CHUNK:
+                yield ("," if count > len(buf) else "") + dumps(buf)[1:-1]
+                buf = []
+        if buf:
+            yield ("," if count > len(buf) else "") + dumps(buf)[1:-1]
+        yield "]" if limit is None else '],"next_cursor":' + dumps(next_cursor) + "}"
+    finally:
+        close = getattr(cursor, "close", None)  # cursores do Mongo; o store em memória devolve lista
+        if close is not None:
+            close()
+
+# ---------------------------------------------------------------------
+# Busca full-text (índice de texto do Mongo; índice invertido em processo no mongomock)
+# ---------------------------------------------------------------------
+NOTES_SEARCH_DEFAULT = int(os.getenv("NOTES_SEARCH_DEFAULT", 20))
+NOTES_SEARCH_MAX_OFFSET = int(os.getenv("NOTES_SEARCH_MAX_OFFSET", 10000))
+
+note_search = NoteSearch(notes_store)
+
+def _parse_search_args(args):
+    """Lê `q`, `task_id`, `limit` e `offset`. Retorna (q, task_oid, limit, offset)."""
+    q = (args.get("q") or "").strip()
+    if not q:
+        raise ValueError("Missing q")
+    task_id = args.get("task_id")
+    if task_id:
+        try:
+            task_id = ObjectId(task_id)
+        except (InvalidId, TypeError):
+            raise ValueError("Invalid task_id")
+    try:
+        limit = int(args.get("limit", NOTES_SEARCH_DEFAULT))
+        offset = int(args.get("offset", 0))
+    except ValueError:
+        raise ValueError("Invalid limit/offset")
+    if limit < 1 or offset < 0 or offset > NOTES_SEARCH_MAX_OFFSET:
+        raise ValueError("Invalid limit/offset")
+    return q, task_id or None, min(limit, NOTES_PAGE_MAX), offset
 
 # ---------------------------------------------------------------------
 # Rotas da API
 # ---------------------------------------------------------------------
-@app.route("/notes", methods=["GET"])
+@bp.route("/notes", methods=["GET"])
 @requires_auth()
 def get_notes():
-    notes = mongo.db.notes.find()
-    output = []
-    for note in notes:
-        tid = note.get("task_id")
-        if isinstance(tid, ObjectId):
-            tid = str(tid)
-        output.append({
-            "id": str(note["_id"]),
-            "title": note.get("title") or note.get("titulo"),
-            "content": note.get("content") or note.get("conteudo"),
-            "task_id": tid
-        })
-    return jsonify(output), 200
-
-@app.route("/tarefas/<task_id>/notes", methods=["GET"])
+    """
+    Lista notas.
+    - sem `limit`/`after`: formato legado (lista com todas as notas);
+    - com `limit`/`after`: paginação por _id, resposta {"items": [...], "next_cursor": ...};
+    - `fields=title,content`: projeção aplicada no Mongo;
+    - `stream=1`: serializa em chunks direto do cursor.
+    """
+    try:
+        fields = parse_note_fields(request.args.get("fields"))
+        paginated = "limit" in request.args or "after" in request.args
+        limit, after = _parse_page_args(request.args) if paginated else (None, None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    etag, not_modified = _conditional(NOTES_MARKER)
+    if not_modified is not None:
+        return not_modified
+
+    stream = request.args.get("stream", "").lower() in ("1", "true", "yes")
+    # paginado: busca limit+1 para saber se existe próxima página
+    cursor = notes_store.list(after=after, limit=limit + 1 if paginated else None, shape=note_shape(fields),
+                              batch_size=NOTES_STREAM_CHUNK if stream else None)
+
+    if stream:
+        return _cacheable(Response(stream_with_context(_stream_notes(cursor, limit)),
+                                   mimetype="application/json"), etag)
+
+    # notas já no formato da resposta: vão direto para o provider JSON
+    output = list(cursor)
+    next_cursor = None
+    if paginated and len(output) > limit:
+        output = output[:limit]
+        next_cursor = str(output[-1]["id"])
+
+    if paginated:
+        return _cacheable(jsonify({"items": output, "next_cursor": next_cursor}), etag), 200
+    return _cacheable(jsonify(output), etag), 200
+
+@bp.route("/notes/search", methods=["GET"])
+@requires_auth()
+def search_notes():
+    """
+    Busca por relevância em title/content (e titulo/conteudo legados).
+    `q` obrigatório (termos combinados com OU); `task_id`, `fields`, `limit` e `offset` opcionais.
+    Resposta: {"items": [{..., "score"}], "next_offset": n | null}.
+    """
+    try:
+        fields = parse_note_fields(request.args.get("fields"))
+        q, task_id, limit, offset = _parse_search_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    etag, not_modified = _conditional(NOTES_MARKER)
+    if not_modified is not None:
+        return not_modified
+
+    try:
+        docs, has_more = note_search.search(q, note_projection(fields), task_id=task_id, limit=limit, offset=offset)
+    except TextIndexUnavailable as e:
+        resp = jsonify({"error": "Search index is being built. Tente novamente mais tarde."})
+        resp.headers["Retry-After"] = str(max(1, math.ceil(e.retry_after)))
+        return resp, 503
+    items = []
+    for doc in docs:
+        item = serialize_note(doc, fields)
+        item["score"] = round(doc["score"], 4)
+        items.append(item)
+    return _cacheable(jsonify({"items": items, "next_offset": offset + limit if has_more else None}), etag), 200
+
+@bp.route("/tarefas/<task_id>/notes", methods=["GET"])
 @requires_auth()  # manter mesma política de autenticação do GET /notes
 def get_notes_for_task(task_id):
     """
@@ -218,18 +701,12 @@ def get_notes_for_task(task_id):
         except Exception:
             return jsonify({"error": "Invalid task_id"}), 400
 
-        notes_cursor = mongo.db.notes.find({"task_id": _oid})
-        notes = []
-        for n in notes_cursor:
-            notes.append({
-                "id": str(n["_id"]),
-                "title": n.get("title"),
-                "content": n.get("content"),
-                "task_id": str(n.get("task_id")) if n.get("task_id") else None,
-                "autor": n.get("autor"),
-                "criado_em": n.get("criado_em")
-            })
-        return jsonify(notes), 200
+        etag, not_modified = _conditional(task_marker(_oid))
+        if not_modified is not None:
+            return not_modified
+
+        notes = list(notes_store.find_by_tasks([_oid], shape=TASK_NOTE_SHAPE))
+        return _cacheable(jsonify(notes), etag), 200
 
     elif valid is False:
         # task inválida ou não encontrada
@@ -240,8 +717,45 @@ def get_notes_for_task(task_id):
         # unavailable
         return jsonify({"error": "Não foi possível validar a task no momento. Tente novamente mais tarde."}), 503
 
+BATCH_GET_MAX_TASKS = int(os.getenv("BATCH_GET_MAX_TASKS", 200))
+
+@bp.route("/tarefas/notes:batchGet", methods=["POST"])
+@requires_auth()
+def batch_get_notes_for_tasks():
+    """
+    Notas de várias tasks em uma requisição (ex.: dashboard com 50 tasks).
+    Corpo: {"task_ids": [...]} (ou a lista direto). Todas as tasks são validadas em lote
+    (um $in em task_snapshots + fallback concorrente) e as notas vêm de um único $in por task_id.
+    Resposta: {"results": {task_id: {"status": 200, "notes": [...]} | {"status", "error"}}}
+    """
+    data = request.get_json(silent=True)
+    task_ids = data.get("task_ids") if isinstance(data, dict) else data
+    if not isinstance(task_ids, list) or not task_ids:
+        return jsonify({"error": "Expected a non-empty list of task_ids"}), 400
+    task_ids = list(dict.fromkeys(str(t) for t in task_ids))
+    if len(task_ids) > BATCH_GET_MAX_TASKS:
+        return jsonify({"error": f"At most {BATCH_GET_MAX_TASKS} task_ids per request"}), 413
+
+    results = {}
+    found = {}  # ObjectId da task -> resultados que recebem as notas (ids com grafias diferentes)
+    for task_id, (valid, reason, _snapshot) in validate_task_ids_bulk(task_ids).items():
+        if valid is True:
+            results[task_id] = {"status": 200, "notes": []}
+            found.setdefault(ObjectId(task_id), []).append(results[task_id])
+        elif valid is False:
+            error = "Invalid task_id" if reason == "invalid_id" else "Task not found"
+            results[task_id] = {"status": 400 if reason == "invalid_id" else 404, "error": error}
+        else:
+            results[task_id] = {"status": 503, "error": "Task service unavailable"}
+
+    if found:
+        for note in notes_store.find_by_tasks(list(found), shape=TASK_NOTE_SHAPE):
+            for entry in found[note["task_id"]]:
+                entry["notes"].append(note)
+    return jsonify({"results": {task_id: results[task_id] for task_id in task_ids}}), 200
 
-@app.route("/notes", methods=["POST"])
+
+@bp.route("/notes", methods=["POST"])
 @requires_auth()  # Remove verificação de scope
 def create_note():
     data = request.json or {}
@@ -253,39 +767,217 @@ def create_note():
     if not title or not content or not task_id:
         return jsonify({"error": "Missing title/content/task_id"}), 400
 
-    # idempotency header
+    try:
+        db_task_id = ObjectId(task_id)
+    except Exception:
+        db_task_id = None  # validate_task_id_hybrid responde invalid_id
+
+    # idempotency header: a chave é reservada antes da validação, já com o id e a resposta da nota
     idempotency_key = request.headers.get("Idempotency-Key")
-    existing = get_idempotency_record("notes", idempotency_key)
-    if existing:
-        return jsonify(existing["resource"]), 200
+    note_id = ObjectId()
+    resource = {"id": str(note_id), "title": title, "content": content, "task_id": str(db_task_id)}
+    reserved = bool(idempotency_key) and db_task_id is not None
+    if reserved:
+        replay = _claim_idempotency_key(idempotency_key, note_id, resource)
+        if replay is not None:
+            return replay
 
     valid, reason, snapshot = validate_task_id_hybrid(task_id)
-    if valid is True:
-        try:
-            db_task_id = ObjectId(task_id)
-        except Exception:
-            # se por algum motivo ObjectId falhar (já validamos antes), guardamos como string
-            db_task_id = task_id
-
+    unverified = valid is None and TASKS_ACCEPT_UNKNOWN
+    if valid is True or unverified:
         note_doc = {
+            "_id": note_id,
             "title": title,
             "content": content,
             "task_id": db_task_id,
-            "autor": getattr(request, "current_user", {}).get("sub") if hasattr(request, "current_user") else None,
-            "criado_em": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            "autor": current_author(),
+            "criado_em": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "rev": 1,
         }
-        note_id = mongo.db.notes.insert_one(note_doc).inserted_id
-        resource = {"id": str(note_id), "title": title, "content": content, "task_id": str(db_task_id)}
-        save_idempotency_record("notes", idempotency_key, resource)
-        return jsonify(resource), 201
-    elif valid is False:
+        if unverified:
+            note_doc["task_unverified"] = True
+        if reserved:
+            # a reserva já guarda a resposta: a nota aponta para ela e não há update de conclusão
+            note_doc[RESOURCE_FIELD] = record_id("notes", idempotency_key)
+        try:
+            notes_store.insert(note_doc)
+        except Exception:
+            if reserved:
+                idempotency.release("notes", idempotency_key)
+            raise
+        note_search.note_changed(note_doc)
+        _bump_change_markers([db_task_id])
+        resp = jsonify(resource)
+        if unverified:
+            resp.headers["X-Task-Verification"] = "pending"
+        return resp, 201
+
+    if reserved:
+        idempotency.release("notes", idempotency_key)
+    if valid is False:
         if reason == "invalid_id":
             return jsonify({"error": "Invalid task_id"}), 400
         return jsonify({"error": "Task not found"}), 400
     else:
         return jsonify({"error": "Task service unavailable. Tente novamente mais tarde."}), 503
 
-@app.route("/notes/<id>", methods=["PUT"])
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", 1000))
+
+@bp.route("/notes/bulk", methods=["POST"])
+@requires_auth()
+def create_notes_bulk():
+    """
+    Cria várias notas em uma requisição.
+    Corpo: lista de notas (ou {"notes": [...]}); cada item aceita `idempotency_key`.
+    As chaves de idempotência são reservadas em um único insert_many, as tasks validadas
+    em lote e as notas gravadas com um único insert_many não ordenado.
+    Resposta: {"results": [{"index", "status", "note" | "error"}], "created": n}; notas aceitas sem
+    validar a task (TASKS_ACCEPT_UNKNOWN) trazem "task_verification": "pending".
+    """
+    data = request.get_json(silent=True)
+    items = data.get("notes") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty list of notes"}), 400
+    if len(items) > BULK_MAX_ITEMS:
+        return jsonify({"error": f"At most {BULK_MAX_ITEMS} notes per request"}), 413
+
+    results = [None] * len(items)
+    parsed = []  # (index, title, content, task_id, idempotency_key)
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = {"index": index, "status": 400, "error": "Invalid note"}
+            continue
+        title = item.get("title") or item.get("titulo")
+        content = item.get("content") or item.get("conteudo")
+        task_id = item.get("task_id") or item.get("taskId")
+        key = item.get("idempotency_key")
+        if not title or not content or not task_id:
+            results[index] = {"index": index, "status": 400, "error": "Missing title/content/task_id"}
+            continue
+        if not isinstance(task_id, str) or (key is not None and not isinstance(key, str)):
+            results[index] = {"index": index, "status": 400, "error": "Invalid task_id/idempotency_key"}
+            continue
+        parsed.append((index, title, content, task_id, key))
+
+    # 1) pré-aloca id e resposta de cada nota; chave repetida dentro do lote vale a primeira ocorrência
+    to_create = []  # (index, title, content, task_id, key, note_id, resource)
+    first_by_key = {}
+    repeated = []
+    for index, title, content, task_id, key in parsed:
+        if key and key in first_by_key:
+            repeated.append((index, first_by_key[key]))
+            continue
+        if key:
+            first_by_key[key] = index
+        try:
+            db_task_id = str(ObjectId(task_id))
+        except Exception:
+            db_task_id = None
+        note_id = ObjectId()
+        resource = {"id": str(note_id), "title": title, "content": content, "task_id": db_task_id}
+        to_create.append((index, title, content, task_id, key, note_id, resource))
+
+    # 2) idempotência: reserva todas as chaves em um insert_many (+1 consulta só para as já usadas)
+    reserved_keys = set()
+    to_reserve = [(e[4], e[5], e[6]) for e in to_create if e[4] and e[6]["task_id"] is not None]
+    taken = idempotency.reserve_many("notes", to_reserve)
+    reserved_keys.update(key for key, _, _ in to_reserve if key not in taken)
+    if taken:
+        pending_ids = [rec["resource_id"] for rec in taken.values() if rec.get("state") == "pending" and "resource_id" in rec]
+        existing_ids = notes_store.existing_ids(pending_ids)
+        remaining = []
+        for entry in to_create:
+            index, key = entry[0], entry[4]
+            record = taken.get(key) if key else None
+            if record is None:
+                remaining.append(entry)
+                continue
+            outcome = idempotency.resolve(record, lambda note_id: note_id in existing_ids)
+            if outcome == REPLAY:
+                results[index] = {"index": index, "status": 200, "note": record["resource"]}
+            else:
+                if outcome != IN_PROGRESS:
+                    idempotency.take_over(record)  # abandonada: um novo envio poderá reservá-la
+                results[index] = {"index": index, "status": 409, "error": "Idempotency-Key still in progress"}
+        to_create = remaining
+
+    # 3) validação das tasks distintas em lote
+    validations = validate_task_ids_bulk([e[3] for e in to_create]) if to_create else {}
+
+    autor = current_author()
+    now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    docs, doc_entries, release = [], [], []
+    for entry in to_create:
+        index, title, content, task_id, key, note_id, resource = entry
+        valid, reason, _snapshot = validations[task_id]
+        if valid is True or (valid is None and TASKS_ACCEPT_UNKNOWN):
+            doc = {"_id": note_id, "title": title, "content": content, "task_id": ObjectId(task_id),
+                   "autor": autor, "criado_em": now, "rev": 1}
+            if valid is None:
+                doc["task_unverified"] = True
+            if key in reserved_keys:
+                doc[RESOURCE_FIELD] = record_id("notes", key)
+            docs.append(doc)
+            doc_entries.append(entry)
+            continue
+        if key in reserved_keys:
+            release.append(key)
+        if valid is False:
+            error = "Invalid task_id" if reason == "invalid_id" else "Task not found"
+            results[index] = {"index": index, "status": 400, "error": error}
+        else:
+            results[index] = {"index": index, "status": 503, "error": "Task service unavailable"}
+
+    # 4) escrita não ordenada: falhas individuais não derrubam o lote
+    failed = notes_store.insert_many(docs) if docs else {}
+
+    for pos, entry in enumerate(doc_entries):
+        index, key, resource = entry[0], entry[4], entry[6]
+        if pos in failed:
+            logger.warning("Falha ao inserir nota do lote (item %s): %s", index, failed[pos])
+            results[index] = {"index": index, "status": 500, "error": "Failed to create note"}
+            if key in reserved_keys:
+                release.append(key)
+            continue
+        note_search.note_changed(docs[pos])
+        results[index] = {"index": index, "status": 201, "note": resource}
+        if docs[pos].get("task_unverified"):
+            results[index]["task_verification"] = "pending"
+    idempotency.release_many("notes", release)
+    created_tasks = [docs[pos]["task_id"] for pos in range(len(docs)) if pos not in failed]
+    if created_tasks:
+        _bump_change_markers(created_tasks)
+
+    for index, first in repeated:
+        first_result = results[first]
+        if first_result["status"] in (200, 201):
+            results[index] = {"index": index, "status": 200, "note": first_result["note"]}
+        else:
+            results[index] = dict(first_result, index=index)
+
+    created = sum(1 for r in results if r["status"] == 201)
+    return jsonify({"results": results, "created": created}), 200
+
+@bp.route("/internal/task-events", methods=["POST"])
+def task_events():
+    """
+    Webhook do tasks-service (autenticado por X-Internal-Token = TASK_EVENTS_TOKEN).
+    Corpo: um evento, uma lista ou {"events": [...]}, cada um {"type": "task.created|task.updated|task.deleted", "task": {...}}.
+    """
+    token = request.headers.get("X-Internal-Token", "")
+    if not TASK_EVENTS_TOKEN or not hmac.compare_digest(token.encode(), TASK_EVENTS_TOKEN.encode()):
+        return jsonify({"error": "Forbidden"}), 403
+
+    data = request.get_json(silent=True)
+    events = data.get("events") if isinstance(data, dict) and "events" in data else data
+    if isinstance(events, dict):
+        events = [events]
+    if not isinstance(events, list) or not events:
+        return jsonify({"error": "Expected an event or a list of events"}), 400
+
+    return jsonify(task_sync.apply_events(events)), 200
+
+@bp.route("/notes/<id>", methods=["PUT"])
 @requires_auth()  # Remove verificação de scope
 def update_note(id):
     try:
@@ -294,17 +986,18 @@ def update_note(id):
         return jsonify({"error": "Invalid id"}), 400
 
     data = request.json or {}
-    updated = mongo.db.notes.find_one_and_update(
-        {"_id": _id},
-        {"$set": {"title": data.get("title") or data.get("titulo"), "content": data.get("content") or data.get("conteudo")}},
-        return_document=ReturnDocument.AFTER,
-    )
+    updated = notes_store.update(
+        _id, {"title": data.get("title") or data.get("titulo"), "content": data.get("content") or data.get("conteudo")})
     if not updated:
         return jsonify({"error": "Note not found"}), 404
+    note_search.note_changed(updated)
+    _bump_change_markers([updated.get("task_id")])
 
-    return jsonify({"id": str(updated["_id"]), "title": updated.get("title"), "content": updated.get("content")}), 200
+    resp = jsonify({"id": str(updated["_id"]), "title": updated.get("title"), "content": updated.get("content")})
+    resp.set_etag(f"{updated['_id']}-{updated['rev']}")
+    return resp, 200
 
-@app.route("/notes/<id>", methods=["DELETE"])
+@bp.route("/notes/<id>", methods=["DELETE"])
 @requires_auth()  # Remove verificação de scope
 def delete_note(id):
     try:
@@ -312,21 +1005,128 @@ def delete_note(id):
     except InvalidId:
         return jsonify({"error": "Invalid id"}), 400
 
-    result = mongo.db.notes.delete_one({"_id": _id})
-    if result.deleted_count == 0:
+    deleted = notes_store.delete(_id)
+    if deleted is None:
         return jsonify({"error": "Note not found"}), 404
+    note_search.note_removed(_id)
+    _bump_change_markers([deleted.get("task_id")])
+    try:
+        idempotency.resource_removed(deleted)
+    except Exception as e:
+        logger.warning("Falha ao concluir a reserva de Idempotency-Key da nota removida: %s", e)
     return jsonify({"message": "Note deleted"}), 200
 
 # ---------------------------------------------------------------------
-# Inicialização
+# Bootstrap do banco: índices + migração dos campos legados (ver migrations.py)
+# Roda no gunicorn (post_worker_init em gunicorn.conf.py), no app_async e no __main__.
 # ---------------------------------------------------------------------
-if __name__ == "__main__":
+NOTES_MIGRATE_LEGACY_FIELDS = os.getenv("NOTES_MIGRATE_LEGACY_FIELDS", "true").lower() in ("1", "true", "yes")
+
+legacy_migration = migrations.LegacyFieldsMigration(
+    get_db=lambda: mongo.db,
+    batch_size=int(os.getenv("NOTES_MIGRATION_BATCH", 500)),
+    on_done=use_normalized_note_fields,
+    poll_interval=float(os.getenv("NOTES_MIGRATION_POLL", 30)),
+)
+
+def bootstrap_database():
+    if NOTES_STORAGE != "mongo":
+        return  # índices e migração são do Mongo
+    try:
+        migrations.ensure_indexes(mongo.db)
+        idempotency.ensure_indexes()
+        note_search.ensure_index()
+    except Exception as e:
+        logger.warning("Falha ao criar índices iniciais: %s", e)
+
     try:
-        mongo.db.notes.create_index([("task_id", 1)])
-        mongo.db.task_snapshots.create_index([("_id", 1)])
-        mongo.db.idempotency.create_index([("collection", 1), ("idempotency_key", 1)], unique=True, sparse=True)
+        if legacy_migration.is_done():
+            use_normalized_note_fields()
+        else:
+            # mesmo sem migrar, acompanha a migração feita por outro worker/processo
+            legacy_migration.start(migrate=NOTES_MIGRATE_LEGACY_FIELDS)
     except Exception as e:
-        app.logger.warning("Falha ao criar índices iniciais: %s", e)
+        logger.warning("Falha ao verificar a migração de campos legados: %s", e)
+
+def use_storage(backend):
+    """Troca o backend de armazenamento em tempo de execução (testes e benchmarks)."""
+    global NOTES_STORAGE, notes_store, snapshot_store, idempotency_store, idempotency, note_search
+    flush_pending_writes()
+    NOTES_STORAGE = backend
+    notes_store, snapshot_store, idempotency_store = create_stores(backend, get_db=lambda: mongo.db)
+    notes_store = _write_behind(notes_store)
+    idempotency = IdempotencyEngine(idempotency_store)
+    note_search = NoteSearch(notes_store)
+    task_sync.store = snapshot_store
+    task_verifier.store = notes_store
+    task_validation_cache.clear()
+
+# ---------------------------------------------------------------------
+# Inicialização por processo + factory do gunicorn
+# ---------------------------------------------------------------------
+_worker_pid = None
+
+def init_worker():
+    """
+    Cria os recursos do processo: thread do logging, MongoClient (até MONGO_MAX_POOL_SIZE
+    conexões), sessões HTTP do tasks-service e threads de sync/verificação. Uma vez por pid:
+    no import (NOTES_WORKER_INIT=import) ou no post_fork do gunicorn.
+    """
+    global _worker_pid, _http_session
+    if _worker_pid == os.getpid():
+        return
+    _worker_pid = os.getpid()
+
+    # logging estruturado (nível em LOG_LEVEL, escrita fora do worker via fila)
+    access_log.configure_logging()
+    # o MongoClient fica no objeto PyMongo (mongo.db), compartilhado pelos apps do processo;
+    # o init_app também troca o provider JSON do app do módulo, então o nosso é registrado de novo
+    mongo.init_app(app, maxPoolSize=MONGO_MAX_POOL_SIZE,
+                   event_listeners=[access_log.MongoTimingListener(), metrics.MongoMetricsListener()])
+    json_provider.init_app(app)
+    _http_session = make_http_session(retries=0)
+    task_sync.session = make_http_session()
+
+    if TASK_SYNC_INTERVAL > 0:
+        task_sync.start(TASK_SYNC_INTERVAL)
+    if TASKS_ACCEPT_UNKNOWN and TASK_VERIFY_INTERVAL > 0:
+        task_verifier.start(TASK_VERIFY_INTERVAL)
+
+def create_app():
+    """
+    Monta um app Flask com as rotas do serviço (factory do gunicorn: `app:create_app()`).
+    Os recursos de processo (MongoClient, sessões HTTP, threads) não dependem do app: são
+    criados no import ou, sob o gunicorn, no post_fork de cada worker (init_worker).
+    """
+    flask_app = Flask(__name__)
+    flask_app.config["MONGO_URI"] = MONGO_URI
+    # JSON das respostas: orjson quando instalado, com ObjectId nativo (NOTES_JSON_PROVIDER)
+    json_provider.init_app(flask_app)
+    CORS(
+        flask_app,
+        resources={r"/*": {"origins": cors_origins}},
+        supports_credentials=True,
+        methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        allow_headers=["Content-Type", "Authorization", "Accept", "Idempotency-Key"],
+    )
+    # handlers de erro do Auth0 (assume auth.py presente)
+    register_auth_error_handlers(flask_app)
+    flask_app.register_blueprint(bp)
+    # access log: método, rota, status, latência e tempo em Mongo/tasks-service
+    # (amostrado via ACCESS_LOG_SAMPLE_RATE; não lê o corpo nem loga Authorization)
+    access_log.init_app(flask_app)
+    # métricas Prometheus (/metrics): latência por rota e por etapa interna
+    metrics.init_app(flask_app)
+    return flask_app
+
+# app do módulo: `python app.py`, testes, benchmarks e app_async (app.app)
+app = create_app()
+
+if NOTES_WORKER_INIT != "post_fork":
+    init_worker()
+
+if __name__ == "__main__":
+    bootstrap_database()
 
     port = int(os.getenv("PORT", 5002))
     debug = os.getenv("FLASK_DEBUG", "false").lower() in ("1", "true", "yes")
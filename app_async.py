@@ -0,0 +1,506 @@
+# app_async.py (notes service - modo assíncrono/ASGI)
+#
+# Serve as mesmas rotas principais de app.py (/notes, /notes/<id>, /tarefas/<task_id>/notes,
+# /health, /ready) com Quart, motor e httpx, para que um único processo mantenha centenas
+# de requisições em andamento enquanto espera o Mongo ou o tasks-service.
+#
+#   hypercorn app_async:app -b 0.0.0.0:5002
+#
+# Serialização, paginação, cache de validação de tasks e auth são reaproveitados de app.py/auth.py.
+import asyncio
+import os
+import time
+from functools import wraps
+
+import httpx
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from quart import Quart, request, jsonify, make_response, Response, g, current_app, has_request_context
+
+import access_log
+import app as notes_app
+import json_provider
+import metrics
+from change_markers import NOTES_MARKER, bump_ops, compute_etag, task_marker
+from auth import AuthError, cached_token_payload, parse_bearer_header, verify_token
+from idempotency import REPLAY, IN_PROGRESS, RESOURCE_FIELD, record_id
+from singleflight import AsyncSingleFlight
+from storage import shaped_pipeline, snapshot_guard
+
+app = Quart(__name__)
+json_provider.init_app(app)  # mesmo provider JSON de app.py (orjson + ObjectId)
+
+MONGO_URI = notes_app.MONGO_URI
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+TASKS_HTTP_MAX_CONNECTIONS = int(os.getenv("TASKS_HTTP_MAX_CONNECTIONS", 100))
+
+# clientes criados no event loop que vai usá-los (before_serving) ou sob demanda nos testes
+mongo_client = None
+db = None
+http_client = None
+
+def get_db():
+    global mongo_client, db
+    if db is None:
+        mongo_client = AsyncIOMotorClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE,
+                                          event_listeners=[metrics.MongoMetricsListener()])
+        db = mongo_client.get_default_database("notesdb")
+    return db
+
+def get_http_client():
+    global http_client
+    if http_client is None:
+        http_client = httpx.AsyncClient(
+            timeout=1.0,
+            limits=httpx.Limits(max_connections=TASKS_HTTP_MAX_CONNECTIONS, max_keepalive_connections=20),
+            transport=httpx.AsyncHTTPTransport(retries=2),  # reconexão em falhas de conexão
+        )
+    return http_client
+
+@app.before_serving
+async def init_clients():
+    get_db()
+    get_http_client()
+    # índices e migração de schema com o cliente síncrono de app.py, sem bloquear o start
+    asyncio.get_running_loop().run_in_executor(None, notes_app.bootstrap_database)
+
+@app.after_serving
+async def close_clients():
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+    if mongo_client is not None:
+        mongo_client.close()
+
+# ---------------------------------------------------------------------
+# CORS (mesma política de app.py)
+# ---------------------------------------------------------------------
+def _allowed_origin(origin):
+    if notes_app.cors_origins == "*":
+        return "*"
+    if origin and origin in notes_app.cors_origins:
+        return origin
+    return None
+
+@app.before_request
+async def handle_preflight():
+    if request.method != "OPTIONS":
+        return None
+
+    resp = await make_response("", 204)
+    allowed_origin = _allowed_origin(request.headers.get("Origin"))
+    if allowed_origin:
+        resp.headers["Access-Control-Allow-Origin"] = allowed_origin
+        resp.headers["Vary"] = "Origin"
+        resp.headers["Access-Control-Allow-Methods"] = "GET,POST,PUT,DELETE,OPTIONS"
+        resp.headers["Access-Control-Allow-Headers"] = "Authorization,Content-Type,Accept,Idempotency-Key"
+        resp.headers["Access-Control-Allow-Credentials"] = "true"
+        resp.headers["Access-Control-Max-Age"] = "3600"
+    return resp
+
+@app.after_request
+async def add_cors_headers(resp):
+    origin = request.headers.get("Origin")
+    allowed_origin = _allowed_origin(origin) if origin else None
+    if allowed_origin and "Access-Control-Allow-Origin" not in resp.headers:
+        resp.headers["Access-Control-Allow-Origin"] = allowed_origin
+        resp.headers["Access-Control-Allow-Credentials"] = "true"
+        resp.headers["Vary"] = "Origin"
+    return resp
+
+# ---------------------------------------------------------------------
+# Access log e métricas (mesmo formato de app.py)
+# ---------------------------------------------------------------------
+@app.before_request
+async def start_access_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+async def log_access(resp):
+    if request.method != "OPTIONS":
+        started = g.get("request_started")
+        latency = time.perf_counter() - started if started is not None else 0.0
+        access_log.log_access(request.method, request.path, resp.status_code, latency, g.get("dependency_timings"))
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        metrics.observe_request(route, request.method, resp.status_code, latency)
+    return resp
+
+@app.route("/metrics", methods=["GET"])
+async def metrics_endpoint():
+    if not metrics.scrape_allowed(request.remote_addr, request.headers.get("Authorization")):
+        return Response("Forbidden\n", status=403, mimetype="text/plain")
+    body, content_type = metrics.render()
+    return Response(body, headers={"Content-Type": content_type})
+
+# ---------------------------------------------------------------------
+# Auth
+# ---------------------------------------------------------------------
+def requires_auth(required_scope=None):
+    """Versão assíncrona de auth.requires_auth (verificação fora do event loop quando não está em cache)."""
+    def decorator(f):
+        @wraps(f)
+        async def wrapper(*args, **kwargs):
+            if current_app.config.get("TESTING"):
+                g.current_user = {}
+                return await f(*args, **kwargs)
+
+            token = parse_bearer_header(request.headers.get("Authorization", None))
+            payload = cached_token_payload(token)
+            if payload is None:
+                # RS256 e um eventual fetch do JWKS são bloqueantes
+                payload = await asyncio.get_running_loop().run_in_executor(None, verify_token, token)
+
+            if required_scope and required_scope not in payload.get("scope", "").split():
+                raise AuthError({"code":"insufficient_scope","description":"You don't have access to this resource"}, 403)
+
+            g.current_user = payload
+            return await f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@app.errorhandler(AuthError)
+async def handle_auth_error(ex):
+    return jsonify(ex.error), ex.status_code
+
+# ---------------------------------------------------------------------
+# Health / Ready
+# ---------------------------------------------------------------------
+@app.route("/health", methods=["GET"])
+async def health():
+    return jsonify({"status": "ok", "service": "notes"}), 200
+
+@app.route("/ready", methods=["GET"])
+async def ready():
+    tasks_service = notes_app.tasks_breaker.snapshot()  # só informativo, como em app.py
+    try:
+        await get_db().command("ping")
+        return jsonify({"ready": True, "tasks_service": tasks_service}), 200
+    except Exception:
+        return jsonify({"ready": False, "tasks_service": tasks_service}), 503
+
+# ---------------------------------------------------------------------
+# Validação de task (cache e circuit breaker compartilhados com app.py + single-flight assíncrono)
+# ---------------------------------------------------------------------
+_task_lookups = AsyncSingleFlight()
+
+def _tasks_deadline():
+    """Mesmo orçamento de app.tasks_deadline: um prazo por requisição para o tasks-service."""
+    if not has_request_context():
+        return time.monotonic() + notes_app.TASKS_DEADLINE
+    deadline = g.get("tasks_deadline")
+    if deadline is None:
+        deadline = g.tasks_deadline = time.monotonic() + notes_app.TASKS_DEADLINE
+    return deadline
+
+async def validate_task_id_hybrid(task_id):
+    try:
+        _id = ObjectId(task_id)
+    except Exception:
+        return False, "invalid_id", None
+
+    started = time.perf_counter()
+    cache_key = str(_id)
+    cached = notes_app.task_validation_cache.get(cache_key)
+    if cached is not None:
+        metrics.observe_stage("validate_task:cache", time.perf_counter() - started)
+        return cached
+
+    (result, path), shared = await _task_lookups.do(cache_key, _lookup_task, _id, task_id, _tasks_deadline())
+    metrics.observe_stage(f"validate_task:{'coalesced' if shared else path}", time.perf_counter() - started)
+    return result
+
+async def _lookup_task(_id, task_id, deadline):
+    snap = await get_db().task_snapshots.find_one({"_id": _id, "deleted": {"$ne": True}})
+    if snap:
+        result, path = (True, "ok", snap), "snapshot"
+    elif not notes_app.tasks_breaker.allow():
+        result, path = (None, "unavailable", None), "circuit_open"
+    else:
+        result, path = await _fetch_task_from_service(_id, task_id, deadline), "http_fallback"
+        if result[0] is None:
+            notes_app.tasks_breaker.record_failure()
+        else:
+            notes_app.tasks_breaker.record_success()
+    notes_app.task_validation_cache.store(str(_id), result)
+    return result, path
+
+def _add_timing(kind, seconds):
+    # o single-flight pode rodar fora de uma requisição (ex.: validação disparada por testes)
+    if has_request_context():
+        timings = g.setdefault("dependency_timings", {})
+        total, calls = timings.get(kind, (0.0, 0))
+        timings[kind] = (total + seconds, calls + 1)
+
+async def _get_with_retry(url, deadline):
+    """Mesma política de app._get_task_with_deadline; aqui o prazo corta também a tentativa em curso."""
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise httpx.TimeoutException(f"Prazo de {notes_app.TASKS_DEADLINE}s esgotado")
+        try:
+            r = await asyncio.wait_for(get_http_client().get(url), min(notes_app.TASKS_TRY_TIMEOUT, remaining))
+            if r.status_code not in notes_app.TASKS_RETRY_STATUSES:
+                return r
+            error = None
+        except asyncio.TimeoutError:
+            r, error = None, httpx.TimeoutException("Tentativa excedeu o tempo limite")
+        except httpx.HTTPError as e:
+            r, error = None, e
+        backoff = notes_app.TASKS_RETRY_BACKOFF * (2 ** attempt)
+        if attempt >= notes_app.TASKS_RETRIES or time.monotonic() + backoff >= deadline:
+            if error is not None:
+                raise error
+            return r
+        await asyncio.sleep(backoff)
+        attempt += 1
+
+async def _fetch_task_from_service(_id, task_id, deadline=None):
+    started = time.perf_counter()
+    try:
+        r = await _get_with_retry(f"{notes_app.TASKS_SERVICE_URL}/tarefas/{task_id}", deadline or _tasks_deadline())
+    except httpx.HTTPError as e:
+        app.logger.warning("Fallback async para tasks-service falhou: %s", e)
+        return None, "unavailable", None
+    finally:
+        _add_timing("upstream", time.perf_counter() - started)
+
+    if r.status_code == 200:
+        task = r.json()
+        try:
+            snapshot = notes_app.build_task_snapshot(task_id, task)
+            await get_db().task_snapshots.replace_one(snapshot_guard(snapshot), snapshot, upsert=True)
+        except DuplicateKeyError:
+            pass  # a sincronização já gravou uma versão mais nova
+        except Exception as e:
+            app.logger.warning("Falha ao persistir snapshot vindo do tasks-service: %s", e)
+        return True, "ok", task
+    elif r.status_code == 404:
+        return False, "not_found", None
+    return None, "unavailable", None
+
+# ---------------------------------------------------------------------
+# Rotas da API
+# ---------------------------------------------------------------------
+async def _stream_notes(cursor, limit):
+    """Versão async de app._stream_notes: chunks de NOTES_STREAM_CHUNK notas (já no formato da resposta)."""
+    dumps = app.json.dumps
+    chunk_size = notes_app.NOTES_STREAM_CHUNK
+    buf = []
+    count = 0
+    last_id = None
+    next_cursor = None
+    yield '{"items":[' if limit is not None else "["
+    async for note in cursor:
+        if limit is not None and count == limit:
+            next_cursor = str(last_id)
+            break
+        last_id = note["id"]
+        buf.append(note)
+        count += 1
+        if len(buf) >= chunk_size:
+            yield ("," if count > len(buf) else "") + dumps(buf)[1:-1]
+            buf = []
+    if buf:
+        yield ("," if count > len(buf) else "") + dumps(buf)[1:-1]
+    yield "]" if limit is None else '],"next_cursor":' + dumps(next_cursor) + "}"
+
+# ---------------------------------------------------------------------
+# ETag / GET condicional (mesmos marcadores de app.py)
+# ---------------------------------------------------------------------
+async def _bump_change_markers(task_ids):
+    try:
+        await get_db().change_markers.bulk_write(bump_ops(task_ids), ordered=False)
+    except Exception as e:
+        current_app.logger.warning("Falha ao atualizar marcadores de mudança: %s", e)
+
+async def _conditional(marker):
+    etag = compute_etag(await get_db().change_markers.find_one({"_id": marker}), request.full_path)
+    if etag in request.if_none_match:
+        return etag, notes_app._cacheable(Response("", status=304), etag)
+    return etag, None
+
+@app.route("/notes", methods=["GET"])
+@requires_auth()
+async def get_notes():
+    try:
+        fields = notes_app.parse_note_fields(request.args.get("fields"))
+        paginated = "limit" in request.args or "after" in request.args
+        limit, after = notes_app._parse_page_args(request.args) if paginated else (None, None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    etag, not_modified = await _conditional(NOTES_MARKER)
+    if not_modified is not None:
+        return not_modified
+
+    query = {"_id": {"$gt": after}} if after else {}
+    pipeline = shaped_pipeline(query, notes_app.note_shape(fields),
+                               sort={"_id": 1} if paginated else None, limit=limit + 1 if paginated else None)
+
+    if request.args.get("stream", "").lower() in ("1", "true", "yes"):
+        cursor = get_db().notes.aggregate(pipeline, batchSize=notes_app.NOTES_STREAM_CHUNK)
+        return notes_app._cacheable(Response(_stream_notes(cursor, limit), mimetype="application/json"), etag)
+
+    output = [note async for note in get_db().notes.aggregate(pipeline)]
+    next_cursor = None
+    if paginated and len(output) > limit:
+        output = output[:limit]
+        next_cursor = str(output[-1]["id"])
+
+    if paginated:
+        return notes_app._cacheable(jsonify({"items": output, "next_cursor": next_cursor}), etag), 200
+    return notes_app._cacheable(jsonify(output), etag), 200
+
+@app.route("/tarefas/<task_id>/notes", methods=["GET"])
+@requires_auth()
+async def get_notes_for_task(task_id):
+    valid, reason, snapshot = await validate_task_id_hybrid(task_id)
+    if valid is True:
+        etag, not_modified = await _conditional(task_marker(ObjectId(task_id)))
+        if not_modified is not None:
+            return not_modified
+        pipeline = shaped_pipeline({"task_id": ObjectId(task_id)}, notes_app.TASK_NOTE_SHAPE, sort={"criado_em": 1})
+        notes = [n async for n in get_db().notes.aggregate(pipeline)]
+        return notes_app._cacheable(jsonify(notes), etag), 200
+    elif valid is False:
+        if reason == "invalid_id":
+            return jsonify({"error": "Invalid task_id"}), 400
+        return jsonify({"error": "Task not found"}), 404
+    else:
+        return jsonify({"error": "Não foi possível validar a task no momento. Tente novamente mais tarde."}), 503
+
+async def _claim_idempotency_key(key, note_id, resource):
+    """Versão async de app._claim_idempotency_key (None = reservada; senão a resposta 200/409)."""
+    engine = notes_app.idempotency
+    db = get_db()
+    for _attempt in range(2):
+        try:
+            await db.idempotency.insert_one(engine.new_record("notes", key, note_id, resource))
+            return None
+        except DuplicateKeyError:
+            existing = await db.idempotency.find_one({"collection": "notes", "idempotency_key": key})
+        if existing is None:
+            continue
+        exists = False
+        if existing.get("state") == "pending" and "resource_id" in existing:
+            exists = await db.notes.find_one({"_id": existing["resource_id"]}, {"_id": 1}) is not None
+        outcome = engine.resolve(existing, lambda _id: exists)
+        if outcome == REPLAY:
+            if existing.get("state") == "pending":
+                await db.idempotency.update_one({"_id": existing["_id"]}, {"$set": {"state": "done"}})
+            return jsonify(existing["resource"]), 200
+        if outcome == IN_PROGRESS:
+            break
+        await db.idempotency.delete_one({"_id": existing["_id"], "state": "pending", "created_at": existing.get("created_at")})
+    return jsonify({"error": "A request with this Idempotency-Key is still in progress"}), 409
+
+async def _release_idempotency_key(key):
+    await get_db().idempotency.delete_one({"_id": record_id("notes", key), "state": "pending"})
+
+@app.route("/notes", methods=["POST"])
+@requires_auth()
+async def create_note():
+    data = await request.get_json(silent=True) or {}
+    title = data.get("title") or data.get("titulo")
+    content = data.get("content") or data.get("conteudo")
+    task_id = data.get("task_id") or data.get("taskId")
+
+    if not title or not content or not task_id:
+        return jsonify({"error": "Missing title/content/task_id"}), 400
+
+    try:
+        db_task_id = ObjectId(task_id)
+    except Exception:
+        db_task_id = None
+
+    # mesmo protocolo de app.py: reserva atômica da chave antes de validar/gravar
+    idempotency_key = request.headers.get("Idempotency-Key")
+    note_id = ObjectId()
+    resource = {"id": str(note_id), "title": title, "content": content, "task_id": str(db_task_id)}
+    reserved = bool(idempotency_key) and db_task_id is not None
+    if reserved:
+        replay = await _claim_idempotency_key(idempotency_key, note_id, resource)
+        if replay is not None:
+            return replay
+
+    valid, reason, snapshot = await validate_task_id_hybrid(task_id)
+    unverified = valid is None and notes_app.TASKS_ACCEPT_UNKNOWN
+    if valid is True or unverified:
+        note_doc = {
+            "_id": note_id,
+            "title": title,
+            "content": content,
+            "task_id": db_task_id,
+            "autor": (g.get("current_user") or {}).get("sub"),
+            "criado_em": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "rev": 1,
+        }
+        if unverified:
+            note_doc["task_unverified"] = True  # verificada depois pelo task_verifier de app.py
+        if reserved:
+            note_doc[RESOURCE_FIELD] = record_id("notes", idempotency_key)
+        try:
+            await get_db().notes.insert_one(note_doc)
+        except Exception:
+            if reserved:
+                await _release_idempotency_key(idempotency_key)
+            raise
+        await _bump_change_markers([db_task_id])
+        resp = jsonify(resource)
+        if unverified:
+            resp.headers["X-Task-Verification"] = "pending"
+        return resp, 201
+
+    if reserved:
+        await _release_idempotency_key(idempotency_key)
+    if valid is False:
+        if reason == "invalid_id":
+            return jsonify({"error": "Invalid task_id"}), 400
+        return jsonify({"error": "Task not found"}), 400
+    else:
+        return jsonify({"error": "Task service unavailable. Tente novamente mais tarde."}), 503
+
+@app.route("/notes/<id>", methods=["PUT"])
+@requires_auth()
+async def update_note(id):
+    try:
+        _id = ObjectId(id)
+    except InvalidId:
+        return jsonify({"error": "Invalid id"}), 400
+
+    data = await request.get_json(silent=True) or {}
+    updated = await get_db().notes.find_one_and_update(
+        {"_id": _id},
+        {"$set": {"title": data.get("title") or data.get("titulo"), "content": data.get("content") or data.get("conteudo")},
+         "$inc": {"rev": 1}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not updated:
+        return jsonify({"error": "Note not found"}), 404
+    await _bump_change_markers([updated.get("task_id")])
+
+    resp = jsonify({"id": str(updated["_id"]), "title": updated.get("title"), "content": updated.get("content")})
+    resp.set_etag(f"{updated['_id']}-{updated['rev']}")
+    return resp, 200
+
+@app.route("/notes/<id>", methods=["DELETE"])
+@requires_auth()
+async def delete_note(id):
+    try:
+        _id = ObjectId(id)
+    except InvalidId:
+        return jsonify({"error": "Invalid id"}), 400
+
+    deleted = await get_db().notes.find_one_and_delete({"_id": _id}, projection={"task_id": 1, RESOURCE_FIELD: 1})
+    if deleted is None:
+        return jsonify({"error": "Note not found"}), 404
+    await _bump_change_markers([deleted.get("task_id")])
+    if deleted.get(RESOURCE_FIELD) is not None:
+        # mesmo que IdempotencyEngine.resource_removed: o replay devolve a resposta em vez de recriar
+        await get_db().idempotency.update_one({"_id": deleted[RESOURCE_FIELD]}, {"$set": {"state": "done"}})
+    return jsonify({"message": "Note deleted"}), 200
@@ -1,39 +1,222 @@
 # auth.py (corrigido para compatibilidade com Flask moderno e pytest)
 import os
 import time
+import hashlib
+import logging
+import threading
 import requests
 from functools import wraps
 from flask import request, jsonify, current_app, g
-from jose import jwt
-from jose.exceptions import JWTError, ExpiredSignatureError, JWTClaimsError
+from jose import jwt, jwk
+from jose.exceptions import JWTError, ExpiredSignatureError, JWTClaimsError, JWKError
+
+import metrics
+from task_cache import TTLCache
 
 AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
 API_AUDIENCE = os.getenv("API_AUDIENCE")
 JWKS_URL = f"https://{AUTH0_DOMAIN}/.well-known/jwks.json"
 ALGORITHMS = ["RS256"]
 
-# in-memory JWKS cache
-_cached_jwks = None
-_cached_jwks_ts = 0
-JWKS_CACHE_TTL = 60 * 60  # 1 hour
+JWKS_CACHE_TTL = int(os.getenv("JWKS_CACHE_TTL", 60 * 60))  # 1 hour
+# intervalo mínimo entre refetches forçados por kid desconhecido (rotação de chaves)
+JWKS_MIN_REFRESH_INTERVAL = float(os.getenv("JWKS_MIN_REFRESH_INTERVAL", 30))
+
+logger = logging.getLogger(__name__)
+
+# tokens já verificados: sha256(token) -> payload, expira no `exp` do token
+# (limitado por JWT_CACHE_MAX_TTL para que rotação de chaves seja percebida)
+JWT_CACHE_MAX_TTL = float(os.getenv("JWT_CACHE_MAX_TTL", 300))
+_verified_tokens = TTLCache(maxsize=int(os.getenv("JWT_CACHE_MAXSIZE", 10000)), ttl=JWT_CACHE_MAX_TTL,
+                           on_evict=metrics.eviction_counter("verified_tokens"),
+                           on_hit=metrics.hit_counter("verified_tokens"),
+                           on_miss=metrics.miss_counter("verified_tokens"))
 
 class AuthError(Exception):
     def __init__(self, err, status_code):
         self.error = err
         self.status_code = status_code
 
-def get_jwks():
-    global _cached_jwks, _cached_jwks_ts
-    if _cached_jwks and (time.time() - _cached_jwks_ts) < JWKS_CACHE_TTL:
-        return _cached_jwks
+def parse_jwks(jwks):
+    """Constrói uma vez os objetos de chave RSA do JWKS, indexados por kid."""
+    keys = {}
+    for key in jwks.get("keys", []):
+        kid = key.get("kid")
+        if not kid or key.get("kty") != "RSA":
+            continue
+        try:
+            keys[kid] = jwk.construct({
+                "kty": key.get("kty"),
+                "kid": kid,
+                "use": key.get("use"),
+                "n": key.get("n"),
+                "e": key.get("e")
+            }, algorithm="RS256")
+        except JWKError:
+            continue
+    return keys
+
+def _fetch_jwks():
     r = requests.get(JWKS_URL, timeout=5)
     r.raise_for_status()
-    _cached_jwks = r.json()
-    _cached_jwks_ts = time.time()
-    return _cached_jwks
+    return r.json()
+
+class JWKSCache:
+    """
+    JWKS em memória, protegido por lock, com as chaves já construídas por kid.
+    - dentro do TTL: devolve a cópia local;
+    - TTL vencido: devolve a cópia antiga e atualiza numa thread de fundo (stale-while-revalidate);
+    - sem cópia: busca síncrona, uma única por vez (as demais threads esperam o resultado);
+    - kid desconhecido: um refetch forçado, no máximo a cada `min_refresh_interval` segundos.
+    """
+
+    def __init__(self, fetch=_fetch_jwks, ttl=JWKS_CACHE_TTL, min_refresh_interval=JWKS_MIN_REFRESH_INTERVAL,
+                 clock=time.monotonic):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._clock = clock
+        self._fetch_lock = threading.Lock()  # serializa as buscas
+        self._lock = threading.Lock()        # protege _refreshing
+        self._refreshing = False
+        self._last_forced = None
+        # (jwks, chaves por kid, instante da busca), trocado de forma atômica
+        self._state = (None, {}, 0.0)
+
+    def set(self, jwks):
+        self._state = (jwks, parse_jwks(jwks), self._clock())
+
+    def clear(self):
+        self._state = (None, {}, 0.0)
+        self._last_forced = None
+
+    def _refresh_locked(self):
+        self.set(self._fetch())
+
+    def _is_fresh(self, fetched_at):
+        return (self._clock() - fetched_at) < self.ttl
+
+    def get(self):
+        jwks, _keys, fetched_at = self._state
+        if jwks is not None:
+            if not self._is_fresh(fetched_at):
+                self._refresh_in_background()
+            return jwks
+
+        with self._fetch_lock:
+            jwks = self._state[0]
+            if jwks is None:
+                self._refresh_locked()
+                jwks = self._state[0]
+        return jwks
+
+    def get_key(self, kid):
+        self.get()
+        key = self._state[1].get(kid)
+        if key is not None or not kid:
+            return key
+
+        with self._fetch_lock:
+            key = self._state[1].get(kid)  # outra thread pode ter acabado de atualizar
+            if key is not None:
+                return key
+            now = self._clock()
+            if self._last_forced is not None and now - self._last_forced < self.min_refresh_interval:
+                return None
+            self._last_forced = now
+            try:
+                self._refresh_locked()
+            except Exception as e:
+                logger.warning("Refetch do JWKS para kid desconhecido falhou: %s", e)
+                return None
+        return self._state[1].get(kid)
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="jwks-refresh", daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            with self._fetch_lock:
+                if not self._is_fresh(self._state[2]):
+                    self._refresh_locked()
+        except Exception as e:
+            logger.warning("Atualização do JWKS em segundo plano falhou (mantendo cópia antiga): %s", e)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+_jwks_cache = JWKSCache()
+
+def get_jwks():
+    return _jwks_cache.get()
+
+def get_signing_key(kid):
+    return _jwks_cache.get_key(kid)
+
+def _token_cache_key(token):
+    return hashlib.sha256(token.encode()).digest()
+
+def verify_token(token, use_cache=True):
+    """
+    Valida o JWT (assinatura RS256, audience, issuer, exp) e retorna o payload.
+    Tokens já verificados são servidos do cache até o seu `exp`.
+    """
+    cache_key = _token_cache_key(token)
+    if use_cache:
+        payload = _verified_tokens.get(cache_key)
+        if payload is not None:
+            return payload
+
+    try:
+        unverified_header = jwt.get_unverified_header(token)
+    except Exception:
+        raise AuthError({"code":"invalid_header","description":"Invalid header"}, 401)
+
+    with metrics.timed("get_jwks"):
+        rsa_key = get_signing_key(unverified_header.get("kid"))
+    if rsa_key is None:
+        raise AuthError({"code":"invalid_header","description":"Unable to find appropriate key"}, 401)
+
+    decode_started = time.perf_counter()
+    try:
+        payload = jwt.decode(
+            token,
+            rsa_key,
+            algorithms=ALGORITHMS,
+            audience=API_AUDIENCE,
+            issuer=f"https://{AUTH0_DOMAIN}/"
+        )
+    except ExpiredSignatureError:
+        raise AuthError({"code":"token_expired","description":"token is expired"}, 401)
+    except JWTClaimsError:
+        raise AuthError({"code":"invalid_claims","description":"incorrect claims, please check the audience and issuer"}, 401)
+    except JWTError:
+        raise AuthError({"code":"invalid_token","description":"Unable to parse authentication token."}, 401)
+    except Exception:
+        raise AuthError({"code":"invalid_header","description":"Unable to parse authentication token."}, 401)
+    finally:
+        metrics.observe_stage("jwt_decode", time.perf_counter() - decode_started)
+
+    if use_cache:
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            ttl = min(exp - time.time(), JWT_CACHE_MAX_TTL)
+            if ttl > 0:
+                _verified_tokens.set(cache_key, payload, ttl=ttl)
+    return payload
+
+def cached_token_payload(token):
+    """Payload de um token já verificado (ou None), sem tocar no JWKS."""
+    return _verified_tokens.get(_token_cache_key(token))
 
 def _get_token_auth_header():
-    auth = request.headers.get("Authorization", None)
+    return parse_bearer_header(request.headers.get("Authorization", None))
+
+def parse_bearer_header(auth):
     if not auth:
         raise AuthError({"code":"authorization_header_missing",
                          "description":"Authorization header is expected"}, 401)
@@ -62,42 +245,7 @@ def requires_auth(required_scope=None):
                 pass
 
             token = _get_token_auth_header()
-            jwks = get_jwks()
-
-            try:
-                unverified_header = jwt.get_unverified_header(token)
-            except Exception:
-                raise AuthError({"code":"invalid_header","description":"Invalid header"}, 401)
-
-            rsa_key = {}
-            for key in jwks.get("keys", []):
-                if key.get("kid") == unverified_header.get("kid"):
-                    rsa_key = {
-                        "kty": key.get("kty"),
-                        "kid": key.get("kid"),
-                        "use": key.get("use"),
-                        "n": key.get("n"),
-                        "e": key.get("e")
-                    }
-            if not rsa_key:
-                raise AuthError({"code":"invalid_header","description":"Unable to find appropriate key"}, 401)
-
-            try:
-                payload = jwt.decode(
-                    token,
-                    rsa_key,
-                    algorithms=ALGORITHMS,
-                    audience=API_AUDIENCE,
-                    issuer=f"https://{AUTH0_DOMAIN}/"
-                )
-            except ExpiredSignatureError:
-                raise AuthError({"code":"token_expired","description":"token is expired"}, 401)
-            except JWTClaimsError:
-                raise AuthError({"code":"invalid_claims","description":"incorrect claims, please check the audience and issuer"}, 401)
-            except JWTError:
-                raise AuthError({"code":"invalid_token","description":"Unable to parse authentication token."}, 401)
-            except Exception:
-                raise AuthError({"code":"invalid_header","description":"Unable to parse authentication token."}, 401)
+            payload = verify_token(token)
 
             # check scope if requested
             if required_scope:
@@ -0,0 +1,48 @@
+# benchmarks/bench_auth.py
+# Custo de autenticação por requisição: caminho antigo x chaves pré-construídas x cache de tokens.
+#   python -m benchmarks.bench_auth [--iterations N] [--output arquivo.json]
+import argparse
+
+from jose import jwt
+
+import auth
+from benchmarks.common import measure, write_results
+from tests.stubs import RSAIssuer
+
+
+def legacy_verify(token):
+    """Cópia do caminho anterior: varre o JWKS e reconstrói a chave a cada requisição."""
+    jwks = auth.get_jwks()
+    unverified_header = jwt.get_unverified_header(token)
+    rsa_key = {}
+    for key in jwks.get("keys", []):
+        if key.get("kid") == unverified_header.get("kid"):
+            rsa_key = {"kty": key.get("kty"), "kid": key.get("kid"), "use": key.get("use"),
+                       "n": key.get("n"), "e": key.get("e")}
+    return jwt.decode(token, rsa_key, algorithms=auth.ALGORITHMS, audience=auth.API_AUDIENCE,
+                      issuer=f"https://{auth.AUTH0_DOMAIN}/")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--bits", type=int, default=2048)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    issuer = RSAIssuer(bits=args.bits)
+    # JWKS servido do cache em memória: mede só o custo por requisição, sem rede
+    auth.AUTH0_DOMAIN, auth.API_AUDIENCE = issuer.domain, issuer.audience
+    auth._jwks_cache.set(issuer.jwks())
+    token = issuer.token()
+
+    results = {
+        "legacy_scan_and_decode": measure(lambda: legacy_verify(token), args.iterations),
+        "preparsed_key_no_cache": measure(lambda: auth.verify_token(token, use_cache=False), args.iterations),
+        "verified_token_cache_hit": measure(lambda: auth.verify_token(token), args.iterations * 20),
+    }
+    write_results("auth", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
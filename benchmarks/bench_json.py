@@ -0,0 +1,91 @@
+# benchmarks/bench_json.py
+# Serialização de listagens grandes (10k notas): caminho antigo (dict por nota + json da stdlib com
+# sort_keys) x notas já no formato da resposta, com o provider "std" e com orjson.
+#   python -m benchmarks.bench_json [--notes 10000] [--iterations N] [--output arquivo.json]
+# Mede só a serialização (notas já lidas) e a rota GET /notes completa (store em memória, sem banco).
+import argparse
+
+from bson.objectid import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+import app as notes_app
+import json_provider
+from benchmarks.common import measure, write_results
+from storage import MemoryNotesStore
+
+
+def make_notes(count):
+    tasks = [ObjectId() for _ in range(50)]
+    return [{"_id": ObjectId(), "title": f"nota {i}", "content": "conteúdo da nota " * 10,
+             "task_id": tasks[i % len(tasks)], "autor": "auth0|bench", "criado_em": "2024-01-01T00:00:00Z",
+             "rev": 1} for i in range(count)]
+
+
+def bench_serialization(notes, iterations):
+    """
+    Só a serialização, a partir do que o driver entrega: documentos crus (caminho antigo, convertidos
+    por serialize_note) ou já no formato da resposta (o $project de storage.shape_projection).
+    """
+    fields = notes_app.DEFAULT_NOTE_FIELDS
+    store = MemoryNotesStore()
+    store.insert_many(notes)
+    shaped = store.list(shape=notes_app.note_shape(fields))
+    legacy = DefaultJSONProvider(notes_app.app)  # provider padrão do Flask (sort_keys, sem ObjectId)
+
+    results = {
+        "legacy_dicts_stdlib_json": measure(
+            lambda: legacy.dumps([notes_app.serialize_note(n, fields) for n in notes]), iterations, warmup=2),
+    }
+    for name, provider_class in json_provider.PROVIDERS.items():
+        if name == "orjson" and json_provider.orjson is None:
+            continue
+        provider = provider_class(notes_app.app)
+        results[f"shaped_{name}"] = measure(lambda: provider.dumps(shaped), iterations, warmup=2)
+    return results
+
+
+def bench_route(notes, iterations):
+    """
+    GET /notes e GET /notes?stream=1 completos (sem auth) com cada provider. O store em memória
+    monta o formato da resposta em Python; no Mongo esse trabalho é do servidor.
+    """
+    results = {}
+    saved_json, saved_testing = notes_app.app.json, notes_app.app.config.get("TESTING")
+    saved_storage = notes_app.NOTES_STORAGE
+    notes_app.app.config["TESTING"] = True
+    notes_app.use_storage("memory")
+    try:
+        notes_app.notes_store.insert_many(notes)
+        client = notes_app.app.test_client()
+        for name in json_provider.PROVIDERS:
+            if name == "orjson" and json_provider.orjson is None:
+                continue
+            json_provider.init_app(notes_app.app, name)
+            results[f"GET /notes [{name}]"] = measure(lambda: client.get("/notes").data, iterations, warmup=2)
+            results[f"GET /notes?stream=1 [{name}]"] = measure(
+                lambda: client.get("/notes?stream=1").data, iterations, warmup=2)
+    finally:
+        notes_app.app.json = saved_json
+        notes_app.app.config["TESTING"] = saved_testing
+        notes_app.use_storage(saved_storage)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    notes = make_notes(args.notes)
+    results = {f"{k} ({args.notes} notas)": v for k, v in bench_serialization(notes, args.iterations).items()}
+    results.update({f"{k} ({args.notes} notas)": v for k, v in bench_route(notes, args.iterations).items()})
+    base = results[f"legacy_dicts_stdlib_json ({args.notes} notas)"]["mean_us"]
+    for stats in results.values():
+        stats["speedup_vs_legacy"] = round(base / stats["mean_us"], 2) if stats["mean_us"] else None
+    write_results("json", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
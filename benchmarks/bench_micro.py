@@ -0,0 +1,115 @@
+# benchmarks/bench_micro.py
+# Micro-benchmarks dos caminhos quentes por requisição: requires_auth, validate_task_id_hybrid
+# (cache / snapshot / fallback HTTP) e os laços de serialização das listagens.
+#   python -m benchmarks.bench_micro [--iterations N] [--notes N] [--output arquivo.json]
+import argparse
+import itertools
+
+from bson.objectid import ObjectId
+
+import app as notes_app
+import auth
+from benchmarks.common import measure, write_results
+from benchmarks.harness import ServiceUnderTest
+from storage import MemoryNotesStore
+
+
+def bench_auth(sut, iterations):
+    @auth.requires_auth()
+    def endpoint():
+        return None
+
+    headers = {"Authorization": f"Bearer {sut.token()}"}
+
+    def call(clear_cache=False):
+        if clear_cache:
+            auth._verified_tokens.clear()
+        with notes_app.app.test_request_context("/notes", headers=headers):
+            endpoint()
+
+    return {
+        "requires_auth:token_cache_hit": measure(call, iterations * 10),
+        "requires_auth:verify_rs256": measure(lambda: call(clear_cache=True), iterations),
+    }
+
+
+def bench_validate_task(sut, iterations):
+    cache = notes_app.task_validation_cache
+    hot = sut.task_ids[0]
+    notes_app.validate_task_id_hybrid(hot)
+
+    snapshotted = sut.task_ids[:max(1, len(sut.task_ids) // 2)]
+    for task_id in snapshotted:
+        notes_app.snapshot_store.upsert({"_id": ObjectId(task_id), "titulo": "T"})
+    cycle = itertools.cycle(snapshotted)
+
+    def from_snapshot():
+        cache.clear()
+        notes_app.validate_task_id_hybrid(next(cycle))
+
+    # cada iteração usa uma task nova: sem cache nem snapshot, vai ao tasks-service falso
+    fresh = iter([str(ObjectId()) for _ in range(iterations + 50)])
+
+    def from_service():
+        task_id = next(fresh)
+        sut.tasks_service.tasks[task_id] = {"titulo": "T"}
+        notes_app.validate_task_id_hybrid(task_id)
+
+    return {
+        "validate_task:cache": measure(lambda: notes_app.validate_task_id_hybrid(hot), iterations * 10),
+        "validate_task:snapshot": measure(from_snapshot, iterations),
+        "validate_task:http_fallback": measure(from_service, iterations),
+    }
+
+
+def bench_serialization(notes_count, iterations):
+    task_id = ObjectId()
+    notes = [{"_id": ObjectId(), "title": f"nota {i}", "content": "conteúdo " * 20, "task_id": task_id,
+              "autor": "auth0|bench", "criado_em": "2024-01-01T00:00:00Z", "rev": 1} for i in range(notes_count)]
+    all_fields = tuple(notes_app.NOTE_FIELDS)
+    store = MemoryNotesStore()  # as rotas recebem as notas do store já no formato da resposta
+    store.insert_many(notes)
+
+    def stream(fields, limit=None):
+        with notes_app.app.app_context():
+            for _ in notes_app._stream_notes(iter(store.list(shape=notes_app.note_shape(fields))), limit):
+                pass
+
+    def task_listing():
+        with notes_app.app.app_context():
+            notes_app.app.json.dumps(store.find_by_tasks([task_id], shape=notes_app.TASK_NOTE_SHAPE))
+
+    label = f"{notes_count}_notes"
+    return {
+        f"serialize_note:{label}": measure(lambda: [notes_app.serialize_note(n) for n in notes], iterations),
+        f"serialize_note_all_fields:{label}": measure(
+            lambda: [notes_app.serialize_note(n, all_fields) for n in notes], iterations),
+        f"stream_notes:{label}": measure(lambda: stream(notes_app.DEFAULT_NOTE_FIELDS), iterations),
+        f"stream_notes_paginated:{label}": measure(
+            lambda: stream(notes_app.DEFAULT_NOTE_FIELDS, limit=notes_count), iterations),
+        f"task_notes_json:{label}": measure(task_listing, iterations),
+    }
+
+
+def run(iterations=200, notes=1000, storage="memory", bits=2048):
+    results = {}
+    with ServiceUnderTest(storage=storage, bits=bits) as sut:
+        results.update(bench_auth(sut, iterations))
+        results.update(bench_validate_task(sut, iterations))
+    results.update(bench_serialization(notes, max(1, iterations // 10)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--notes", type=int, default=1000, help="notas por medição de serialização")
+    parser.add_argument("--storage", default="memory", choices=("memory", "mongomock"))
+    parser.add_argument("--bits", type=int, default=2048)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    write_results("micro", run(args.iterations, args.notes, args.storage, args.bits), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/bench_search.py
+# Busca em notas: varredura completa (o que os clientes fazem hoje com GET /notes) x GET /notes/search.
+#   python -m benchmarks.bench_search [--notes N] [--iterations N] [--mongo-uri URI] [--output arquivo.json]
+# Sem --mongo-uri usa mongomock (índice invertido em processo); com ele, o índice de texto do Mongo
+# (a coleção bench_search.notes é recriada).
+import argparse
+import random
+import time
+
+import mongomock
+from bson.objectid import ObjectId
+
+from app import DEFAULT_NOTE_FIELDS, note_projection, serialize_note
+from benchmarks.common import measure, write_results
+from search import NoteSearch, tokenize
+from storage import MongoNotesStore
+
+
+def make_vocabulary(size, rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)]
+
+
+def make_notes(count, vocabulary, tasks, rng):
+    return [{
+        "_id": ObjectId(),
+        "title": " ".join(rng.choices(vocabulary, k=3)),
+        "content": " ".join(rng.choices(vocabulary, k=30)),
+        "task_id": rng.choice(tasks),
+        "criado_em": "2024-01-01T00:00:00Z",
+    } for _ in range(count)]
+
+
+def full_scan(db, query):
+    """Baixa todas as notas serializadas e filtra no cliente, como os consumidores fazem hoje."""
+    terms = set(tokenize(query))
+    notes = [serialize_note(n, DEFAULT_NOTE_FIELDS) for n in db.notes.find({}, note_projection(DEFAULT_NOTE_FIELDS))]
+    return [n for n in notes if terms & set(tokenize(n["title"]) + tokenize(n["content"]))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--scan-iterations", type=int, default=3)
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(5000, rng)
+    tasks = [ObjectId() for _ in range(200)]
+
+    if args.mongo_uri:
+        import pymongo
+        db = pymongo.MongoClient(args.mongo_uri)["bench_search"]
+        db.notes.drop()
+    else:
+        db = mongomock.MongoClient()["bench_search"]
+    started = time.perf_counter()
+    notes = make_notes(args.notes, vocabulary, tasks, rng)
+    for start in range(0, len(notes), 10_000):
+        db.notes.insert_many(notes[start:start + 10_000])
+    print(f"{args.notes} notas inseridas em {time.perf_counter() - started:.1f}s")
+
+    search = NoteSearch(MongoNotesStore(lambda: db))
+    if args.mongo_uri:
+        search.ensure_index()
+    projection = note_projection(DEFAULT_NOTE_FIELDS)
+    queries = [" ".join(rng.choices(vocabulary, k=2)) for _ in range(32)]
+    task_id = tasks[0]
+
+    started = time.perf_counter()
+    search.search(queries[0], projection)  # monta o índice invertido (no-op com $text)
+    build_seconds = time.perf_counter() - started
+
+    pick = iter(range(10 ** 9))
+    next_query = lambda: queries[next(pick) % len(queries)]
+
+    results = {
+        "full_scan_client_filter": measure(lambda: full_scan(db, next_query()), args.scan_iterations, warmup=1),
+        "search_top20": measure(lambda: search.search(next_query(), projection, limit=20), args.iterations),
+        "search_top20_by_task": measure(
+            lambda: search.search(next_query(), projection, task_id=task_id, limit=20), args.iterations),
+        "search_page_5": measure(
+            lambda: search.search(next_query(), projection, limit=20, offset=80), args.iterations),
+    }
+    if search._index is not None:
+        # só o ranking no índice invertido: no mongomock o $in que busca as 20 notas é uma varredura
+        results["inverted_index_rank_only"] = measure(
+            lambda: search._index.search(next_query(), limit=21), args.iterations * 10)
+    results["setup"] = {"notes": args.notes, "backend": search._mode, "index_build_s": round(build_seconds, 3)}
+    write_results("search", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
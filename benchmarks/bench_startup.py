@@ -0,0 +1,137 @@
+# benchmarks/bench_startup.py
+# Custo de subir o serviço com o perfil de gunicorn.conf.py, com e sem preload (Linux: lê /proc).
+#   python -m benchmarks.bench_startup [--workers 4] [--worker-class gthread] [--imports 5] [--output arquivo.json]
+# - import do app num interpretador novo (o que cada worker paga sem preload)
+# - tempo até o primeiro 200 em /health e até todos os workers estarem de pé
+# - memória por worker: RSS, PSS (páginas compartilhadas divididas entre os processos) e USS
+#   (só do worker); com preload o código importado fica compartilhado com o master e o USS cai
+# Usa NOTES_STORAGE=memory: mede o processo, não o Mongo.
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+from benchmarks.common import write_results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _env(**extra):
+    env = {**os.environ, "NOTES_STORAGE": "memory", "LOG_LEVEL": "WARNING", "ACCESS_LOG_SAMPLE_RATE": "0"}
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    env.update(extra)
+    return env
+
+
+def bench_import(runs):
+    """Segundos para `import app` num processo novo (mediana de `runs`)."""
+    code = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=_env(NOTES_WORKER_INIT="post_fork"),
+                             capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return {"runs": runs, "median_ms": round(statistics.median(samples) * 1e3, 1),
+            "min_ms": round(min(samples) * 1e3, 1)}
+
+
+def children(pid):
+    """Pids dos filhos diretos de `pid` (varre /proc/*/stat)."""
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # o nome do processo pode ter espaços: os campos seguem o último ")"
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            found.append(int(entry))
+    return found
+
+
+def memory(pid):
+    """{"rss_kb", "pss_kb", "uss_kb"} de /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0])
+    return {"rss_kb": fields.get("Rss", 0), "pss_kb": fields.get("Pss", 0),
+            "uss_kb": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)}
+
+
+def bench_gunicorn(preload, workers, worker_class, timeout=60.0):
+    port = _free_port()
+    env = _env(GUNICORN_BIND=f"127.0.0.1:{port}", GUNICORN_WORKERS=str(workers),
+               GUNICORN_WORKER_CLASS=worker_class, GUNICORN_PRELOAD="true" if preload else "false")
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "app:create_app()"], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        first_ok = None
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            try:
+                if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                    first_ok = time.perf_counter() - started
+                    break
+            except requests.RequestException:
+                pass
+            time.sleep(0.01)
+        if first_ok is None:
+            raise RuntimeError("gunicorn não respondeu a /health")
+
+        # todos os workers de pé: cada um já importou o app (sem preload) e passou pelo post_fork
+        with requests.Session() as session:
+            while len(children(proc.pid)) < workers and time.perf_counter() < deadline:
+                session.get(f"http://127.0.0.1:{port}/health", timeout=1)
+            for _ in range(workers * 50):  # aquece todos os workers
+                session.get(f"http://127.0.0.1:{port}/health", timeout=1)
+        all_up = time.perf_counter() - started
+
+        per_worker = [memory(pid) for pid in children(proc.pid)]
+        return {
+            "first_health_ms": round(first_ok * 1e3, 1),
+            "all_workers_ms": round(all_up * 1e3, 1),
+            "workers": len(per_worker),
+            "master": memory(proc.pid),
+            **{f"worker_{field}_avg": round(statistics.mean(m[field] for m in per_worker))
+               for field in ("rss_kb", "pss_kb", "uss_kb")},
+        }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--worker-class", default="gthread", choices=("gthread", "gevent", "sync"))
+    parser.add_argument("--imports", type=int, default=5, help="medições do import do app")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = {"import app": bench_import(args.imports)}
+    for preload in (False, True):
+        label = f"gunicorn {args.worker_class} x{args.workers} [{'preload' if preload else 'no preload'}]"
+        results[label] = bench_gunicorn(preload, args.workers, args.worker_class)
+    write_results("startup", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
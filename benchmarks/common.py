@@ -0,0 +1,68 @@
+# benchmarks/common.py (utilitários de medição compartilhados pelos benchmarks)
+import json
+import os
+import platform
+import subprocess
+import time
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(durations):
+    """Resume uma lista de durações (segundos) em microssegundos."""
+    values = sorted(durations)
+    total = sum(values)
+    return {
+        "count": len(values),
+        "mean_us": round(total / len(values) * 1e6, 2) if values else 0.0,
+        "p50_us": round(percentile(values, 50) * 1e6, 2),
+        "p95_us": round(percentile(values, 95) * 1e6, 2),
+        "p99_us": round(percentile(values, 99) * 1e6, 2),
+        "ops_per_sec": round(len(values) / total, 1) if total else 0.0,
+    }
+
+
+def measure(fn, iterations=1000, warmup=50):
+    """Executa fn() `iterations` vezes (após aquecimento) e resume as latências."""
+    for _ in range(warmup):
+        fn()
+    durations = []
+    clock = time.perf_counter
+    for _ in range(iterations):
+        start = clock()
+        fn()
+        durations.append(clock() - start)
+    return summarize(durations)
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def write_results(name, results, path=None):
+    """Grava os resultados em JSON (benchmarks/results/<name>.json por padrão) e imprime um resumo."""
+    doc = {
+        "benchmark": name,
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "results": results,
+    }
+    if path is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"{name}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(doc, f, indent=2)
+    for label, stats in results.items():
+        print(f"{label:<40} {json.dumps(stats)}")
+    print(f"-> {path}")
+    return doc
@@ -0,0 +1,59 @@
+# benchmarks/compare.py
+# Compara dois JSONs de resultados (ex.: gravados em commits diferentes) e aponta regressões.
+#   python -m benchmarks.compare antes.json depois.json [--threshold 10]
+# Sai com código 1 se alguma latência (p50/p95/p99) piorar ou vazão cair mais que o limite (%).
+import argparse
+import json
+import sys
+
+LATENCY_KEYS = ("p50_us", "p95_us", "p99_us")
+THROUGHPUT_KEYS = ("ops_per_sec", "rps")
+
+
+def _flatten(results, prefix=""):
+    """{"c8": {"routes": {"create": {...}}}} -> {"c8": {...}, "c8/routes/create": {...}} (só dicts com métricas)."""
+    flat = {}
+    for key, value in results.items():
+        if not isinstance(value, dict):
+            continue
+        if any(k in value for k in LATENCY_KEYS + THROUGHPUT_KEYS):
+            flat[prefix + key] = value
+        flat.update(_flatten(value, f"{prefix}{key}/"))
+    return flat
+
+
+def compare(before, after, threshold=10.0):
+    """Retorna [(métrica, campo, antes, depois, variação_%, regressão)] para as métricas presentes nos dois."""
+    old, new = _flatten(before["results"]), _flatten(after["results"])
+    rows = []
+    for name in sorted(old.keys() & new.keys()):
+        for field in LATENCY_KEYS + THROUGHPUT_KEYS:
+            a, b = old[name].get(field), new[name].get(field)
+            if not a or b is None:
+                continue
+            change = (b - a) / a * 100.0
+            worse = change > threshold if field in LATENCY_KEYS else change < -threshold
+            rows.append((name, field, a, b, round(change, 1), worse))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="variação tolerada em %%")
+    args = parser.parse_args()
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    rows = compare(before, after, args.threshold)
+    for name, field, a, b, change, worse in rows:
+        print(f"{'!!' if worse else '  '} {name:<45} {field:<12} {a:>12} -> {b:>12} ({change:+.1f}%)")
+    sys.exit(1 if any(row[-1] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# benchmarks/harness.py (app real num servidor HTTP local, com tasks-service e JWKS falsos)
+import threading
+
+import mongomock
+from werkzeug.serving import make_server
+
+import access_log
+import app as notes_app
+import auth
+from tests.stubs import RSAIssuer, StubJWKSServer, StubTasksService
+from bson.objectid import ObjectId
+
+# globais do app trocados por use_storage() e pelo banco do benchmark
+_APP_STATE = ("NOTES_STORAGE", "notes_store", "snapshot_store", "idempotency_store", "idempotency", "note_search")
+
+
+class ServiceUnderTest:
+    """
+    Sobe o app Flask (auth RS256 de verdade, sem TESTING) numa thread, apontado para um
+    tasks-service falso com `tasks` tasks e um JWKS falso. `storage`: "memory", "mongomock"
+    ou "mongo" (com `mongo_uri`; usa o banco notes_bench, recriado).
+    Só uma instância por processo: reconfigura os módulos app/auth.
+    """
+
+    def __init__(self, storage="memory", tasks=200, task_delay=0.0, bits=2048, mongo_uri=None):
+        self.storage = storage
+        self.mongo_uri = mongo_uri
+        self.issuer = RSAIssuer(bits=bits)
+        self.task_ids = [str(ObjectId()) for _ in range(tasks)]
+        self.tasks_service = StubTasksService({t: {"titulo": f"task {i}"} for i, t in enumerate(self.task_ids)},
+                                              delay=task_delay)
+        self.jwks_server = StubJWKSServer(self.issuer)
+        self._server = None
+        self._saved = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def token(self, sub="auth0|bench"):
+        return self.issuer.token(sub=sub)
+
+    def _use_database(self):
+        if self.storage == "memory":
+            notes_app.use_storage("memory")
+            return
+        if self.storage == "mongo":
+            import pymongo
+            notes_app.mongo.cx = pymongo.MongoClient(self.mongo_uri)
+            notes_app.mongo.cx.drop_database("notes_bench")
+            notes_app.mongo.db = notes_app.mongo.cx["notes_bench"]
+            notes_app.use_storage("mongo")
+            notes_app.bootstrap_database()
+        else:
+            notes_app.mongo.cx = mongomock.MongoClient()
+            notes_app.mongo.db = notes_app.mongo.cx["notes_bench"]
+            notes_app.use_storage("mongo")
+
+    def start(self):
+        self.tasks_service.start()
+        self.jwks_server.start()
+        self._saved = (auth.AUTH0_DOMAIN, auth.API_AUDIENCE, auth.JWKS_URL, notes_app.TASKS_SERVICE_URL,
+                       notes_app.app.config.get("TESTING"), access_log.ACCESS_LOG_SAMPLE_RATE,
+                       {name: getattr(notes_app, name) for name in _APP_STATE},
+                       (notes_app.task_sync.store, notes_app.task_verifier.store),
+                       (notes_app.mongo.cx, notes_app.mongo.db))
+        auth.AUTH0_DOMAIN, auth.API_AUDIENCE = self.issuer.domain, self.issuer.audience
+        auth.JWKS_URL = self.jwks_server.jwks_url
+        auth._jwks_cache.clear()
+        auth._verified_tokens.clear()
+        notes_app.TASKS_SERVICE_URL = self.tasks_service.url
+        notes_app.app.config["TESTING"] = False
+        access_log.ACCESS_LOG_SAMPLE_RATE = 0.0  # só 5xx no log durante a carga
+        self._use_database()
+
+        self._server = make_server("127.0.0.1", 0, notes_app.app, threaded=True)
+        threading.Thread(target=self._server.serve_forever, name="bench-server", daemon=True).start()
+        return self
+
+    def seed(self, notes=0, snapshot_ratio=0.5):
+        """Notas iniciais (direto no store) e snapshots de parte das tasks (o resto cai no fallback HTTP)."""
+        synced = self.task_ids[:int(len(self.task_ids) * snapshot_ratio)]
+        for task_id in synced:
+            notes_app.snapshot_store.upsert({"_id": ObjectId(task_id), "titulo": "T"})
+        docs = [{"_id": ObjectId(), "title": f"nota {i}", "content": "conteúdo " * 20,
+                 "task_id": ObjectId(self.task_ids[i % len(self.task_ids)]),
+                 "criado_em": "2024-01-01T00:00:00Z", "rev": 1} for i in range(notes)]
+        if docs:
+            notes_app.notes_store.insert_many(docs)
+        return [d["_id"] for d in docs]
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.tasks_service.stop()
+        self.jwks_server.stop()
+        if self._saved is not None:
+            (auth.AUTH0_DOMAIN, auth.API_AUDIENCE, auth.JWKS_URL, notes_app.TASKS_SERVICE_URL,
+             notes_app.app.config["TESTING"], access_log.ACCESS_LOG_SAMPLE_RATE,
+             app_state, (notes_app.task_sync.store, notes_app.task_verifier.store), (notes_app.mongo.cx, notes_app.mongo.db)) = self._saved
+            # os mesmos objetos de antes (testes e outros módulos guardam referências a eles)
+            for name, value in app_state.items():
+                setattr(notes_app, name, value)
+            notes_app.task_validation_cache.clear()
+            self._saved = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,172 @@
+# benchmarks/loadtest.py
+# Carga mista contra o app real (HTTP + auth RS256), com tasks-service e JWKS falsos.
+#   python -m benchmarks.loadtest [--concurrency 1,8,32] [--duration 10] [--mix create=25,list=20,...]
+#                                 [--storage memory|mongomock|mongo] [--mongo-uri URI] [--output arquivo.json]
+# Para cada nível de concorrência: vazão total e, por rota, p50/p95/p99 e contagem de status.
+import argparse
+import random
+import threading
+import time
+
+import requests
+
+from benchmarks.common import summarize, write_results
+from benchmarks.harness import ServiceUnderTest
+
+ROUTES = ("create", "list", "task_list", "update", "delete")
+DEFAULT_MIX = "create=25,list=20,task_list=35,update=15,delete=5"
+
+
+def parse_mix(raw):
+    """`create=25,list=20` -> {"create": 25.0, "list": 20.0} (rotas omitidas ficam com peso 0)."""
+    mix = {}
+    for part in raw.split(","):
+        if not part.strip():
+            continue
+        route, _, weight = part.partition("=")
+        route = route.strip()
+        if route not in ROUTES:
+            raise ValueError(f"Unknown route in mix: {route}")
+        mix[route] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("Empty mix")
+    return mix
+
+
+class Workload:
+    """
+    Escolhe e executa uma operação do mix. Mantém o conjunto de notas vivas (compartilhado entre
+    as threads) para que update/delete acertem notas existentes; delete sem notas vira create.
+    """
+
+    def __init__(self, base_url, token, task_ids, note_ids, mix, list_limit=50):
+        self.base_url = base_url
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.task_ids = task_ids
+        self.note_ids = [str(n) for n in note_ids]
+        self.routes = list(mix)
+        self.weights = [mix[r] for r in self.routes]
+        self.list_limit = list_limit
+        self._lock = threading.Lock()
+
+    def _random_note(self, rng, remove=False):
+        with self._lock:
+            if not self.note_ids:
+                return None
+            index = rng.randrange(len(self.note_ids))
+            if not remove:
+                return self.note_ids[index]
+            # troca com o último: remoção O(1)
+            self.note_ids[index], self.note_ids[-1] = self.note_ids[-1], self.note_ids[index]
+            return self.note_ids.pop()
+
+    def run(self, session, rng):
+        """Executa uma operação; retorna (rota, status)."""
+        route = rng.choices(self.routes, self.weights)[0]
+        base = self.base_url
+        if route == "delete":
+            note_id = self._random_note(rng, remove=True)
+            if note_id is None:
+                route = "create"
+            else:
+                return route, session.delete(f"{base}/notes/{note_id}", headers=self.headers).status_code
+        if route == "update":
+            note_id = self._random_note(rng)
+            if note_id is None:
+                route = "create"
+            else:
+                r = session.put(f"{base}/notes/{note_id}", headers=self.headers,
+                                json={"title": "editada", "content": "novo conteúdo"})
+                return route, r.status_code
+        if route == "create":
+            r = session.post(f"{base}/notes", headers=self.headers,
+                             json={"title": "nota", "content": "conteúdo da nota", "task_id": rng.choice(self.task_ids)})
+            if r.status_code == 201:
+                with self._lock:
+                    self.note_ids.append(r.json()["id"])
+            return route, r.status_code
+        if route == "list":
+            r = session.get(f"{base}/notes", params={"limit": self.list_limit}, headers=self.headers)
+            return route, r.status_code
+        r = session.get(f"{base}/tarefas/{rng.choice(self.task_ids)}/notes", headers=self.headers)
+        return route, r.status_code
+
+
+def run_level(workload, concurrency, duration, seed=0):
+    """Roda `concurrency` clientes por `duration` segundos; retorna o resumo do nível."""
+    samples = {route: [] for route in ROUTES}
+    statuses = {route: {} for route in ROUTES}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        local = []
+        with requests.Session() as session:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                route, status = workload.run(session, rng)
+                local.append((route, time.perf_counter() - started, status))
+        with lock:
+            for route, elapsed, status in local:
+                samples[route].append(elapsed)
+                statuses[route][str(status)] = statuses[route].get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(v) for v in samples.values())
+    routes = {}
+    for route in ROUTES:
+        if samples[route]:
+            stats = summarize(samples[route])
+            del stats["ops_per_sec"]  # soma das latências não é vazão com clientes concorrentes
+            stats["rps"] = round(len(samples[route]) / elapsed, 1)
+            stats["status"] = statuses[route]
+            routes[route] = stats
+    return {"concurrency": concurrency, "duration_s": round(elapsed, 2), "requests": total,
+            "rps": round(total / elapsed, 1) if elapsed else 0.0, "routes": routes}
+
+
+def run(concurrency=(1, 8, 32), duration=10.0, mix=DEFAULT_MIX, storage="memory", mongo_uri=None,
+        tasks=200, seed_notes=1000, snapshot_ratio=0.5, task_delay=0.0, bits=2048):
+    mix = parse_mix(mix) if isinstance(mix, str) else mix
+    results = {}
+    with ServiceUnderTest(storage=storage, tasks=tasks, task_delay=task_delay, bits=bits, mongo_uri=mongo_uri) as sut:
+        note_ids = sut.seed(notes=seed_notes, snapshot_ratio=snapshot_ratio)
+        workload = Workload(sut.url, sut.token(), sut.task_ids, note_ids, mix)
+        for level, c in enumerate(concurrency):
+            results[f"c{c}"] = run_level(workload, c, duration, seed=level)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", default="1,8,32", help="níveis separados por vírgula")
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos por nível")
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--storage", default="memory", choices=("memory", "mongomock", "mongo"))
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--seed-notes", type=int, default=1000)
+    parser.add_argument("--snapshot-ratio", type=float, default=0.5,
+                        help="fração das tasks já no snapshot (as demais passam pelo fallback HTTP)")
+    parser.add_argument("--task-delay", type=float, default=0.0, help="latência do tasks-service falso (s)")
+    parser.add_argument("--bits", type=int, default=2048)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = run(concurrency=[int(c) for c in args.concurrency.split(",") if c.strip()],
+                  duration=args.duration, mix=args.mix, storage=args.storage, mongo_uri=args.mongo_uri,
+                  tasks=args.tasks, seed_notes=args.seed_notes, snapshot_ratio=args.snapshot_ratio,
+                  task_delay=args.task_delay, bits=args.bits)
+    write_results("loadtest", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
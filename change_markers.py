@@ -0,0 +1,36 @@
+# change_markers.py (marcadores de mudança para ETag / GET condicional)
+#
+# Cada escrita em notas incrementa, depois de gravar, dois contadores em `change_markers`:
+# o da coleção ("notes") e o da task da nota ("task:<id>"). As leituras montam o ETag a partir
+# do marcador (1 find_one por _id) e respondem 304 sem consultar nem serializar as notas.
+# `epoch` é definido na criação do marcador: se a coleção de marcadores for recriada,
+# ETags antigos não voltam a casar com uma versão reiniciada.
+import hashlib
+
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+NOTES_MARKER = "notes"
+
+
+def task_marker(task_id):
+    return f"task:{task_id}"
+
+
+def marker_names(task_ids):
+    """Marcadores afetados por uma escrita nas notas das tasks `task_ids`."""
+    return [NOTES_MARKER] + sorted({task_marker(t) for t in task_ids if t is not None})
+
+
+def bump_ops(task_ids):
+    """Operações (uma por marcador) para um único bulk_write."""
+    return [UpdateOne({"_id": m}, {"$inc": {"version": 1}, "$setOnInsert": {"epoch": str(ObjectId())}}, upsert=True)
+            for m in marker_names(task_ids)]
+
+
+def compute_etag(marker_doc, *parts):
+    """ETag forte: muda quando o marcador muda ou quando a representação pedida (parts) muda."""
+    version = f"{marker_doc.get('epoch')}:{marker_doc.get('version')}" if marker_doc else "0"
+    raw = "|".join([version] + [p.decode() if isinstance(p, bytes) else str(p) for p in parts])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
@@ -0,0 +1,143 @@
+# circuit_breaker.py (circuit breaker para chamadas a dependências externas)
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por taxa de falhas numa janela deslizante de `window` segundos.
+
+    - closed: tudo passa; abre quando há ao menos `min_calls` chamadas na janela e a fração
+      de falhas chega a `failure_rate`.
+    - open: allow() devolve False (o chamador falha rápido) por `open_for` segundos.
+    - half_open: libera até `half_open_probes` chamadas de teste; sucesso fecha o circuito,
+      falha reabre. Uma sonda que nunca reporta o resultado é liberada de novo após `open_for`.
+
+    Thread-safe (um lock por instância); não faz I/O, então também serve no event loop do app async.
+    """
+
+    def __init__(self, name, failure_rate=0.5, min_calls=10, window=30.0, open_for=15.0,
+                 half_open_probes=1, clock=time.monotonic, on_state_change=None):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_for = open_for
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self._on_state_change = on_state_change
+        self._lock = threading.Lock()
+        self._calls = deque()  # (instante, falhou)
+        self._failures = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_started = 0.0
+
+    # -----------------------------------------------------------------
+    # Estado interno (chamado com o lock)
+    # -----------------------------------------------------------------
+    def _trim(self, now):
+        while self._calls and self._calls[0][0] <= now - self.window:
+            if self._calls.popleft()[1]:
+                self._failures -= 1
+
+    def _transition(self, state, now):
+        if state == self._state:
+            return None
+        self._state = state
+        if state == OPEN:
+            self._opened_at = now
+        if state != HALF_OPEN:
+            self._probes = 0
+        if state == CLOSED:
+            self._calls.clear()
+            self._failures = 0
+        return state
+
+    def _notify(self, state):
+        if state is not None and self._on_state_change is not None:
+            self._on_state_change(self.name, state)
+
+    # -----------------------------------------------------------------
+    # API
+    # -----------------------------------------------------------------
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.open_for:
+                return HALF_OPEN  # a próxima allow() libera a sonda
+            return self._state
+
+    def allow(self):
+        """True se a chamada pode seguir; False para falhar rápido (circuito aberto)."""
+        changed = None
+        with self._lock:
+            now = self._clock()
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if now - self._opened_at < self.open_for:
+                    return False
+                changed = self._transition(HALF_OPEN, now)
+            elif self._probes >= self.half_open_probes and now - self._probe_started < self.open_for:
+                return False
+            elif self._probes >= self.half_open_probes:
+                self._probes = 0  # sonda perdida (exceção sem record_*): libera outra
+            self._probes += 1
+            self._probe_started = now
+        self._notify(changed)
+        return True
+
+    def record_success(self):
+        with self._lock:
+            now = self._clock()
+            if self._state == HALF_OPEN:
+                changed = self._transition(CLOSED, now)
+            else:
+                self._calls.append((now, False))
+                self._trim(now)
+                changed = None
+        self._notify(changed)
+
+    def record_failure(self):
+        with self._lock:
+            now = self._clock()
+            if self._state == HALF_OPEN:
+                changed = self._transition(OPEN, now)
+            elif self._state == OPEN:
+                changed = None
+            else:
+                self._calls.append((now, True))
+                self._failures += 1
+                self._trim(now)
+                tripped = len(self._calls) >= self.min_calls and self._failures / len(self._calls) >= self.failure_rate
+                changed = self._transition(OPEN, now) if tripped else None
+        self._notify(changed)
+
+    def reset(self):
+        with self._lock:
+            self._transition(CLOSED, self._clock())
+            self._calls.clear()
+            self._failures = 0
+
+    def snapshot(self):
+        """Estado para /ready e diagnósticos."""
+        state = self.state
+        with self._lock:
+            now = self._clock()
+            self._trim(now)
+            calls = len(self._calls)
+            out = {
+                "state": state,
+                "calls": calls,
+                "failure_rate": round(self._failures / calls, 3) if calls else 0.0,
+            }
+            if state == OPEN:
+                out["retry_in_s"] = round(max(0.0, self.open_for - (now - self._opened_at)), 2)
+            return out
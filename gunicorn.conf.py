@@ -0,0 +1,87 @@
+# gunicorn.conf.py (lido automaticamente pelo gunicorn a partir do diretório de trabalho)
+#
+#   gunicorn "app:create_app()"
+#
+# Perfil de produção: o app é importado uma vez no master (preload) e os workers herdam o módulo
+# já carregado (flask, requests, jose, pymongo...) por copy-on-write. Os recursos que não
+# sobrevivem ao fork são criados em cada worker no post_fork (app.init_worker).
+import glob
+import multiprocessing
+import os
+import threading
+
+
+def _env_bool(name, default):
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5002")
+
+# gthread (padrão) ou gevent (requer o pacote gevent); WEB_CONCURRENCY é a convenção do gunicorn
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("GUNICORN_WORKERS", os.getenv("WEB_CONCURRENCY", 0))) or multiprocessing.cpu_count() * 2 + 1
+threads = int(os.getenv("GUNICORN_THREADS", 8))                          # gthread
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))  # gevent
+preload_app = _env_bool("GUNICORN_PRELOAD", "true")
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))  # 0 = worker nunca é reciclado
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 0))
+
+if worker_class == "gevent":
+    # patch antes do app ser importado no master (com preload, o worker só faria o patch depois)
+    from gevent import monkey
+    monkey.patch_all()
+
+# app.py: clientes e threads só no post_fork (vale também sem preload)
+os.environ["NOTES_WORKER_INIT"] = "post_fork"
+
+# pool do Mongo e do tasks-service do tamanho da concorrência do worker (+ folga para as threads
+# de fundo: fallback em lote, sync, verificação, write-behind), salvo se definido no ambiente
+_concurrency = min(worker_connections, 100) if worker_class == "gevent" else threads
+os.environ.setdefault("MONGO_MAX_POOL_SIZE", str(_concurrency + 8))
+os.environ.setdefault("TASKS_HTTP_POOL_SIZE", str(_concurrency))
+
+
+def _prepare_multiproc_dir():
+    # métricas multiprocesso: cria o diretório e começa cada execução do master com ele limpo.
+    # Roda no carregamento do conf, antes do preload importar o app; o conf é relido no HUP,
+    # então a limpeza acontece uma vez por master (os arquivos dos workers vivos ficam)
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if not multiproc_dir or os.environ.get("NOTES_METRICS_DIR_MASTER") == str(os.getpid()):
+        return
+    os.makedirs(multiproc_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(multiproc_dir, "*.db")):
+        os.remove(path)
+    os.environ["NOTES_METRICS_DIR_MASTER"] = str(os.getpid())
+
+
+_prepare_multiproc_dir()
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        import metrics
+        metrics.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    # MongoClient, sessões HTTP, logging e threads de fundo deste worker (sem preload, o import
+    # do app acontece aqui mesmo)
+    import app
+    app.init_worker()
+
+
+def post_worker_init(worker):
+    # índices e migração de schema (o __main__ de app.py não roda sob o gunicorn); em thread
+    # para um Mongo lento não estourar o timeout de boot do worker
+    import app
+    threading.Thread(target=app.bootstrap_database, name="bootstrap", daemon=True).start()
+
+
+def worker_exit(server, worker):
+    # write-behind (NOTES_WRITE_BEHIND): grava as escritas de notas ainda na fila antes de sair
+    import app
+    app.flush_pending_writes()
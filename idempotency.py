@@ -0,0 +1,128 @@
+# idempotency.py (reserva atômica de Idempotency-Key com expiração por TTL)
+#
+# A chave é reservada ANTES de validar/gravar, com um insert cujo _id é derivado de
+# (coleção, chave): o próprio índice de _id garante que só uma requisição vence a corrida.
+# A reserva já guarda o id pré-alocado do recurso e a resposta final, então a criação custa só o
+# insert da reserva e o do recurso: não há um update de conclusão. O recurso leva o _id da reserva
+# (RESOURCE_FIELD); um replay que encontra a reserva "pending" confere se o recurso existe para
+# decidir entre devolver a resposta (200) ou avisar que a requisição original ainda está em
+# andamento (409). Ao remover um recurso com RESOURCE_FIELD, resource_removed() marca a reserva
+# "done": o replay continua devolvendo a resposta em vez de tratar a reserva como abandonada.
+import datetime
+import os
+
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 24 * 60 * 60))
+# reservas "pending" mais antigas que isso são consideradas abandonadas (ex.: worker morto)
+IDEMPOTENCY_PENDING_TIMEOUT = int(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT", 30))
+# tentativas de reserve() quando a chave some entre o insert e a leitura (expirou/foi liberada)
+RESERVE_ATTEMPTS = 3
+# campo do recurso com o _id da reserva que o criou
+RESOURCE_FIELD = "idempotency_id"
+
+# resultados de resolve()
+REPLAY = "replay"
+IN_PROGRESS = "in_progress"
+ABANDONED = "abandoned"
+
+
+def _utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def record_id(collection, key):
+    return f"{collection}:{key}"
+
+
+class IdempotencyEngine:
+    """Protocolo de reserva; o armazenamento fica no IdempotencyStore (ver storage.py)."""
+
+    def __init__(self, store, ttl=IDEMPOTENCY_TTL, pending_timeout=IDEMPOTENCY_PENDING_TIMEOUT):
+        self.store = store
+        self.ttl = ttl
+        self.pending_timeout = pending_timeout
+
+    def ensure_indexes(self):
+        self.store.ensure_indexes()
+
+    def new_record(self, collection, key, resource_id, resource):
+        now = _utcnow()
+        return {
+            "_id": record_id(collection, key),
+            "collection": collection,
+            "idempotency_key": key,
+            "state": "pending",
+            "resource_id": resource_id,
+            "resource": resource,
+            "created_at": now,
+            "expires_at": now + datetime.timedelta(seconds=self.ttl),
+        }
+
+    def reserve(self, collection, key, resource_id, resource):
+        """
+        Tenta reservar a chave. Retorna (True, None) se esta requisição venceu,
+        (False, registro_existente) se a chave já estava em uso, ou (False, None) se a chave
+        sumiu entre o insert e a leitura em RESERVE_ATTEMPTS tentativas seguidas.
+        """
+        for _attempt in range(RESERVE_ATTEMPTS):
+            if self.store.insert(self.new_record(collection, key, resource_id, resource)):
+                return True, None
+            existing = self.store.find(collection, key)
+            if existing is not None:
+                return False, existing
+            # expirou/foi liberada entre o insert e a leitura: tenta de novo
+        return False, None
+
+    def reserve_many(self, collection, entries):
+        """
+        Reserva várias chaves com um insert não ordenado.
+        `entries` é uma lista de (chave, resource_id, resource) com chaves distintas.
+        Retorna {chave: registro_existente} para as que já estavam em uso (uma consulta extra, só se houver).
+        """
+        if not entries:
+            return {}
+        docs = [self.new_record(collection, key, resource_id, resource) for key, resource_id, resource in entries]
+        taken = [docs[pos]["idempotency_key"] for pos in self.store.insert_many(docs)]
+        if not taken:
+            return {}
+        return {rec["idempotency_key"]: rec for rec in self.store.find_many(collection, taken)}
+
+    def release(self, collection, key):
+        """Desfaz uma reserva que não virou recurso (validação ou escrita falhou)."""
+        self.store.delete_pending(record_id(collection, key))
+
+    def release_many(self, collection, keys):
+        if keys:
+            self.store.delete_pending_many([record_id(collection, k) for k in keys])
+
+    def resolve(self, record, resource_exists):
+        """
+        Decide o que fazer com um registro já existente:
+        REPLAY (devolver record["resource"]), IN_PROGRESS (409) ou ABANDONED (pode ser retomada).
+        `resource_exists(resource_id)` só é chamado para reservas ainda "pending".
+        """
+        if record.get("state", "done") == "done" or "resource_id" not in record:
+            return REPLAY  # registros antigos (sem state) já guardavam a resposta final
+        if resource_exists(record["resource_id"]):
+            return REPLAY
+        created_at = record.get("created_at")
+        if created_at is not None and (_utcnow() - created_at).total_seconds() > self.pending_timeout:
+            return ABANDONED
+        return IN_PROGRESS
+
+    def mark_done(self, record):
+        """Depois de confirmar que o recurso existe, replays seguintes não precisam conferir de novo."""
+        if record.get("state") == "pending":
+            self.store.mark_done(record["_id"])
+
+    def resource_removed(self, resource):
+        """
+        Chamado com o documento removido: se ele veio de uma reserva (RESOURCE_FIELD), ela vira
+        "done" para que um replay devolva a resposta em vez de recriar o recurso.
+        """
+        reservation = (resource or {}).get(RESOURCE_FIELD)
+        if reservation is not None:
+            self.store.mark_done(reservation)
+
+    def take_over(self, record):
+        """Remove uma reserva abandonada para que a requisição atual possa reservá-la de novo."""
+        self.store.delete_pending(record["_id"], created_at=record.get("created_at"))
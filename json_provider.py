@@ -0,0 +1,63 @@
+# json_provider.py (provider JSON dos apps Flask/Quart)
+#
+# NOTES_JSON_PROVIDER=orjson (padrão quando o pacote está instalado) serializa com orjson direto
+# para bytes; "std" usa o json da stdlib. Nos dois, ObjectId vira string, então as rotas podem
+# devolver documentos do Mongo (já no formato da resposta) sem convertê-los nota a nota.
+# datetime sai em ISO 8601 (orjson nativo; no "std" também, em vez do formato HTTP do Flask).
+import datetime
+import os
+
+from bson.objectid import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # dependência opcional: sem ela, o provider "std"
+    orjson = None
+
+NOTES_JSON_PROVIDER = os.getenv("NOTES_JSON_PROVIDER", "orjson" if orjson is not None else "std").lower()
+
+
+def _default(o):
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, (datetime.datetime, datetime.date)):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class NotesJSONProvider(DefaultJSONProvider):
+    """json da stdlib + ObjectId. Sem ordenar as chaves: a ordem é a do documento/formato da resposta."""
+
+    sort_keys = False
+    default = staticmethod(_default)
+
+
+class OrjsonProvider(NotesJSONProvider):
+    """orjson: dumps/response sem passar por str; ObjectId e tipos do Flask via `_default`."""
+
+    option = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=_default, option=self.option), mimetype=self.mimetype)
+
+
+PROVIDERS = {"std": NotesJSONProvider, "orjson": OrjsonProvider}
+
+
+def init_app(app, provider=None):
+    """Registra o provider (`provider` ou NOTES_JSON_PROVIDER) como app.json."""
+    name = (provider or NOTES_JSON_PROVIDER).lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown JSON provider: {name}")
+    if name == "orjson" and orjson is None:
+        raise RuntimeError("NOTES_JSON_PROVIDER=orjson requer o pacote orjson")
+    app.json = PROVIDERS[name](app)
+    return app.json
@@ -0,0 +1,205 @@
+# metrics.py (métricas Prometheus: latência por rota e por etapa interna)
+#
+# Em produção com vários workers do gunicorn, defina PROMETHEUS_MULTIPROC_DIR (diretório
+# gravável, limpo no start do master - ver gunicorn.conf.py): cada worker grava seus valores
+# em arquivos mmap e /metrics agrega todos os processos. O diretório é criado no import, se faltar;
+# nenhuma série com labels é criada no import (o arquivo só é aberto na primeira observação).
+#
+# /metrics fica na porta pública: só responde a IPs em METRICS_ALLOWED_IPS (padrão: loopback) ou a
+# quem enviar `Authorization: Bearer $METRICS_TOKEN` (bearer_token do scrape_config do Prometheus).
+import hmac
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from pymongo import monitoring
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_ALLOWED_IPS = frozenset(
+    ip.strip() for ip in os.getenv("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",") if ip.strip())
+
+# buckets em segundos: de 0,5 ms (cache/JWT em cache) até 5 s (fallback lento)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+REQUEST_LATENCY = Histogram(
+    "notes_http_request_duration_seconds",
+    "Latência das requisições HTTP por rota, método e status",
+    ["route", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    "notes_stage_duration_seconds",
+    "Latência das etapas internas (get_jwks, jwt_decode, validate_task:<caminho>, ...)",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+MONGO_LATENCY = Histogram(
+    "notes_mongo_command_duration_seconds",
+    "Latência de cada comando enviado ao Mongo",
+    ["command", "collection", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+CACHE_HITS = Counter(
+    "notes_cache_hits",
+    "Leituras atendidas pelos caches em processo",
+    ["cache"],
+)
+CACHE_MISSES = Counter(
+    "notes_cache_misses",
+    "Leituras sem entrada válida nos caches em processo (ausente ou expirada)",
+    ["cache"],
+)
+CACHE_EVICTIONS = Counter(
+    "notes_cache_evictions",
+    "Entradas removidas por LRU dos caches em processo",
+    ["cache"],
+)
+BREAKER_TRANSITIONS = Counter(
+    "notes_circuit_breaker_transitions",
+    "Mudanças de estado dos circuit breakers (closed/open/half_open)",
+    ["breaker", "state"],
+)
+
+WRITE_BEHIND_REQUESTS = Counter(
+    "notes_write_behind_requests",
+    "PUT/DELETE absorvidos pelo write-behind e já gravados (razão de coalescência = requests / writes)",
+    ["op"],
+)
+WRITE_BEHIND_WRITES = Counter(
+    "notes_write_behind_writes",
+    "Operações enviadas ao Mongo pelos flushes do write-behind",
+    ["op"],
+)
+
+
+def observe_stage(stage, seconds):
+    STAGE_LATENCY.labels(stage).observe(seconds)
+
+
+@contextmanager
+def timed(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage).observe(time.perf_counter() - started)
+
+
+def observe_request(route, method, status, seconds):
+    REQUEST_LATENCY.labels(route, method, str(status)).observe(seconds)
+
+
+class MongoMetricsListener(monitoring.CommandListener):
+    """Histograma por comando/coleção, alimentado pelo command monitoring do pymongo."""
+
+    def __init__(self):
+        self._pending = {}  # request_id -> coleção (o evento de sucesso não traz o comando)
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        self._pending[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def _observe(self, event, outcome):
+        collection = self._pending.pop(event.request_id, "")
+        MONGO_LATENCY.labels(event.command_name, collection, outcome).observe(event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._observe(event, "ok")
+
+    def failed(self, event):
+        self._observe(event, "error")
+
+
+def registry():
+    if MULTIPROC_DIR:
+        reg = CollectorRegistry()
+        multiprocess.MultiProcessCollector(reg)
+        return reg
+    return REGISTRY
+
+
+def render():
+    """(corpo, content-type) da exposição em texto do Prometheus."""
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
+
+
+def eviction_counter(cache):
+    """Callback para TTLCache(on_evict=...): conta as evicções de `cache`."""
+    return lambda key: CACHE_EVICTIONS.labels(cache).inc()
+
+
+def hit_counter(cache):
+    """Callback para TTLCache(on_hit=...): conta os hits de `cache`."""
+    return lambda key: CACHE_HITS.labels(cache).inc()
+
+
+def miss_counter(cache):
+    """Callback para TTLCache(on_miss=...): conta os misses de `cache`."""
+    return lambda key: CACHE_MISSES.labels(cache).inc()
+
+
+def breaker_transition(name, state):
+    """Callback para CircuitBreaker(on_state_change=...)."""
+    BREAKER_TRANSITIONS.labels(name, state).inc()
+
+
+def write_behind_flush(requests, writes, seconds):
+    """Callback para WriteBehindNotesStore(on_flush=...): contadores por operação + duração do flush."""
+    for op, count in requests.items():
+        if count:
+            WRITE_BEHIND_REQUESTS.labels(op).inc(count)
+    for op, count in writes.items():
+        if count:
+            WRITE_BEHIND_WRITES.labels(op).inc(count)
+    observe_stage("write_behind:flush", seconds)
+
+
+def mark_process_dead(pid):
+    """Chamado pelo master do gunicorn quando um worker sai (limpa gauges `live*`)."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
+
+
+def scrape_allowed(remote_addr, authorization):
+    """/metrics liberado para IPs de METRICS_ALLOWED_IPS ou com o bearer METRICS_TOKEN."""
+    if remote_addr in METRICS_ALLOWED_IPS:
+        return True
+    scheme, _, token = (authorization or "").partition(" ")
+    return bool(METRICS_TOKEN) and scheme.lower() == "bearer" and hmac.compare_digest(
+        token.strip().encode(), METRICS_TOKEN.encode())
+
+
+def init_app(app):
+    """Registra o histograma por rota e o endpoint /metrics no app Flask."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_metrics_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.get("metrics_started")
+        if started is not None and request.method != "OPTIONS":
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            observe_request(route, request.method, response.status_code, time.perf_counter() - started)
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics_endpoint():
+        if not scrape_allowed(request.remote_addr, request.headers.get("Authorization")):
+            return Response("Forbidden\n", status=403, mimetype="text/plain")
+        body, content_type = render()
+        return Response(body, mimetype=content_type.split(";")[0], headers={"Content-Type": content_type})
@@ -0,0 +1,158 @@
+# migrations.py (índices de startup e migração de schema das notas)
+#
+# ensure_indexes roda em todo start (gunicorn via post_worker_init, hypercorn via before_serving
+# e `python app.py`), não só no __main__. LegacyFieldsMigration copia os campos legados
+# titulo/conteudo para title/content em lotes, numa thread de fundo, com lease em `migrations`
+# para que só um worker migre por vez. O "done" fica em `migrations`: todo worker confere esse
+# estado no start e, enquanto a migração não termina, a cada `poll_interval` segundos (assumindo o
+# lease se o dono morrer); ao vê-lo, chama on_done e as leituras deixam de consultar os legados.
+import logging
+import threading
+import time
+import uuid
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+NOTES_INDEXES = (
+    # GET /tarefas/<id>/notes filtra por task_id e ordena por criado_em
+    ([("task_id", 1), ("criado_em", 1)], "task_id_criado_em"),
+    ([("autor", 1)], "autor"),
+    # notas aceitas com o tasks-service fora (TASKS_ACCEPT_UNKNOWN), pendentes de verificação
+    ([("task_unverified", 1)], "task_unverified", {"sparse": True}),
+)
+# índices substituídos (o composto acima cobre consultas só por task_id pelo prefixo)
+REDUNDANT_NOTES_INDEXES = ("task_id_1",)
+
+LEGACY_FIELDS = {"titulo": "title", "conteudo": "content"}
+
+
+def ensure_indexes(db):
+    for keys, name, *options in NOTES_INDEXES:
+        db.notes.create_index(keys, name=name, **(options[0] if options else {}))
+    existing = db.notes.index_information()
+    for name in REDUNDANT_NOTES_INDEXES:
+        if name in existing:
+            try:
+                db.notes.drop_index(name)
+            except OperationFailure as e:
+                if e.code != 27:  # IndexNotFound: outro worker removeu primeiro
+                    raise
+
+
+class LegacyFieldsMigration:
+    """
+    Normaliza titulo/conteudo -> title/content (sem sobrescrever um title/content já preenchido)
+    e remove os campos legados. Cada update confere os valores lidos, então uma edição concorrente
+    não é perdida: a nota é revisitada na próxima passada.
+    """
+
+    name = "legacy_note_fields"
+
+    def __init__(self, get_db, batch_size=500, pause=0.05, on_done=None, poll_interval=30.0):
+        self._get_db = get_db
+        self.batch_size = batch_size
+        self.pause = pause
+        self.on_done = on_done
+        self.poll_interval = poll_interval
+        self.owner = uuid.uuid4().hex
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def _state(self):
+        return self._get_db().migrations
+
+    def is_done(self):
+        return bool((self._state.find_one({"_id": self.name}) or {}).get("done"))
+
+    def acquire_lease(self, duration):
+        now = time.time()
+        try:
+            self._state.insert_one({"_id": self.name, "done": False, "last_id": None,
+                                    "lease_owner": None, "lease_until": 0})
+        except DuplicateKeyError:
+            pass
+        result = self._state.update_one(
+            {"_id": self.name, "done": False,
+             "$or": [{"lease_until": {"$lt": now}}, {"lease_owner": self.owner}]},
+            {"$set": {"lease_owner": self.owner, "lease_until": now + duration}},
+        )
+        return result.matched_count == 1
+
+    def _legacy_query(self):
+        return {"$or": [{field: {"$exists": True}} for field in LEGACY_FIELDS]}
+
+    def run_batch(self, last_id=None):
+        """Migra um lote a partir de `last_id`. Retorna (notas migradas, último _id visto ou None no fim)."""
+        db = self._get_db()
+        query = self._legacy_query()
+        if last_id is not None:
+            query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+        fields = {f: 1 for pair in LEGACY_FIELDS.items() for f in pair}
+        docs = list(db.notes.find(query, fields).sort("_id", 1).limit(self.batch_size))
+        if not docs:
+            return 0, None
+
+        ops = []
+        for doc in docs:
+            to_set = {new: doc[old] for old, new in LEGACY_FIELDS.items() if not doc.get(new) and doc.get(old)}
+            update = {"$unset": {old: "" for old in LEGACY_FIELDS}}
+            if to_set:
+                update["$set"] = to_set
+            expected = {f: doc.get(f) for f in fields}  # None também casa com campo ausente
+            ops.append(UpdateOne({"_id": doc["_id"], **expected}, update))
+        result = db.notes.bulk_write(ops, ordered=False)
+        return result.modified_count, docs[-1]["_id"]
+
+    def run(self, lease_duration=60):
+        """Executa até terminar (ou stop()). Retorna True se a migração foi concluída por este processo."""
+        last_id = (self._state.find_one({"_id": self.name}) or {}).get("last_id")
+        while not self._stop.is_set():
+            if not self.acquire_lease(lease_duration):
+                return False  # outro worker migrando (ou já concluída)
+            migrated, last_id = self.run_batch(last_id)
+            if last_id is None:
+                if self._get_db().notes.count_documents(self._legacy_query(), limit=1):
+                    continue  # sobrou nota editada durante a passada: recomeça do início
+                self._state.update_one({"_id": self.name}, {"$set": {"done": True, "last_id": None,
+                                                                     "lease_owner": None, "lease_until": 0}})
+                logger.info("Migração %s concluída", self.name)
+                if self.on_done:
+                    self.on_done()
+                return True
+            self._state.update_one({"_id": self.name}, {"$set": {"last_id": last_id}})
+            self._stop.wait(self.pause)
+        return False
+
+    def _watch(self, migrate):
+        while not self._stop.is_set():
+            try:
+                if self.is_done():
+                    if self.on_done:
+                        self.on_done()
+                    return
+                if migrate and self.run():
+                    return
+            except Exception as e:
+                logger.warning("Migração %s interrompida: %s", self.name, e)
+            self._stop.wait(self.poll_interval)
+
+    def start(self, migrate=True):
+        """
+        Thread de fundo que espera a migração terminar (chamando on_done). Com `migrate`,
+        também disputa o lease e migra; sem ele, só acompanha a migração feita por outro processo.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, args=(migrate,), name="migration", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,223 @@
+# search.py (busca full-text em notas)
+#
+# Em produção a busca usa um índice de texto do Mongo sobre title/content (e os legados
+# titulo/conteudo), com ranking por textScore. Quando o armazenamento não suporta busca textual
+# (NotesStore.supports_text_search falso: mongomock, NOTES_STORAGE=memory), usa um índice invertido
+# em processo, montado uma vez a partir das notas e mantido pelas escritas deste processo
+# (note_changed/note_removed). Esse índice só enxerga as escritas do próprio processo.
+# Num Mongo ainda sem o índice de texto (bootstrap em andamento) a busca não cai para esse índice,
+# que leria a coleção inteira no caminho da requisição: levanta TextIndexUnavailable (503 na rota),
+# dispara a criação do índice em segundo plano e só tenta $text de novo após TEXT_INDEX_RETRY
+# segundos ou assim que ensure_index() termina.
+import logging
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+TEXT_INDEX_NAME = "notes_text"
+# "none" desliga stemming/stopwords: notas misturam pt-br e inglês, e o fallback se comporta igual
+NOTES_SEARCH_LANGUAGE = os.getenv("NOTES_SEARCH_LANGUAGE", "none")
+# peso de cada campo no ranking (o mesmo no índice do Mongo e no fallback)
+SEARCH_WEIGHTS = {"title": 10, "titulo": 10, "content": 1, "conteudo": 1}
+# espera (s) antes de tentar $text de novo depois de um IndexNotFound
+TEXT_INDEX_RETRY = float(os.getenv("NOTES_SEARCH_INDEX_RETRY", 5))
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class TextIndexUnavailable(Exception):
+    """O backend busca por índice de texto, mas ele ainda não existe; tente após `retry_after` s."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"text index not ready, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def tokenize(text):
+    """Termos em minúsculas e sem acentos (o índice de texto do Mongo também ignora diacríticos)."""
+    if not text or not isinstance(text, str):
+        return []
+    folded = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    return _TOKEN_RE.findall(folded)
+
+
+class InvertedIndex:
+    """
+    termo -> {note_id: frequência ponderada pelo campo}. Ranking TF-IDF:
+    score(nota) = soma, para cada termo da busca, de tf_ponderado * log(1 + N/df).
+    Thread-safe (um lock por instância).
+    """
+
+    def __init__(self, weights=SEARCH_WEIGHTS):
+        self.weights = weights
+        self._postings = {}
+        self._docs = {}  # note_id -> (task_id, termos) para remoção e filtro por task
+        self._lock = threading.Lock()
+
+    def _terms(self, doc):
+        freqs = {}
+        for field, weight in self.weights.items():
+            for term in tokenize(doc.get(field)):
+                freqs[term] = freqs.get(term, 0) + weight
+        return freqs
+
+    def _remove(self, note_id):
+        entry = self._docs.pop(note_id, None)
+        if entry is None:
+            return
+        for term in entry[1]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(note_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def add(self, doc):
+        note_id = doc["_id"]
+        freqs = self._terms(doc)
+        with self._lock:
+            self._remove(note_id)
+            for term, tf in freqs.items():
+                self._postings.setdefault(term, {})[note_id] = tf
+            self._docs[note_id] = (doc.get("task_id"), tuple(freqs))
+
+    def remove(self, note_id):
+        with self._lock:
+            self._remove(note_id)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def search(self, query, task_id=None, limit=None, offset=0):
+        """Lista de (note_id, score) ordenada por score desc (empate: _id asc)."""
+        terms = set(tokenize(query))
+        scores = {}
+        with self._lock:
+            total = len(self._docs)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + total / len(postings))
+                for note_id, tf in postings.items():
+                    if task_id is not None and self._docs[note_id][0] != task_id:
+                        continue
+                    scores[note_id] = scores.get(note_id, 0.0) + tf * idf
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], str(item[0])))
+        end = None if limit is None else offset + limit
+        return ranked[offset:end]
+
+
+class NoteSearch:
+    """
+    Busca em notas pelo índice de texto do NotesStore ou, se indisponível, com InvertedIndex.
+    O índice em processo é descartado quando o armazenamento muda (ex.: banco trocado nos testes).
+    """
+
+    def __init__(self, store, weights=SEARCH_WEIGHTS, language=NOTES_SEARCH_LANGUAGE,
+                 retry_after=TEXT_INDEX_RETRY, clock=time.monotonic):
+        self.store = store
+        self.weights = weights
+        self.language = language
+        self.retry_after = retry_after
+        self._clock = clock
+        self._source = None
+        self._text_retry_at = 0.0  # antes disso, $text não é tentado (índice ausente há pouco)
+        self._index = None
+        self._builder = None  # thread de ensure_index disparada por um IndexNotFound
+        self._lock = threading.Lock()
+
+    def ensure_index(self):
+        self.store.ensure_text_index(TEXT_INDEX_NAME, self.weights, self.language)
+        self._text_retry_at = 0.0
+
+    def _build_index(self):
+        try:
+            self.ensure_index()
+        except Exception as e:
+            logger.warning("Falha ao criar o índice de texto de notes: %s", e)
+
+    def _start_index_build(self):
+        with self._lock:
+            if self._builder is None or not self._builder.is_alive():
+                self._builder = threading.Thread(target=self._build_index, name="notes-text-index", daemon=True)
+                self._builder.start()
+
+    def _current(self):
+        source = self.store.source
+        if source is not self._source:
+            with self._lock:
+                if source is not self._source:
+                    self._source, self._index, self._text_retry_at = source, None, 0.0
+
+    def _memory_index(self):
+        with self._lock:
+            if self._index is None:
+                index = InvertedIndex(self.weights)
+                fields = {field: 1 for field in self.weights}
+                fields["task_id"] = 1
+                for doc in self.store.list(projection=fields):
+                    index.add(doc)
+                self._index = index
+            return self._index
+
+    # -----------------------------------------------------------------
+    # Manutenção do fallback (no-op quando o índice de texto do backend está em uso)
+    # -----------------------------------------------------------------
+    def note_changed(self, doc):
+        if self._index is not None and self.store.source is self._source:
+            self._index.add(doc)
+
+    def note_removed(self, note_id):
+        if self._index is not None and self.store.source is self._source:
+            self._index.remove(note_id)
+
+    # -----------------------------------------------------------------
+    # Busca
+    # -----------------------------------------------------------------
+    def search(self, query, projection, task_id=None, limit=20, offset=0):
+        """
+        Retorna (notas, tem_mais). Cada nota traz os campos de `projection` e "score".
+        Termos são combinados com OU, como no $text do Mongo.
+        TextIndexUnavailable se o backend tem busca textual mas o índice ainda não existe.
+        """
+        self._current()
+        if not self.store.supports_text_search:
+            return self._search_memory(query, projection, task_id, limit, offset)
+        wait = self._text_retry_at - self._clock()
+        if wait > 0:
+            raise TextIndexUnavailable(wait)
+        try:
+            docs = self.store.text_search(query, projection, task_id=task_id, skip=offset, limit=limit + 1)
+        except OperationFailure as e:
+            if e.code != 27:  # IndexNotFound: o índice de texto ainda não existe
+                raise
+            self._text_retry_at = self._clock() + self.retry_after
+            logger.warning("Índice de texto de notes ausente; criando em segundo plano (busca indisponível por %ss)",
+                           self.retry_after)
+            self._start_index_build()
+            raise TextIndexUnavailable(self.retry_after)
+        return docs[:limit], len(docs) > limit
+
+    def _search_memory(self, query, projection, task_id, limit, offset):
+        ranked = self._memory_index().search(query, task_id=task_id, limit=limit + 1, offset=offset)
+        if not ranked:
+            return [], False
+        has_more = len(ranked) > limit
+        ranked = ranked[:limit]
+        found = {doc["_id"]: doc for doc in self.store.find_many([i for i, _ in ranked], projection)}
+        docs = []
+        for note_id, score in ranked:
+            doc = found.get(note_id)
+            if doc is not None:  # removida por outro processo desde a montagem do índice
+                doc["score"] = score
+                docs.append(doc)
+        return docs, has_more
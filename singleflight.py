@@ -0,0 +1,90 @@
+# singleflight.py (coalescência de chamadas concorrentes pela mesma chave)
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Garante que, para uma mesma chave, só uma execução de `fn` esteja em andamento.
+    Chamadas concorrentes esperam o resultado (ou a exceção) da execução em curso.
+    Usa primitivas de `threading`, então funciona com workers gthread e, com
+    monkey-patch, com gevent.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Executa fn(*args, **kwargs) ou espera a execução em andamento. Retorna (resultado, compartilhado)."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, call.waiters > 0
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """Equivalente de SingleFlight para asyncio: chamadas concorrentes aguardam o mesmo Future."""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Executa `await fn(*args, **kwargs)` ou espera a execução em andamento. Retorna (resultado, compartilhado)."""
+        future = self._calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future), True
+
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # evita aviso de exceção não observada quando não há quem espere
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            self._calls.pop(key, None)
+        return result, False
+
+    def in_flight(self):
+        return len(self._calls)
@@ -0,0 +1,683 @@
+# storage.py (camada de repositório: notas, snapshots de tasks e idempotência)
+#
+# As rotas de app.py falam com NotesStore / SnapshotStore / IdempotencyStore em vez de `mongo.db`.
+#   - Mongo*Store: implementação de produção. Recebe `get_db` (chamado a cada operação), então
+#     os testes continuam trocando `mongo.db` por um mongomock.
+#   - Memory*Store: em processo, indexada por _id e task_id e thread-safe. Serve para testes de
+#     carga e benchmarks da camada HTTP sem banco (NOTES_STORAGE=memory); não é compartilhada
+#     entre workers nem sobrevive a um restart.
+# Os documentos têm o formato do Mongo (_id/task_id como ObjectId) nas duas implementações.
+import bisect
+import datetime
+import threading
+import time
+
+from bson.objectid import ObjectId
+from pymongo import DeleteOne, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from change_markers import bump_ops, marker_names
+from idempotency import RESOURCE_FIELD, record_id
+
+
+def _project(doc, projection):
+    """Subconjunto de projeção do Mongo usado pelo serviço: só inclusão, _id sempre presente."""
+    if projection is None:
+        return dict(doc)
+    out = {"_id": doc["_id"]} if projection.get("_id", 1) else {}
+    for field, include in projection.items():
+        if include and field != "_id" and field in doc:
+            out[field] = doc[field]
+    return out
+
+
+def first_present(doc, sources):
+    """
+    Valor de um campo com origens em ordem de preferência (ex.: title, titulo), como o `a or b` de
+    antes: pula as origens ausentes, nulas ou "" e fica com a última como está (null se ausente).
+    Mesma regra de shape_projection no Mongo.
+    """
+    for src in sources[:-1]:
+        value = doc.get(src)
+        if value is not None and value != "":
+            return value
+    return doc.get(sources[-1])
+
+
+def shape_projection(shape):
+    """
+    `shape` = {campo da resposta: (campos de origem, em ordem de preferência)} -> estágio $project
+    que devolve o documento já no formato da resposta: sem _id e cada campo escolhido como em
+    first_present. ObjectIds seguem como estão (o provider JSON converte).
+    """
+    project = {"_id": 0}
+    for field, sources in shape.items():
+        expr = {"$ifNull": [f"${sources[-1]}", None]}
+        for src in reversed(sources[:-1]):
+            expr = {"$cond": [{"$ne": [{"$ifNull": [f"${src}", ""]}, ""]}, f"${src}", expr]}
+        project[field] = expr
+    return {"$project": project}
+
+
+def shaped_pipeline(query, shape, sort=None, limit=None):
+    """Pipeline $match/$sort/$limit + shape_projection: o formato da resposta é montado no servidor."""
+    pipeline = [{"$match": query}]
+    if sort:
+        pipeline.append({"$sort": sort})
+    if limit is not None:
+        pipeline.append({"$limit": limit})
+    pipeline.append(shape_projection(shape))
+    return pipeline
+
+
+def _is_newer(current, doc):
+    """`current` tem atualizado_em posterior ao de `doc` (sem data de um dos lados, não)."""
+    current_ts, ts = current.get("atualizado_em"), doc.get("atualizado_em")
+    return current_ts is not None and ts is not None and current_ts > ts
+
+
+def snapshot_guard(doc):
+    """Filtro do upsert condicional de snapshots: casa o gravado se ele não for mais novo que `doc`."""
+    if doc.get("atualizado_em") is None:
+        return {"_id": doc["_id"]}
+    return {"_id": doc["_id"], "atualizado_em": {"$not": {"$gt": doc["atualizado_em"]}}}
+
+
+def _shape(doc, shape):
+    """Equivalente em Python de shape_projection (armazenamento em memória)."""
+    return {field: first_present(doc, sources) for field, sources in shape.items()}
+
+
+# ---------------------------------------------------------------------
+# Interfaces
+# ---------------------------------------------------------------------
+class NotesStore:
+    """Notas + marcadores de mudança (ETag)."""
+
+    @property
+    def source(self):
+        """Identifica o armazenamento atual (caches derivados, como o índice de busca, são refeitos se mudar)."""
+        return self
+
+    def insert(self, doc):
+        raise NotImplementedError
+
+    def insert_many(self, docs):
+        """Insere sem ordem; retorna {posição: mensagem} dos documentos que falharam."""
+        raise NotImplementedError
+
+    def exists(self, note_id):
+        raise NotImplementedError
+
+    def existing_ids(self, note_ids):
+        raise NotImplementedError
+
+    def list(self, after=None, limit=None, projection=None, batch_size=None, shape=None):
+        """
+        Notas com _id > after. Com `limit`, ordenadas por _id (paginação por cursor).
+        Com `shape` (ver shape_projection), no lugar de `projection`, já no formato da resposta.
+        """
+        raise NotImplementedError
+
+    def find_by_tasks(self, task_ids, projection=None, shape=None):
+        """Notas das tasks, ordenadas por (task_id, criado_em); `shape` como em list()."""
+        raise NotImplementedError
+
+    def find_many(self, note_ids, projection=None):
+        raise NotImplementedError
+
+    def update(self, note_id, fields):
+        """$set em `fields` e incrementa `rev`; retorna a nota atualizada ou None."""
+        raise NotImplementedError
+
+    def delete(self, note_id):
+        """Remove a nota; retorna {"_id", "task_id"} (e RESOURCE_FIELD, se houver) da removida ou None."""
+        raise NotImplementedError
+
+    def write(self, updates, deletes):
+        """
+        Grava em lote, sem ordem: $set de `fields` para cada (note_id, fields) em `updates` e
+        remoção dos ids em `deletes`. Retorna {note_id: mensagem} das operações que falharam.
+        """
+        raise NotImplementedError
+
+    def find_unverified(self, limit):
+        """Notas gravadas sem validar a task (`task_unverified`), com _id e task_id, por _id."""
+        raise NotImplementedError
+
+    def settle_unverified(self, note_ids, task_missing=False):
+        """Remove `task_unverified`; com `task_missing`, marca as notas como de task inexistente."""
+        raise NotImplementedError
+
+    def bump_markers(self, task_ids):
+        raise NotImplementedError
+
+    def marker(self, name):
+        raise NotImplementedError
+
+    # o backend tem índice de texto (text_search); sem ele, search.py usa um índice em processo
+    supports_text_search = False
+
+    def text_search(self, query, projection, task_id=None, skip=0, limit=20):
+        """Busca pelo índice de texto do backend (só se supports_text_search)."""
+        raise NotImplementedError
+
+    def ensure_text_index(self, name, weights, language):
+        pass
+
+
+class SnapshotStore:
+    """Snapshots de tasks (task_snapshots) + estado da sincronização incremental."""
+
+    def get(self, task_id):
+        raise NotImplementedError
+
+    def get_many(self, task_ids):
+        raise NotImplementedError
+
+    def upsert(self, snapshot):
+        raise NotImplementedError
+
+    def write(self, upserts, deletes):
+        """
+        Grava em lote snapshots completos (`upserts`) e tombstones de tasks removidas (`deletes`,
+        {"_id", "deleted": True, "atualizado_em"}). Cada documento só substitui o gravado se não
+        for mais antigo que ele (`atualizado_em`): eventos atrasados não voltam a versão nem
+        ressuscitam uma task removida. get/get_many ignoram tombstones.
+        """
+        raise NotImplementedError
+
+    def sync_state(self, name):
+        raise NotImplementedError
+
+    def set_sync_cursor(self, name, cursor, cursor_id=None):
+        """Cursor do pull incremental: `cursor` (atualizado_em) e `cursor_id` (desempate)."""
+        raise NotImplementedError
+
+    def acquire_lease(self, name, owner, duration):
+        raise NotImplementedError
+
+
+class IdempotencyStore:
+    """Registros de Idempotency-Key (ver idempotency.py); `_id` = record_id(coleção, chave)."""
+
+    def ensure_indexes(self):
+        pass
+
+    def insert(self, record):
+        """Retorna False se a chave já existe."""
+        raise NotImplementedError
+
+    def insert_many(self, records):
+        """Insere sem ordem; retorna as posições cujas chaves já existiam."""
+        raise NotImplementedError
+
+    def find(self, collection, key):
+        raise NotImplementedError
+
+    def find_many(self, collection, keys):
+        raise NotImplementedError
+
+    def delete_pending(self, record_id, created_at=None):
+        """Remove a reserva se ainda "pending" (e, se dado, com o mesmo created_at)."""
+        raise NotImplementedError
+
+    def delete_pending_many(self, record_ids):
+        raise NotImplementedError
+
+    def mark_done(self, record_id):
+        raise NotImplementedError
+
+
+# ---------------------------------------------------------------------
+# Mongo
+# ---------------------------------------------------------------------
+class MongoNotesStore(NotesStore):
+    def __init__(self, get_db):
+        self._get_db = get_db
+
+    @property
+    def source(self):
+        return self._get_db()
+
+    @property
+    def notes(self):
+        return self._get_db().notes
+
+    @property
+    def supports_text_search(self):
+        # mongomock (testes) não implementa $text
+        return not type(self._get_db()).__module__.startswith("mongomock")
+
+    def insert(self, doc):
+        self.notes.insert_one(doc)
+
+    def insert_many(self, docs):
+        try:
+            self.notes.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            return {err["index"]: err.get("errmsg", "write error") for err in e.details.get("writeErrors", [])}
+        return {}
+
+    def exists(self, note_id):
+        return self.notes.find_one({"_id": note_id}, {"_id": 1}) is not None
+
+    def existing_ids(self, note_ids):
+        if not note_ids:
+            return set()
+        return {n["_id"] for n in self.notes.find({"_id": {"$in": list(note_ids)}}, {"_id": 1})}
+
+    def _aggregate(self, query, sort, limit, shape, batch_size):
+        # o $project do formato da resposta roda depois de $sort/$limit (que usam os índices)
+        pipeline = shaped_pipeline(query, shape, sort, limit)
+        return self.notes.aggregate(pipeline, **({"batchSize": batch_size} if batch_size else {}))
+
+    def list(self, after=None, limit=None, projection=None, batch_size=None, shape=None):
+        query = {"_id": {"$gt": after}} if after else {}
+        if shape is not None:
+            return self._aggregate(query, {"_id": 1} if limit is not None else None, limit, shape, batch_size)
+        cursor = self.notes.find(query, projection)
+        if limit is not None:
+            cursor = cursor.sort("_id", 1).limit(limit)
+        if batch_size:
+            cursor = cursor.batch_size(batch_size)
+        return cursor
+
+    def find_by_tasks(self, task_ids, projection=None, shape=None):
+        task_ids = list(task_ids)
+        query = {"task_id": task_ids[0]} if len(task_ids) == 1 else {"task_id": {"$in": task_ids}}
+        # índice task_id+criado_em
+        if shape is not None:
+            return self._aggregate(query, {"task_id": 1, "criado_em": 1}, None, shape, None)
+        return self.notes.find(query, projection).sort([("task_id", 1), ("criado_em", 1)])
+
+    def find_many(self, note_ids, projection=None):
+        return self.notes.find({"_id": {"$in": list(note_ids)}}, projection)
+
+    def update(self, note_id, fields):
+        return self.notes.find_one_and_update(
+            {"_id": note_id},
+            {"$set": fields, "$inc": {"rev": 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def delete(self, note_id):
+        return self.notes.find_one_and_delete({"_id": note_id}, projection={"task_id": 1, RESOURCE_FIELD: 1})
+
+    def write(self, updates, deletes):
+        ops = [UpdateOne({"_id": note_id}, {"$set": fields}) for note_id, fields in updates]
+        ops += [DeleteOne({"_id": note_id}) for note_id in deletes]
+        if not ops:
+            return {}
+        ids = [note_id for note_id, _ in updates] + list(deletes)
+        try:
+            self.notes.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            return {ids[err["index"]]: err.get("errmsg", "write error") for err in e.details.get("writeErrors", [])}
+        return {}
+
+    def find_unverified(self, limit):
+        return list(self.notes.find({"task_unverified": True}, {"task_id": 1}).sort("_id", 1).limit(limit))
+
+    def settle_unverified(self, note_ids, task_missing=False):
+        update = {"$unset": {"task_unverified": ""}}
+        if task_missing:
+            update["$set"] = {"task_missing": True}
+        self.notes.update_many({"_id": {"$in": list(note_ids)}, "task_unverified": True}, update)
+
+    def bump_markers(self, task_ids):
+        self._get_db().change_markers.bulk_write(bump_ops(task_ids), ordered=False)
+
+    def marker(self, name):
+        return self._get_db().change_markers.find_one({"_id": name})
+
+    def text_search(self, query, projection, task_id=None, skip=0, limit=20):
+        flt = {"$text": {"$search": query}}
+        if task_id is not None:
+            flt["task_id"] = task_id
+        score = {"$meta": "textScore"}
+        return list(self.notes.find(flt, {**projection, "score": score})
+                    .sort([("score", score), ("_id", 1)])
+                    .skip(skip)
+                    .limit(limit))
+
+    def ensure_text_index(self, name, weights, language):
+        self.notes.create_index([(field, "text") for field in weights], name=name,
+                                weights=weights, default_language=language)
+
+
+class MongoSnapshotStore(SnapshotStore):
+    def __init__(self, get_db):
+        self._get_db = get_db
+
+    @property
+    def snapshots(self):
+        return self._get_db().task_snapshots
+
+    def get(self, task_id):
+        return self.snapshots.find_one({"_id": task_id, "deleted": {"$ne": True}})
+
+    def get_many(self, task_ids):
+        return self.snapshots.find({"_id": {"$in": list(task_ids)}, "deleted": {"$ne": True}})
+
+    def upsert(self, snapshot):
+        try:
+            self.snapshots.replace_one(snapshot_guard(snapshot), snapshot, upsert=True)
+        except DuplicateKeyError:
+            pass  # já há um snapshot mais novo
+
+    def write(self, upserts, deletes):
+        ops = [ReplaceOne(snapshot_guard(doc), doc, upsert=True) for doc in list(upserts) + list(deletes)]
+        if not ops:
+            return
+        try:
+            self.snapshots.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # 11000: o gravado é mais novo, o filtro não casou e o upsert colidiu no _id (descartado)
+            if e.details.get("writeConcernErrors") or any(
+                    err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+
+    def sync_state(self, name):
+        return self._get_db().sync_state.find_one({"_id": name}) or {}
+
+    def set_sync_cursor(self, name, cursor, cursor_id=None):
+        self._get_db().sync_state.update_one({"_id": name}, {"$set": {"cursor": cursor, "cursor_id": cursor_id}},
+                                             upsert=True)
+
+    def acquire_lease(self, name, owner, duration):
+        state = self._get_db().sync_state
+        now = time.time()
+        try:
+            state.insert_one({"_id": name, "cursor": None, "lease_owner": None, "lease_until": 0})
+        except DuplicateKeyError:
+            pass
+        result = state.update_one(
+            {"_id": name, "$or": [{"lease_until": {"$lt": now}}, {"lease_owner": owner}]},
+            {"$set": {"lease_owner": owner, "lease_until": now + duration}},
+        )
+        return result.matched_count == 1
+
+
+class MongoIdempotencyStore(IdempotencyStore):
+    def __init__(self, get_db):
+        self._get_db = get_db
+
+    @property
+    def records(self):
+        return self._get_db().idempotency
+
+    def ensure_indexes(self):
+        self.records.create_index([("collection", 1), ("idempotency_key", 1)], unique=True, sparse=True)
+        # o Mongo remove o registro quando expires_at passa
+        self.records.create_index([("expires_at", 1)], expireAfterSeconds=0)
+
+    def insert(self, record):
+        try:
+            self.records.insert_one(record)
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def insert_many(self, records):
+        try:
+            self.records.insert_many(records, ordered=False)
+        except BulkWriteError as e:
+            return [err["index"] for err in e.details.get("writeErrors", []) if err.get("code") == 11000]
+        return []
+
+    def find(self, collection, key):
+        # busca por (coleção, chave) e não por _id: registros antigos não têm o _id determinístico
+        return self.records.find_one({"collection": collection, "idempotency_key": key})
+
+    def find_many(self, collection, keys):
+        return list(self.records.find({"collection": collection, "idempotency_key": {"$in": list(keys)}}))
+
+    def delete_pending(self, record_id, created_at=None):
+        flt = {"_id": record_id, "state": "pending"}
+        if created_at is not None:
+            flt["created_at"] = created_at
+        self.records.delete_one(flt)
+
+    def delete_pending_many(self, record_ids):
+        self.records.delete_many({"_id": {"$in": list(record_ids)}, "state": "pending"})
+
+    def mark_done(self, record_id):
+        self.records.update_one({"_id": record_id}, {"$set": {"state": "done"}})
+
+
+
+# ---------------------------------------------------------------------
+# Em memória
+# ---------------------------------------------------------------------
+class MemoryNotesStore(NotesStore):
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs = {}      # _id -> nota
+        self._ids = []       # _ids ordenados (paginação por cursor)
+        self._by_task = {}   # task_id -> {_id}
+        self._unverified = set()
+        self._markers = {}
+
+    def _add(self, doc):
+        doc = dict(doc)
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error _id: {doc['_id']}")
+        self._docs[doc["_id"]] = doc
+        bisect.insort(self._ids, doc["_id"])
+        self._by_task.setdefault(doc.get("task_id"), set()).add(doc["_id"])
+        if doc.get("task_unverified"):
+            self._unverified.add(doc["_id"])
+
+    def insert(self, doc):
+        with self._lock:
+            self._add(doc)
+
+    def insert_many(self, docs):
+        failed = {}
+        with self._lock:
+            for pos, doc in enumerate(docs):
+                try:
+                    self._add(doc)
+                except DuplicateKeyError as e:
+                    failed[pos] = str(e)
+        return failed
+
+    def exists(self, note_id):
+        return note_id in self._docs
+
+    def existing_ids(self, note_ids):
+        with self._lock:
+            return {i for i in note_ids if i in self._docs}
+
+    def list(self, after=None, limit=None, projection=None, batch_size=None, shape=None):
+        with self._lock:
+            start = bisect.bisect_right(self._ids, after) if after else 0
+            end = None if limit is None else start + limit
+            if shape is not None:
+                return [_shape(self._docs[i], shape) for i in self._ids[start:end]]
+            return [_project(self._docs[i], projection) for i in self._ids[start:end]]
+
+    def find_by_tasks(self, task_ids, projection=None, shape=None):
+        with self._lock:
+            out = []
+            for task_id in sorted(set(task_ids)):
+                docs = sorted((self._docs[i] for i in self._by_task.get(task_id, ())),
+                              key=lambda d: (d.get("criado_em") or "", d["_id"]))
+                if shape is not None:
+                    out.extend(_shape(d, shape) for d in docs)
+                else:
+                    out.extend(_project(d, projection) for d in docs)
+            return out
+
+    def find_many(self, note_ids, projection=None):
+        with self._lock:
+            return [_project(self._docs[i], projection) for i in note_ids if i in self._docs]
+
+    def update(self, note_id, fields):
+        with self._lock:
+            doc = self._docs.get(note_id)
+            if doc is None:
+                return None
+            doc.update(fields)
+            doc["rev"] = doc.get("rev", 0) + 1
+            return dict(doc)
+
+    def delete(self, note_id):
+        with self._lock:
+            doc = self._docs.pop(note_id, None)
+            if doc is None:
+                return None
+            del self._ids[bisect.bisect_left(self._ids, note_id)]
+            self._unverified.discard(note_id)
+            task_notes = self._by_task.get(doc.get("task_id"))
+            task_notes.discard(note_id)
+            if not task_notes:
+                del self._by_task[doc.get("task_id")]
+            return _project(doc, {"task_id": 1, RESOURCE_FIELD: 1})
+
+    def write(self, updates, deletes):
+        with self._lock:
+            for note_id, fields in updates:
+                doc = self._docs.get(note_id)
+                if doc is not None:
+                    doc.update(fields)
+            for note_id in deletes:
+                self.delete(note_id)
+        return {}
+
+    def find_unverified(self, limit):
+        with self._lock:
+            return [_project(self._docs[i], {"task_id": 1}) for i in sorted(self._unverified)[:limit]]
+
+    def settle_unverified(self, note_ids, task_missing=False):
+        with self._lock:
+            for note_id in note_ids:
+                if note_id not in self._unverified:
+                    continue
+                self._unverified.discard(note_id)
+                doc = self._docs[note_id]
+                doc.pop("task_unverified", None)
+                if task_missing:
+                    doc["task_missing"] = True
+
+    def bump_markers(self, task_ids):
+        with self._lock:
+            for name in marker_names(task_ids):
+                marker = self._markers.setdefault(name, {"_id": name, "epoch": str(ObjectId()), "version": 0})
+                marker["version"] += 1
+
+    def marker(self, name):
+        with self._lock:
+            marker = self._markers.get(name)
+            return dict(marker) if marker else None
+
+
+class MemorySnapshotStore(SnapshotStore):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._state = {}
+
+    def get(self, task_id):
+        snapshot = self._snapshots.get(task_id)
+        return None if snapshot is None or snapshot.get("deleted") else snapshot
+
+    def get_many(self, task_ids):
+        with self._lock:
+            return [self._snapshots[i] for i in task_ids if i in self._snapshots and not self._snapshots[i].get("deleted")]
+
+    def upsert(self, snapshot):
+        self.write([snapshot], [])
+
+    def write(self, upserts, deletes):
+        with self._lock:
+            for doc in list(upserts) + list(deletes):
+                current = self._snapshots.get(doc["_id"])
+                if current is None or not _is_newer(current, doc):
+                    self._snapshots[doc["_id"]] = dict(doc)
+
+    def sync_state(self, name):
+        with self._lock:
+            return dict(self._state.get(name, {}))
+
+    def set_sync_cursor(self, name, cursor, cursor_id=None):
+        with self._lock:
+            self._state.setdefault(name, {"_id": name}).update(cursor=cursor, cursor_id=cursor_id)
+
+    def acquire_lease(self, name, owner, duration):
+        now = time.time()
+        with self._lock:
+            state = self._state.setdefault(name, {"_id": name, "cursor": None, "lease_owner": None, "lease_until": 0})
+            if state["lease_until"] < now or state["lease_owner"] == owner:
+                state.update(lease_owner=owner, lease_until=now + duration)
+                return True
+            return False
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """Respeita expires_at na leitura (o equivalente ao índice TTL do Mongo)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {}
+
+    def _live(self, record_id):
+        record = self._records.get(record_id)
+        if record is not None and record.get("expires_at") is not None:
+            now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+            if record["expires_at"] <= now:
+                del self._records[record_id]
+                return None
+        return record
+
+    def insert(self, record):
+        with self._lock:
+            if self._live(record["_id"]) is not None:
+                return False
+            self._records[record["_id"]] = dict(record)
+            return True
+
+    def insert_many(self, records):
+        return [pos for pos, record in enumerate(records) if not self.insert(record)]
+
+    def find(self, collection, key):
+        with self._lock:
+            record = self._live(record_id(collection, key))
+            return dict(record) if record else None
+
+    def find_many(self, collection, keys):
+        return [r for r in (self.find(collection, key) for key in keys) if r is not None]
+
+    def delete_pending(self, record_id, created_at=None):
+        with self._lock:
+            record = self._records.get(record_id)
+            if record is not None and record.get("state") == "pending" and (
+                    created_at is None or record.get("created_at") == created_at):
+                del self._records[record_id]
+
+    def delete_pending_many(self, record_ids):
+        for record_id in record_ids:
+            self.delete_pending(record_id)
+
+    def mark_done(self, record_id):
+        with self._lock:
+            record = self._records.get(record_id)
+            if record is not None:
+                record["state"] = "done"
+
+
+BACKENDS = {
+    "mongo": lambda get_db: (MongoNotesStore(get_db), MongoSnapshotStore(get_db), MongoIdempotencyStore(get_db)),
+    "memory": lambda get_db: (MemoryNotesStore(), MemorySnapshotStore(), MemoryIdempotencyStore()),
+}
+
+
+def create_stores(backend, get_db=None):
+    """(NotesStore, SnapshotStore, IdempotencyStore) do backend pedido ("mongo" ou "memory")."""
+    try:
+        factory = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    return factory(get_db)
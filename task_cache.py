@@ -0,0 +1,112 @@
+# task_cache.py (cache em processo para validação de tasks)
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Cache LRU limitado com expiração por entrada.
+    Thread-safe (um lock por instância); valores expirados são descartados na leitura.
+    `on_hit(key)` / `on_miss(key)` / `on_evict(key)` são chamados fora do lock (ex.: métricas).
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0, clock=time.monotonic, on_evict=None, on_hit=None, on_miss=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._on_evict = on_evict
+        self._on_hit = on_hit
+        self._on_miss = on_miss
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            hit = entry is not None and entry[0] > self._clock()
+            if hit:
+                self._data.move_to_end(key)
+                self.hits += 1
+            else:
+                if entry is not None:
+                    del self._data[key]
+                    self.expirations += 1
+                self.misses += 1
+        callback = self._on_hit if hit else self._on_miss
+        if callback is not None:
+            callback(key)
+        return entry[1] if hit else default
+
+    def peek(self, key, default=None):
+        """
+        Leitura sem contar hit/miss: para a segunda verificação no caminho de preenchimento
+        (o get anterior da mesma consulta já contou), cada consulta conta uma vez.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= self._clock():
+                return default
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        if self.maxsize <= 0:
+            return
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        evicted = []
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted.append(self._data.popitem(last=False)[0])
+                self.evictions += 1
+        if self._on_evict is not None:
+            for old_key in evicted:
+                self._on_evict(old_key)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class TaskValidationCache(TTLCache):
+    """
+    Guarda o resultado de validate_task_id_hybrid por task_id.
+    Resultados positivos ficam `ttl` segundos; "not_found" fica `negative_ttl`
+    (mais curto, para uma task recém-criada aparecer logo). "unavailable" nunca é cacheado.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0, negative_ttl=5.0, clock=time.monotonic, on_evict=None,
+                 on_hit=None, on_miss=None):
+        super().__init__(maxsize=maxsize, ttl=ttl, clock=clock, on_evict=on_evict, on_hit=on_hit, on_miss=on_miss)
+        self.negative_ttl = negative_ttl
+
+    def store(self, task_id, result):
+        valid, reason, _snapshot = result
+        if valid is True:
+            self.set(task_id, result)
+        elif valid is False and reason == "not_found" and self.negative_ttl > 0:
+            self.set(task_id, result, ttl=self.negative_ttl)
@@ -0,0 +1,230 @@
+# task_sync.py (sincronização antecipada de task_snapshots a partir do tasks-service)
+#
+# Duas fontes, ambas gravando em lote no SnapshotStore (bulk_write em task_snapshots no Mongo):
+#   - eventos empurrados pelo tasks-service em POST /internal/task-events;
+#   - pull incremental periódico por `atualizado_em` (TASK_SYNC_INTERVAL > 0).
+# Assim a criação de notas quase nunca precisa do fallback síncrono de validate_task_id_hybrid.
+#
+# Contrato do pull: GET <path>?<since_param>=<ts>&<after_id_param>=<id>&limit=<n> devolve as tasks
+# com (atualizado_em, id) depois do cursor, em ordem; sem o id, `since` é inclusivo (a fronteira é
+# relida e filtrada aqui). Páginas cheias continuam até esgotar. Tasks removidas chegam como
+# tombstones (`deleted`/`excluida` verdadeiro ou status "deleted").
+#
+# Remoções viram tombstones em task_snapshots ({"_id", "deleted": True, "atualizado_em"}) e toda
+# gravação é condicional a `atualizado_em` (ver SnapshotStore.write): um webhook atrasado ou
+# reenviado não sobrescreve um snapshot mais novo nem ressuscita uma task já removida.
+#
+# on_change invalida o cache de validação só do processo que gravou: os demais workers continuam
+# servindo o resultado em cache até o TTL (TASK_CACHE_TTL / TASK_CACHE_NEGATIVE_TTL).
+import logging
+import threading
+import time
+import uuid
+
+import requests
+from bson.objectid import ObjectId
+
+logger = logging.getLogger(__name__)
+
+STATE_ID = "task_snapshots"
+UPSERT_EVENTS = ("created", "updated", "upserted")
+DELETE_EVENTS = ("deleted",)
+TOMBSTONE_STATUSES = ("deleted", "excluida")
+
+
+def build_task_snapshot(task_id, task):
+    """Documento de task_snapshots a partir do payload do tasks-service."""
+    now = _now()
+    return {
+        "_id": ObjectId(task_id),
+        "titulo": task.get("titulo") or task.get("title"),
+        "descricao": task.get("descricao") or task.get("description"),
+        "owner": task.get("owner") if isinstance(task, dict) else None,
+        "status": task.get("status", "open"),
+        "criado_em": task.get("criado_em", now),
+        "atualizado_em": task.get("atualizado_em", now)
+    }
+
+
+def build_task_tombstone(task_id, task):
+    """Tombstone de uma task removida: guarda o atualizado_em da remoção para o upsert condicional."""
+    return {
+        "_id": ObjectId(task_id),
+        "deleted": True,
+        "atualizado_em": task.get("atualizado_em") or _now()
+    }
+
+
+def _now():
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def _task_id(task):
+    raw = task.get("id") or task.get("_id")
+    if isinstance(raw, dict):  # {"$oid": "..."} vindo de um export JSON do Mongo
+        raw = raw.get("$oid")
+    try:
+        return str(ObjectId(raw))
+    except Exception:
+        return None
+
+
+def _is_tombstone(task):
+    return bool(task.get("deleted") or task.get("excluida")) or task.get("status") in TOMBSTONE_STATUSES
+
+
+class TaskSnapshotSync:
+    """
+    Mantém task_snapshots atualizado antes de as notas precisarem dele.
+    `store` é o SnapshotStore (ver storage.py); `on_change(task_id)` é chamado para cada
+    task alterada (ex.: invalidar o cache de validação em processo).
+    """
+
+    def __init__(self, store, base_url, session=None, on_change=None, batch_size=500,
+                 path="/tarefas", since_param="atualizado_desde", after_id_param="apos_id",
+                 page_size=500, timeout=5.0):
+        self.store = store
+        self.base_url = base_url.rstrip("/")
+        self.session = session or requests.Session()
+        self.on_change = on_change
+        self.batch_size = batch_size
+        self.path = path
+        self.since_param = since_param
+        self.after_id_param = after_id_param
+        self.page_size = page_size
+        self.timeout = timeout
+        self.owner = uuid.uuid4().hex
+        self._stop = threading.Event()
+        self._thread = None
+
+    # -----------------------------------------------------------------
+    # Escrita em lote
+    # -----------------------------------------------------------------
+    def _write(self, upserts, deletes, changed):
+        ops = [(doc, False) for doc in upserts] + [(doc, True) for doc in deletes]
+        for start in range(0, len(ops), self.batch_size):
+            chunk = ops[start:start + self.batch_size]
+            self.store.write([doc for doc, deleted in chunk if not deleted],
+                             [doc for doc, deleted in chunk if deleted])
+        if self.on_change:
+            for task_id in changed:
+                self.on_change(task_id)
+
+    def apply_events(self, events):
+        """
+        Aplica eventos {"type": "task.created|task.updated|task.deleted", "task": {...}}.
+        Vários eventos da mesma task no lote viram uma única operação: vale o de maior
+        `atualizado_em` (sem data conta como agora; no empate, o último da lista).
+        Retorna contagens {"upserted", "deleted", "ignored"}.
+        """
+        latest = {}
+        ignored = 0
+        now = _now()
+        for event in events:
+            if not isinstance(event, dict) or not isinstance(event.get("task"), dict):
+                ignored += 1
+                continue
+            kind = str(event.get("type", "")).rsplit(".", 1)[-1]
+            task_id = _task_id(event["task"])
+            if task_id is None or kind not in UPSERT_EVENTS + DELETE_EVENTS:
+                ignored += 1
+                continue
+            updated_at = event["task"].get("atualizado_em") or now
+            if task_id in latest and latest[task_id][0] > updated_at:
+                continue  # entrega fora de ordem: o lote já tem uma versão mais nova
+            latest[task_id] = (updated_at, kind, event["task"])
+
+        upserts, deletes = [], []
+        for task_id, (_updated_at, kind, task) in latest.items():
+            if kind in DELETE_EVENTS:
+                deletes.append(build_task_tombstone(task_id, task))
+            else:
+                upserts.append(build_task_snapshot(task_id, task))
+        if latest:
+            self._write(upserts, deletes, list(latest))
+        return {"upserted": len(upserts), "deleted": len(deletes), "ignored": ignored}
+
+    # -----------------------------------------------------------------
+    # Pull incremental por atualizado_em
+    # -----------------------------------------------------------------
+    def _fetch_page(self, cursor, cursor_id):
+        params = {"limit": self.page_size}
+        if cursor:
+            params[self.since_param] = cursor
+        if cursor_id:
+            params[self.after_id_param] = cursor_id
+        r = self.session.get(f"{self.base_url}{self.path}", params=params, timeout=self.timeout)
+        r.raise_for_status()
+        body = r.json()
+        return body.get("items", []) if isinstance(body, dict) else body
+
+    def pull_once(self):
+        """
+        Busca as tasks alteradas desde o cursor (atualizado_em, id), página a página, e grava cada
+        página em lote, avançando o cursor. Retorna quantas tasks foram gravadas ou removidas.
+        """
+        state = self.store.sync_state(STATE_ID)
+        cursor, cursor_id = state.get("cursor"), state.get("cursor_id")
+        total = 0
+        while True:
+            tasks = self._fetch_page(cursor, cursor_id)
+            upserts, deletes, changed = [], [], []
+            position = (cursor or "", cursor_id or "")
+            new_position = position
+            for task in tasks:
+                task_id = _task_id(task) if isinstance(task, dict) else None
+                if task_id is None:
+                    continue
+                updated_at = task.get("atualizado_em")
+                key = (updated_at or "", task_id)
+                # o filtro também é aplicado aqui: fronteira relida ou serviço que ignora os parâmetros
+                if cursor and updated_at and key <= position:
+                    continue
+                if _is_tombstone(task):
+                    deletes.append(build_task_tombstone(task_id, task))
+                else:
+                    upserts.append(build_task_snapshot(task_id, task))
+                changed.append(task_id)
+                if updated_at and key > new_position:
+                    new_position = key
+
+            if changed:
+                self._write(upserts, deletes, changed)
+                total += len(changed)
+            if new_position != position:
+                cursor, cursor_id = new_position
+                self.store.set_sync_cursor(STATE_ID, cursor, cursor_id)
+            if len(tasks) < self.page_size:
+                return total
+            if new_position == position:
+                # página cheia sem nada depois do cursor: o serviço não pagina pelo cursor
+                logger.warning("Pull de tasks parado em %s/%s: página cheia sem avanço do cursor", cursor, cursor_id)
+                return total
+
+    # -----------------------------------------------------------------
+    # Thread de fundo (um único worker por vez, via lease em sync_state)
+    # -----------------------------------------------------------------
+    def acquire_lease(self, duration):
+        return self.store.acquire_lease(STATE_ID, self.owner, duration)
+
+    def _run(self, interval):
+        while not self._stop.is_set():
+            try:
+                if self.acquire_lease(interval * 3):
+                    self.pull_once()
+            except Exception as e:
+                logger.warning("Sincronização de task_snapshots falhou: %s", e)
+            self._stop.wait(interval)
+
+    def start(self, interval):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="task-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,77 @@
+# task_verifier.py (verificação assíncrona de notas aceitas sem validar a task)
+#
+# Com TASKS_ACCEPT_UNKNOWN, uma nota cuja task não está no snapshot/cache é gravada mesmo com
+# o tasks-service indisponível, marcada com `task_unverified`. Esta thread revalida essas tasks
+# depois (em lote, pelo mesmo caminho de validação das rotas): task existente -> marca removida;
+# task inexistente -> a nota fica com `task_missing` (não é apagada) e um aviso vai para o log.
+import logging
+import threading
+
+from circuit_breaker import OPEN
+
+logger = logging.getLogger(__name__)
+
+
+class UnverifiedNotesVerifier:
+    """
+    `store`: NotesStore; `validate_many(task_ids)` -> {task_id: (valid, reason, snapshot)}
+    (validate_task_ids_bulk). Com o `breaker` aberto a passada é pulada.
+    As operações são idempotentes, então vários workers podem rodar ao mesmo tempo.
+    """
+
+    def __init__(self, store, validate_many, breaker=None, batch_size=200):
+        self.store = store
+        self.validate_many = validate_many
+        self.breaker = breaker
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        """Uma passada; retorna quantas notas foram resolvidas."""
+        if self.breaker is not None and self.breaker.state == OPEN:
+            return 0
+        notes = self.store.find_unverified(self.batch_size)
+        if not notes:
+            return 0
+        results = self.validate_many([str(n["task_id"]) for n in notes])
+        verified, missing = [], []
+        for n in notes:
+            valid = results[str(n["task_id"])][0]
+            if valid is True:
+                verified.append(n["_id"])
+            elif valid is False:
+                missing.append(n["_id"])
+        if verified:
+            self.store.settle_unverified(verified)
+        if missing:
+            self.store.settle_unverified(missing, task_missing=True)
+            logger.warning("%d nota(s) aceitas sem validação apontam para task inexistente: %s",
+                           len(missing), ", ".join(str(i) for i in missing[:20]))
+        return len(verified) + len(missing)
+
+    # -----------------------------------------------------------------
+    # Thread de fundo
+    # -----------------------------------------------------------------
+    def _run(self, interval):
+        while not self._stop.is_set():
+            try:
+                # lotes cheios: continua sem esperar o intervalo
+                while self.run_once() >= self.batch_size and not self._stop.is_set():
+                    pass
+            except Exception as e:
+                logger.warning("Verificação de notas pendentes falhou: %s", e)
+            self._stop.wait(interval)
+
+    def start(self, interval):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="task-verifier", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,49 @@
+import os
+import sys
+
+import mongomock
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import app, mongo, task_validation_cache, tasks_breaker
+
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+
+    # Mocka o MongoDB com mongomock (banco novo a cada teste)
+    mongo.cx = mongomock.MongoClient()
+    mongo.db = mongo.cx["notes_testdb"]
+    task_validation_cache.clear()
+    tasks_breaker.reset()
+
+    yield app.test_client()
+    task_validation_cache.clear()
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self._payload = payload or {}
+
+    def json(self):
+        return self._payload
+
+
+class FakeTasksSession:
+    """Substitui app._http_session: responde a GET /tarefas/<id> a partir de um dict."""
+
+    def __init__(self, tasks=None, status_code=None):
+        self.tasks = tasks or {}
+        self.status_code = status_code
+        self.calls = []
+
+    def get(self, url, timeout=None):
+        self.calls.append(url)
+        if self.status_code is not None:
+            return FakeResponse(self.status_code)
+        task_id = url.rstrip("/").rsplit("/", 1)[-1]
+        if task_id in self.tasks:
+            return FakeResponse(200, self.tasks[task_id])
+        return FakeResponse(404)
@@ -0,0 +1,170 @@
+# tests/stubs.py (serviços falsos para testes e benchmarks: emissor JWT, JWKS, tasks-service)
+import base64
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import rsa
+from jose import jwt
+
+
+def _b64url_uint(value):
+    raw = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+class RSAIssuer:
+    """
+    Gera um par RSA e assina tokens RS256 reais, expondo o JWKS correspondente.
+    Usado pelos testes de auth e pelos benchmarks no lugar do tenant Auth0.
+    """
+
+    def __init__(self, domain="issuer.test", audience="notes-api", bits=2048, kid=None):
+        self.domain = domain
+        self.audience = audience
+        self.kid = kid or uuid.uuid4().hex
+        public_key, private_key = rsa.newkeys(bits)
+        self._public_key = public_key
+        self._private_pem = private_key.save_pkcs1().decode()
+
+    @property
+    def issuer(self):
+        return f"https://{self.domain}/"
+
+    def jwks(self):
+        return {"keys": [{
+            "kty": "RSA",
+            "kid": self.kid,
+            "use": "sig",
+            "alg": "RS256",
+            "n": _b64url_uint(self._public_key.n),
+            "e": _b64url_uint(self._public_key.e),
+        }]}
+
+    def token(self, sub="auth0|bench", ttl=3600, **claims):
+        now = int(time.time())
+        payload = {"sub": sub, "aud": self.audience, "iss": self.issuer, "iat": now, "exp": now + ttl}
+        payload.update(claims)
+        return jwt.encode(payload, self._private_pem, algorithm="RS256", headers={"kid": self.kid})
+
+
+class StubServer:
+    """
+    Servidor HTTP local (porta efêmera) numa thread de fundo.
+    Subclasses implementam `handle(method, path, body)` -> (status, payload).
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.hits = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, method):
+                with stub._lock:
+                    stub.hits += 1
+                if stub.delay:
+                    time.sleep(stub.delay)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                status, payload = stub.handle(method, self.path, body, self.headers)
+                raw = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def handle(self, method, path, body, headers):
+        return 404, {"error": "not found"}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StubJWKSServer(StubServer):
+    """Serve /.well-known/jwks.json com as chaves públicas dos emissores em `issuers`."""
+
+    def __init__(self, *issuers, delay=0.0):
+        super().__init__(delay=delay)
+        self.issuers = list(issuers)
+
+    @property
+    def jwks_url(self):
+        return f"{self.url}/.well-known/jwks.json"
+
+    def handle(self, method, path, body, headers):
+        if method == "GET" and path == "/.well-known/jwks.json":
+            return 200, {"keys": [k for issuer in self.issuers for k in issuer.jwks()["keys"]]}
+        return 404, {"error": "not found"}
+
+
+class StubTasksService(StubServer):
+    """
+    tasks-service falso: GET /tarefas/<id> e GET /tarefas?atualizado_desde=<iso>[&apos_id=<id>][&limit=n]
+    (lista incremental em ordem de (atualizado_em, id); sem apos_id, atualizado_desde é inclusivo).
+    `tasks` é um dict task_id -> payload (com "deleted": True, um tombstone: só aparece na lista);
+    `status_code` força uma resposta de erro.
+    """
+
+    def __init__(self, tasks=None, delay=0.0, status_code=None):
+        super().__init__(delay=delay)
+        self.tasks = dict(tasks or {})
+        self.status_code = status_code
+
+    def handle(self, method, path, body, headers):
+        if self.status_code is not None:
+            return self.status_code, {"error": "stub"}
+        parts = urlsplit(path)
+        route = parts.path
+        if method == "GET" and route == "/tarefas":
+            query = parse_qs(parts.query)
+            since = query.get("atualizado_desde", [""])[0]
+            after_id = query.get("apos_id", [""])[0]
+            limit = int(query.get("limit", [0])[0]) or None
+            items = sorted((dict(t, id=tid) for tid, t in self.tasks.items()),
+                           key=lambda t: (t.get("atualizado_em", ""), t["id"]))
+            if since:
+                items = [t for t in items if (t.get("atualizado_em", ""), t["id"]) > (since, after_id)
+                         or (not after_id and t.get("atualizado_em", "") == since)]
+            return 200, items[:limit]
+        if method == "GET" and route.startswith("/tarefas/"):
+            task_id = route.rsplit("/", 1)[-1]
+            if task_id in self.tasks and not self.tasks[task_id].get("deleted"):
+                return 200, dict(self.tasks[task_id], id=task_id)
+            return 404, {"error": "Task not found"}
+        return 404, {"error": "not found"}
@@ -0,0 +1,61 @@
+import logging
+
+import flask
+from bson.objectid import ObjectId
+
+import access_log
+from conftest import FakeTasksSession
+
+
+def _access_records(caplog):
+    return [r.fields for r in caplog.records if r.name == "notes.access"]
+
+
+def test_access_log_fields(client, caplog, monkeypatch):
+    task_id = str(ObjectId())
+    monkeypatch.setattr("app._http_session", FakeTasksSession({task_id: {"titulo": "T"}}))
+    caplog.set_level(logging.INFO, logger="notes.access")
+
+    res = client.get(f"/tarefas/{task_id}/notes")
+    assert res.status_code == 200
+    [fields] = _access_records(caplog)
+    assert fields["method"] == "GET"
+    assert fields["path"] == f"/tarefas/{task_id}/notes"
+    assert fields["status"] == 200
+    assert fields["latency_ms"] >= 0
+    assert fields["upstream_calls"] == 1
+    assert "body_preview" not in fields
+
+def test_access_log_does_not_read_body(client, caplog, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("o corpo não deveria ser lido")
+
+    monkeypatch.setattr(flask.Request, "get_data", fail)
+    caplog.set_level(logging.INFO, logger="notes.access")
+    assert client.get("/health", data="x" * 10000).status_code == 200
+    assert len(_access_records(caplog)) == 1
+
+def test_access_log_sampling_keeps_errors(client, caplog, monkeypatch):
+    monkeypatch.setattr(access_log, "ACCESS_LOG_SAMPLE_RATE", 0.0)
+    caplog.set_level(logging.INFO, logger="notes.access")
+
+    client.get("/health")
+    assert _access_records(caplog) == []
+    access_log.log_access("GET", "/x", 503, 0.01)
+    assert [f["status"] for f in _access_records(caplog)] == [503]
+
+def test_mongo_listener_accumulates_per_request(client):
+    class Event:
+        duration_micros = 1500
+
+    listener = access_log.MongoTimingListener()
+    with client.application.test_request_context("/"):
+        listener.succeeded(Event())
+        listener.succeeded(Event())
+        assert flask.g.dependency_timings["mongo"] == (0.003, 2)
+
+def test_json_formatter():
+    record = logging.LogRecord("notes.access", logging.INFO, __file__, 1, "GET /x", None, None)
+    record.fields = {"status": 200}
+    line = access_log.JsonFormatter().format(record)
+    assert '"status": 200' in line and '"msg": "GET /x"' in line
@@ -76,3 +76,47 @@ def test_update_note_not_found(client):
 def test_delete_note_not_found(client):
     res = client.delete("/notes/000000000000000000000000")
     assert res.status_code in (400, 404)
+
+
+# ----------------- PAGINAÇÃO / PROJEÇÃO / STREAMING ----------------- #
+def _seed_notes(n):
+    docs = [{"title": f"Nota {i}", "content": f"Conteúdo {i}", "autor": "auth0|x"} for i in range(n)]
+    mongo.db.notes.insert_many(docs)
+    return [str(d["_id"]) for d in docs]
+
+def test_get_notes_cursor_pagination(client):
+    ids = _seed_notes(5)
+    res = client.get("/notes?limit=2")
+    assert res.status_code == 200
+    assert [n["id"] for n in res.json["items"]] == ids[:2]
+    assert res.json["next_cursor"] == ids[1]
+
+    res = client.get(f"/notes?limit=2&after={res.json['next_cursor']}")
+    assert [n["id"] for n in res.json["items"]] == ids[2:4]
+
+    res = client.get(f"/notes?limit=2&after={ids[3]}")
+    assert [n["id"] for n in res.json["items"]] == ids[4:]
+    assert res.json["next_cursor"] is None
+
+def test_get_notes_fields_projection(client):
+    _seed_notes(2)
+    res = client.get("/notes?fields=title,autor")
+    assert res.status_code == 200
+    assert set(res.json[0]) == {"id", "title", "autor"}
+
+def test_get_notes_stream(client, monkeypatch):
+    monkeypatch.setattr("app.NOTES_STREAM_CHUNK", 2)
+    ids = _seed_notes(7)
+    res = client.get("/notes?stream=1")
+    assert res.status_code == 200
+    assert [n["id"] for n in res.get_json()] == ids
+
+    res = client.get("/notes?stream=1&limit=3")
+    body = res.get_json()
+    assert [n["id"] for n in body["items"]] == ids[:3]
+    assert body["next_cursor"] == ids[2]
+
+def test_get_notes_invalid_params(client):
+    assert client.get("/notes?limit=abc").status_code == 400
+    assert client.get("/notes?after=xyz").status_code == 400
+    assert client.get("/notes?fields=senha").status_code == 400
@@ -0,0 +1,117 @@
+# Roda as mesmas funções de teste de test_app.py contra o modo assíncrono (app_async),
+# trocando apenas a fixture `client`.
+import asyncio
+import json
+
+import mongomock
+import pytest
+from bson.objectid import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+import app_async
+from app import mongo, task_validation_cache
+from conftest import FakeResponse
+from test_app import *  # noqa: F401,F403
+from test_etags import *  # noqa: F401,F403
+
+
+class SyncResponse:
+    def __init__(self, status_code, data, headers):
+        self.status_code = status_code
+        self.data = data
+        self.headers = headers
+
+    @property
+    def json(self):
+        return json.loads(self.data) if self.data else None
+
+    def get_json(self):
+        return self.json
+
+
+class SyncASGIClient:
+    """Adapta o test client do Quart para a interface síncrona usada em test_app.py."""
+
+    def __init__(self, quart_app):
+        self._client = quart_app.test_client()
+        self._loop = asyncio.new_event_loop()
+
+    def _request(self, method, path, **kwargs):
+        async def call():
+            res = await getattr(self._client, method)(path, **kwargs)
+            return SyncResponse(res.status_code, await res.get_data(), res.headers)
+        return self._loop.run_until_complete(call())
+
+    def get(self, path, **kwargs):
+        return self._request("get", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self._request("post", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self._request("put", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self._request("delete", path, **kwargs)
+
+    def close(self):
+        self._loop.close()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    app_async.app.config["TESTING"] = True
+
+    # o mesmo mongomock atende o app assíncrono (motor) e o `mongo.db` síncrono usado pelos testes
+    sync_client = mongomock.MongoClient()
+    mongo.cx = sync_client
+    mongo.db = sync_client["notes_testdb"]
+    monkeypatch.setattr(app_async, "db", AsyncMongoMockClient(mock_mongo_client=sync_client)["notes_testdb"])
+    task_validation_cache.clear()
+
+    client = SyncASGIClient(app_async.app)
+    yield client
+    client.close()
+
+
+class FakeAsyncTasksClient:
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self.calls = 0
+
+    async def get(self, url):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        task_id = url.rsplit("/", 1)[-1]
+        return FakeResponse(200, self.tasks[task_id]) if task_id in self.tasks else FakeResponse(404)
+
+
+def test_async_create_and_list_for_task(client, monkeypatch):
+    task_id = str(ObjectId())
+    monkeypatch.setattr(app_async, "http_client", FakeAsyncTasksClient({task_id: {"titulo": "T"}}))
+
+    res = client.post("/notes", json={"title": "A", "content": "a", "task_id": task_id}, headers={"Idempotency-Key": "k"})
+    assert res.status_code == 201
+    again = client.post("/notes", json={"title": "A", "content": "a", "task_id": task_id}, headers={"Idempotency-Key": "k"})
+    assert again.status_code == 200 and again.json["id"] == res.json["id"]
+
+    res = client.get(f"/tarefas/{task_id}/notes")
+    assert res.status_code == 200
+    assert [n["title"] for n in res.json] == ["A"]
+    assert client.get(f"/tarefas/{ObjectId()}/notes").status_code == 404
+
+def test_async_concurrent_validations_share_one_fetch(client, monkeypatch):
+    task_id = str(ObjectId())
+    fake = FakeAsyncTasksClient({task_id: {"titulo": "T"}})
+    monkeypatch.setattr(app_async, "http_client", fake)
+
+    async def many():
+        return await asyncio.gather(*(app_async.validate_task_id_hybrid(task_id) for _ in range(20)))
+
+    results = asyncio.run(many())
+    assert all(r[0] is True for r in results)
+    assert fake.calls == 1
+
+def test_async_health_and_ready(client):
+    assert client.get("/health").json["status"] == "ok"
+    assert client.get("/ready").json["ready"] is True
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+from flask import Flask, g, jsonify
+
+import auth
+from stubs import RSAIssuer
+
+
+@pytest.fixture(scope="module")
+def issuer():
+    return RSAIssuer(bits=1024)
+
+
+@pytest.fixture
+def auth_client(issuer, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH0_DOMAIN", issuer.domain)
+    monkeypatch.setattr(auth, "API_AUDIENCE", issuer.audience)
+    auth._jwks_cache.set(issuer.jwks())
+    auth._verified_tokens.clear()
+
+    app = Flask("auth_test")
+    auth.register_auth_error_handlers(app)
+
+    @app.route("/me")
+    @auth.requires_auth()
+    def me():
+        return jsonify({"sub": g.current_user["sub"]})
+
+    yield app.test_client()
+    auth._jwks_cache.clear()
+
+
+def _bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_valid_token(auth_client, issuer):
+    res = auth_client.get("/me", headers=_bearer(issuer.token(sub="auth0|123")))
+    assert res.status_code == 200
+    assert res.json["sub"] == "auth0|123"
+
+def test_verified_token_is_cached(auth_client, issuer, monkeypatch):
+    token = issuer.token()
+    assert auth_client.get("/me", headers=_bearer(token)).status_code == 200
+
+    def fail(*args, **kwargs):
+        raise AssertionError("jwt.decode não deveria rodar para token em cache")
+
+    monkeypatch.setattr(auth.jwt, "decode", fail)
+    assert auth_client.get("/me", headers=_bearer(token)).status_code == 200
+    assert auth._verified_tokens.stats()["hits"] == 1
+
+def test_cache_entry_expires_with_token(auth_client, issuer, monkeypatch):
+    token = issuer.token(ttl=30)
+    auth.verify_token(token)
+    key = auth._token_cache_key(token)
+    assert auth._verified_tokens.get(key) is not None
+
+    later = time.monotonic() + 31
+    monkeypatch.setattr(auth._verified_tokens, "_clock", lambda: later)
+    assert auth._verified_tokens.get(key) is None
+
+def test_expired_token_rejected(auth_client, issuer):
+    res = auth_client.get("/me", headers=_bearer(issuer.token(ttl=-10)))
+    assert res.status_code == 401
+    assert res.json["code"] == "token_expired"
+
+def test_invalid_tokens_rejected(auth_client, issuer):
+    other = RSAIssuer(domain=issuer.domain, audience=issuer.audience, bits=1024, kid=issuer.kid)
+    res = auth_client.get("/me", headers=_bearer(other.token()))
+    assert res.status_code == 401
+    assert res.json["code"] == "invalid_token"
+
+    res = auth_client.get("/me", headers=_bearer(issuer.token(aud="outra-api")))
+    assert res.json["code"] == "invalid_claims"
+    assert len(auth._verified_tokens) == 0
+
+def test_parse_jwks_indexes_by_kid(issuer):
+    keys = auth.parse_jwks(issuer.jwks())
+    assert list(keys) == [issuer.kid]
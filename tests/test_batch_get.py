@@ -0,0 +1,56 @@
+from bson.objectid import ObjectId
+
+from conftest import FakeTasksSession
+from app import mongo
+
+
+def _note(task_id, title, criado_em):
+    mongo.db.notes.insert_one({"title": title, "content": "c", "task_id": ObjectId(task_id), "criado_em": criado_em})
+
+
+def test_batch_get_notes_for_tasks(client, monkeypatch):
+    known, remote, missing = str(ObjectId()), str(ObjectId()), str(ObjectId())
+    mongo.db.task_snapshots.insert_one({"_id": ObjectId(known), "titulo": "T"})
+    session = FakeTasksSession({remote: {"titulo": "remota"}})
+    monkeypatch.setattr("app._http_session", session)
+    _note(known, "segunda", "2024-01-02T00:00:00Z")
+    _note(known, "primeira", "2024-01-01T00:00:00Z")
+    _note(remote, "r", "2024-01-01T00:00:00Z")
+    _note(str(ObjectId()), "de outra task", "2024-01-01T00:00:00Z")
+
+    res = client.post("/tarefas/notes:batchGet", json={"task_ids": [remote, known, missing, "xyz", known]})
+    assert res.status_code == 200
+    results = res.json["results"]
+    assert list(results) == [remote, known, missing, "xyz"]
+    assert [n["title"] for n in results[known]["notes"]] == ["primeira", "segunda"]
+    assert results[known]["status"] == 200 and results[known]["notes"][0]["task_id"] == known
+    assert [n["title"] for n in results[remote]["notes"]] == ["r"]
+    assert results[missing] == {"status": 404, "error": "Task not found"}
+    assert results["xyz"] == {"status": 400, "error": "Invalid task_id"}
+    # só as tasks fora de task_snapshots foram ao tasks-service
+    assert sorted(c.rsplit("/", 1)[-1] for c in session.calls) == sorted([remote, missing])
+
+def test_batch_get_uses_one_notes_query(client, monkeypatch):
+    task_ids = [str(ObjectId()) for _ in range(5)]
+    mongo.db.task_snapshots.insert_many([{"_id": ObjectId(t)} for t in task_ids])
+    for t in task_ids:
+        _note(t, "n", "2024-01-01T00:00:00Z")
+
+    queries = []
+    real_find = mongo.db.notes.find
+    monkeypatch.setattr(mongo.db.notes, "find", lambda *a, **k: queries.append(a) or real_find(*a, **k))
+    res = client.post("/tarefas/notes:batchGet", json=task_ids)
+    assert all(len(r["notes"]) == 1 for r in res.json["results"].values())
+    assert len(queries) == 1
+
+def test_batch_get_unavailable_and_limits(client, monkeypatch):
+    monkeypatch.setattr("app._http_session", FakeTasksSession(status_code=500))
+    task_id = str(ObjectId())
+    res = client.post("/tarefas/notes:batchGet", json={"task_ids": [task_id]})
+    assert res.json["results"][task_id]["status"] == 503
+
+    assert client.post("/tarefas/notes:batchGet", json={"task_ids": []}).status_code == 400
+    assert client.post("/tarefas/notes:batchGet", json={"foo": 1}).status_code == 400
+    monkeypatch.setattr("app.BATCH_GET_MAX_TASKS", 2)
+    ids = [str(ObjectId()) for _ in range(3)]
+    assert client.post("/tarefas/notes:batchGet", json={"task_ids": ids}).status_code == 413
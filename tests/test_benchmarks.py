@@ -0,0 +1,35 @@
+import pytest
+
+from benchmarks import compare, loadtest
+
+
+def test_parse_mix():
+    assert loadtest.parse_mix("create=3,list=1") == {"create": 3.0, "list": 1.0}
+    with pytest.raises(ValueError):
+        loadtest.parse_mix("explode=1")
+    with pytest.raises(ValueError):
+        loadtest.parse_mix("create=0")
+
+
+def test_loadtest_smoke():
+    # app real com auth RS256, tasks-service e JWKS falsos; metade das tasks só via fallback HTTP
+    results = loadtest.run(concurrency=[2], duration=0.5, bits=1024, tasks=10, seed_notes=20)
+
+    level = results["c2"]
+    assert level["requests"] > 0
+    assert set(level["routes"]) <= set(loadtest.ROUTES)
+    for stats in level["routes"].values():
+        assert stats["p50_us"] <= stats["p95_us"] <= stats["p99_us"]
+        assert all(not status.startswith("5") and status != "401" for status in stats["status"])
+
+
+def test_compare_flags_regressions():
+    before = {"results": {"c8": {"rps": 100.0, "routes": {"create": {"p50_us": 100.0, "p99_us": 200.0}}}}}
+    after = {"results": {"c8": {"rps": 95.0, "routes": {"create": {"p50_us": 150.0, "p99_us": 205.0}}}}}
+
+    rows = {(name, field): worse for name, field, _a, _b, _change, worse in compare.compare(before, after, 10.0)}
+    assert rows == {
+        ("c8", "rps"): False,
+        ("c8/routes/create", "p50_us"): True,
+        ("c8/routes/create", "p99_us"): False,
+    }
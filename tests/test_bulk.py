@@ -0,0 +1,69 @@
+from bson.objectid import ObjectId
+
+from conftest import FakeTasksSession
+from app import mongo, validate_task_ids_bulk
+
+
+def _snapshot(task_id):
+    mongo.db.task_snapshots.insert_one({"_id": ObjectId(task_id), "titulo": "T"})
+
+
+def test_validate_task_ids_bulk(client, monkeypatch):
+    known, remote, missing = str(ObjectId()), str(ObjectId()), str(ObjectId())
+    _snapshot(known)
+    session = FakeTasksSession({remote: {"titulo": "remota"}})
+    monkeypatch.setattr("app._http_session", session)
+
+    results = validate_task_ids_bulk([known, remote, missing, "xyz", known])
+    assert results[known][:2] == (True, "ok")
+    assert results[remote][:2] == (True, "ok")
+    assert results[missing][:2] == (False, "not_found")
+    assert results["xyz"][:2] == (False, "invalid_id")
+    # snapshot só é buscado no tasks-service para as que faltavam
+    assert sorted(c.rsplit("/", 1)[-1] for c in session.calls) == sorted([remote, missing])
+
+def test_bulk_create_notes(client, monkeypatch):
+    task_id = str(ObjectId())
+    _snapshot(task_id)
+    monkeypatch.setattr("app._http_session", FakeTasksSession())
+
+    payload = [
+        {"title": "A", "content": "a", "task_id": task_id, "idempotency_key": "k1"},
+        {"title": "B", "content": "b", "task_id": task_id},
+        {"title": "C", "task_id": task_id},
+        {"title": "D", "content": "d", "task_id": str(ObjectId())},
+        {"title": "A", "content": "a", "task_id": task_id, "idempotency_key": "k1"},
+    ]
+    res = client.post("/notes/bulk", json=payload)
+    assert res.status_code == 200
+    statuses = [r["status"] for r in res.json["results"]]
+    assert statuses == [201, 201, 400, 400, 200]
+    assert res.json["created"] == 2
+    assert res.json["results"][4]["note"] == res.json["results"][0]["note"]
+    assert mongo.db.notes.count_documents({}) == 2
+
+    # sem update de conclusão: a nota aponta para a reserva
+    assert mongo.db.notes.find_one({"idempotency_id": "notes:k1"})["title"] == "A"
+
+    # reenvio com a mesma chave não duplica
+    res = client.post("/notes/bulk", json={"notes": payload[:1]})
+    assert res.json["results"][0]["status"] == 200
+    assert mongo.db.notes.count_documents({}) == 2
+
+def test_bulk_create_rejects_bad_payload(client, monkeypatch):
+    monkeypatch.setattr("app.BULK_MAX_ITEMS", 2)
+    assert client.post("/notes/bulk", json={"title": "x"}).status_code == 400
+    assert client.post("/notes/bulk", json=[]).status_code == 400
+    assert client.post("/notes/bulk", json=[{}, {}, {}]).status_code == 413
+
+def test_single_and_bulk_create_record_the_same_author(client, monkeypatch):
+    task_id = str(ObjectId())
+    _snapshot(task_id)
+    monkeypatch.setattr("app._http_session", FakeTasksSession())
+    monkeypatch.setitem(client.application.config, "TESTING", False)  # passa por verify_token (trocado abaixo)
+    monkeypatch.setattr("auth.verify_token", lambda token: {"sub": "auth0|autora"})
+    headers = {"Authorization": "Bearer x"}
+
+    assert client.post("/notes", json={"title": "A", "content": "a", "task_id": task_id}, headers=headers).status_code == 201
+    assert client.post("/notes/bulk", json=[{"title": "B", "content": "b", "task_id": task_id}], headers=headers).json["created"] == 1
+    assert sorted(n["autor"] for n in mongo.db.notes.find()) == ["auth0|autora", "auth0|autora"]
@@ -0,0 +1,121 @@
+import time
+
+from bson.objectid import ObjectId
+
+import app as notes_app
+from app import mongo, validate_task_id_hybrid, tasks_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from conftest import FakeTasksSession
+from test_task_cache import FakeClock
+
+
+def _breaker(clock, **kwargs):
+    options = {"failure_rate": 0.5, "min_calls": 4, "window": 10, "open_for": 5, "clock": clock}
+    return CircuitBreaker("test", **{**options, **kwargs})
+
+def test_breaker_opens_on_failure_rate():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == CLOSED  # abaixo de min_calls
+    breaker.record_success()
+    breaker.record_failure()  # 4 falhas em 5 chamadas
+    assert breaker.state == OPEN
+    assert breaker.allow() is False
+    assert breaker.snapshot()["retry_in_s"] == 5
+
+def test_breaker_window_forgets_old_failures():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now = 11
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["calls"] == 1
+
+def test_breaker_half_open_probe():
+    clock = FakeClock()
+    transitions = []
+    breaker = _breaker(clock, min_calls=1, on_state_change=lambda name, state: transitions.append(state))
+    breaker.record_failure()
+    clock.now = 5
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() is True
+    assert breaker.allow() is False  # uma sonda por vez
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now = 10
+    assert breaker.allow() is True
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow() is True
+    assert transitions == [OPEN, HALF_OPEN, OPEN, HALF_OPEN, CLOSED]
+
+def test_breaker_releases_lost_probe():
+    clock = FakeClock()
+    breaker = _breaker(clock, min_calls=1)
+    breaker.record_failure()
+    clock.now = 5
+    assert breaker.allow() is True  # sonda que nunca reporta
+    clock.now = 9
+    assert breaker.allow() is False
+    clock.now = 10
+    assert breaker.allow() is True
+
+
+# ---------------------------------------------------------------------
+# Integração com validate_task_id_hybrid / rotas
+# ---------------------------------------------------------------------
+def test_open_breaker_fails_fast_and_shows_on_ready(client, monkeypatch):
+    session = FakeTasksSession(status_code=503)
+    monkeypatch.setattr("app._http_session", session)
+    monkeypatch.setattr("app.TASKS_RETRIES", 0)
+    for _ in range(tasks_breaker.min_calls):
+        assert validate_task_id_hybrid(str(ObjectId()))[1] == "unavailable"
+    calls = len(session.calls)
+    assert tasks_breaker.state == OPEN
+
+    assert validate_task_id_hybrid(str(ObjectId())) == (None, "unavailable", None)
+    assert len(session.calls) == calls
+    res = client.get("/ready")
+    assert res.json["tasks_service"]["state"] == OPEN
+
+def test_deadline_caps_retries(client, monkeypatch):
+    session = FakeTasksSession(status_code=503)
+    monkeypatch.setattr("app._http_session", session)
+    monkeypatch.setattr("app.TASKS_DEADLINE", 0.2)
+    monkeypatch.setattr("app.TASKS_RETRY_BACKOFF", 0.15)  # a segunda espera (0,3s) não cabe no prazo
+
+    started = time.monotonic()
+    assert validate_task_id_hybrid(str(ObjectId()))[1] == "unavailable"
+    assert time.monotonic() - started < 0.2
+    assert len(session.calls) == 2
+
+def test_accept_unknown_then_verify(client, monkeypatch):
+    known, missing = str(ObjectId()), str(ObjectId())
+    monkeypatch.setattr("app._http_session", FakeTasksSession(status_code=503))
+    monkeypatch.setattr("app.TASKS_ACCEPT_UNKNOWN", True)
+    monkeypatch.setattr("app.TASKS_RETRIES", 0)
+
+    res = client.post("/notes", json={"title": "T", "content": "C", "task_id": known})
+    assert res.status_code == 201
+    assert res.headers["X-Task-Verification"] == "pending"
+    res = client.post("/notes/bulk", json=[{"title": "T", "content": "C", "task_id": missing}])
+    assert res.json["results"][0]["task_verification"] == "pending"
+    assert mongo.db.notes.count_documents({"task_unverified": True}) == 2
+
+    # tasks-service de volta: a passada do verificador resolve as duas
+    monkeypatch.setattr("app._http_session", FakeTasksSession({known: {"titulo": "T"}}))
+    assert notes_app.task_verifier.run_once() == 2
+    assert mongo.db.notes.count_documents({"task_unverified": True}) == 0
+    assert mongo.db.notes.find_one({"task_id": ObjectId(missing)})["task_missing"] is True
+    assert "task_missing" not in mongo.db.notes.find_one({"task_id": ObjectId(known)})
+
+def test_unavailable_without_accept_unknown_is_503(client, monkeypatch):
+    monkeypatch.setattr("app._http_session", FakeTasksSession(status_code=503))
+    monkeypatch.setattr("app.TASKS_RETRIES", 0)
+    res = client.post("/notes", json={"title": "T", "content": "C", "task_id": str(ObjectId())})
+    assert res.status_code == 503
+    assert mongo.db.notes.count_documents({}) == 0
@@ -0,0 +1,80 @@
+# Também roda contra o modo assíncrono (importado em test_app_async.py).
+from bson.objectid import ObjectId
+
+from app import mongo
+
+
+def _task():
+    task_id = ObjectId()
+    mongo.db.task_snapshots.insert_one({"_id": task_id, "titulo": "T"})
+    return str(task_id)
+
+
+def _create(client, task_id, title="Nota"):
+    res = client.post("/notes", json={"title": title, "content": "c", "task_id": task_id})
+    assert res.status_code == 201
+    return res.json["id"]
+
+
+def test_notes_etag_and_304(client):
+    task_id = _task()
+    _create(client, task_id)
+
+    first = client.get("/notes")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    cached = client.get("/notes", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.data == b""
+    assert cached.headers["ETag"] == etag
+
+    # outra representação (query string) tem outro ETag
+    paged = client.get("/notes?limit=1")
+    assert paged.headers["ETag"] != etag
+    assert client.get("/notes?limit=1", headers={"If-None-Match": etag}).status_code == 200
+
+def test_writes_invalidate_etags(client):
+    task_id = _task()
+    note_id = _create(client, task_id)
+
+    etag = client.get("/notes").headers["ETag"]
+    note_id2 = _create(client, task_id, "Outra")
+    after_create = client.get("/notes", headers={"If-None-Match": etag})
+    assert after_create.status_code == 200 and len(after_create.json) == 2
+
+    etag = after_create.headers["ETag"]
+    updated = client.put(f"/notes/{note_id}", json={"title": "Nova", "content": "c"})
+    assert updated.headers["ETag"] == f'"{note_id}-2"'
+    assert mongo.db.notes.find_one({"_id": ObjectId(note_id)})["rev"] == 2
+    res = client.get("/notes", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+
+    etag = res.headers["ETag"]
+    client.delete(f"/notes/{note_id2}")
+    res = client.get("/notes", headers={"If-None-Match": etag})
+    assert res.status_code == 200 and len(res.json) == 1
+
+def test_task_etag_only_changes_with_that_task(client):
+    task_a, task_b = _task(), _task()
+    _create(client, task_a)
+
+    etag_a = client.get(f"/tarefas/{task_a}/notes").headers["ETag"]
+    assert client.get(f"/tarefas/{task_a}/notes", headers={"If-None-Match": etag_a}).status_code == 304
+
+    _create(client, task_b)  # outra task: o ETag da task A continua válido
+    assert client.get(f"/tarefas/{task_a}/notes", headers={"If-None-Match": etag_a}).status_code == 304
+
+    _create(client, task_a, "Segunda")
+    res = client.get(f"/tarefas/{task_a}/notes", headers={"If-None-Match": etag_a})
+    assert res.status_code == 200 and len(res.json) == 2
+
+def test_not_modified_skips_notes_query(client, monkeypatch):
+    _create(client, _task())
+    etag = client.get("/notes").headers["ETag"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("notes não deveria ser consultada")
+    monkeypatch.setattr(mongo.db.notes, "find", fail)
+    assert client.get("/notes", headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,153 @@
+import datetime
+import threading
+import time
+
+from bson.objectid import ObjectId
+
+from app import app, mongo, idempotency
+from conftest import FakeTasksSession
+
+
+class CountingDB:
+    """Conta as chamadas (round trips) feitas em cada coleção de `mongo.db`."""
+
+    def __init__(self, db):
+        self._db = db
+        self.calls = []
+
+    def __getattr__(self, name):
+        return CountingCollection(getattr(self._db, name), name, self.calls)
+
+
+class CountingCollection:
+    def __init__(self, collection, name, calls):
+        self._collection = collection
+        self._name = name
+        self._calls = calls
+
+    def __getattr__(self, attr):
+        target = getattr(self._collection, attr)
+        if not callable(target):
+            return target
+
+        def wrapper(*args, **kwargs):
+            self._calls.append(f"{self._name}.{attr}")
+            return target(*args, **kwargs)
+        return wrapper
+
+
+def _task(monkeypatch, delay=0.0):
+    task_id = str(ObjectId())
+    mongo.db.task_snapshots.insert_one({"_id": ObjectId(task_id), "titulo": "T"})
+    session = FakeTasksSession()
+    monkeypatch.setattr("app._http_session", session)
+    if delay:
+        from app import validate_task_id_hybrid as original
+
+        def slow_validate(tid):
+            time.sleep(delay)
+            return original(tid)
+        monkeypatch.setattr("app.validate_task_id_hybrid", slow_validate)
+    return task_id
+
+
+def _post(client, task_id, key, title="Nota"):
+    return client.post("/notes", json={"title": title, "content": "c", "task_id": task_id},
+                       headers={"Idempotency-Key": key} if key else {})
+
+
+def test_replay_returns_same_note(client, monkeypatch):
+    task_id = _task(monkeypatch)
+    first = _post(client, task_id, "k1")
+    again = _post(client, task_id, "k1")
+    assert first.status_code == 201
+    assert again.status_code == 200
+    assert again.json == first.json
+    assert mongo.db.notes.count_documents({}) == 1
+
+def test_round_trips_per_create(client, monkeypatch):
+    task_id = _task(monkeypatch)
+    _post(client, task_id, None)  # aquece o cache de validação da task
+
+    counting = CountingDB(mongo.db)
+    monkeypatch.setattr(mongo, "db", counting)
+    assert _post(client, task_id, "k-rt").status_code == 201
+    # antes: idempotency.find_one + notes.insert_one + idempotency.replace_one; agora a reserva já
+    # guarda a resposta e a nota aponta para ela (sem update de conclusão), + 1 bulk_write nos
+    # marcadores de mudança (ETag)
+    assert counting.calls == ["idempotency.insert_one", "notes.insert_one", "change_markers.bulk_write"]
+
+    counting.calls.clear()
+    assert _post(client, task_id, None).status_code == 201
+    assert counting.calls == ["notes.insert_one", "change_markers.bulk_write"]
+
+def test_concurrent_requests_create_a_single_note(client, monkeypatch):
+    task_id = _task(monkeypatch, delay=0.1)
+    n = 12
+    barrier = threading.Barrier(n)
+    statuses = []
+
+    def worker():
+        c = app.test_client()
+        barrier.wait()
+        statuses.append(_post(c, task_id, "same-key").status_code)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert statuses.count(201) == 1
+    assert set(statuses) <= {201, 200, 409}
+    assert mongo.db.notes.count_documents({}) == 1
+    assert _post(client, task_id, "same-key").status_code == 200
+
+def test_failed_validation_releases_key(client, monkeypatch):
+    task_id = _task(monkeypatch)
+    missing = str(ObjectId())
+    assert _post(client, missing, "k2").status_code == 400
+    assert _post(client, task_id, "k2").status_code == 201
+
+def test_abandoned_reservation_is_taken_over(client, monkeypatch):
+    task_id = _task(monkeypatch)
+    record = idempotency.new_record("notes", "k3", ObjectId(), {"id": "x"})
+    record["created_at"] -= datetime.timedelta(seconds=idempotency.pending_timeout + 1)
+    mongo.db.idempotency.insert_one(record)
+
+    res = _post(client, task_id, "k3")
+    assert res.status_code == 201
+    assert res.json["id"] != "x"
+
+def test_replay_after_note_deleted_does_not_duplicate(client, monkeypatch):
+    task_id = _task(monkeypatch)
+    first = _post(client, task_id, "k4")
+    assert mongo.db.notes.find_one()["idempotency_id"] == "notes:k4"
+    client.delete(f"/notes/{first.json['id']}")
+    assert mongo.db.idempotency.find_one({"idempotency_key": "k4"})["state"] == "done"
+    monkeypatch.setattr(idempotency, "pending_timeout", 0)  # reserva "pending" já seria abandonada
+
+    again = _post(client, task_id, "k4")
+    assert again.status_code == 200 and again.json == first.json
+    assert mongo.db.notes.count_documents({}) == 0
+
+def test_reserve_gives_up_when_the_key_keeps_vanishing(client, monkeypatch):
+    task_id = _task(monkeypatch)
+    monkeypatch.setattr(idempotency.store, "insert", lambda record: False)
+    monkeypatch.setattr(idempotency.store, "find", lambda collection, key: None)
+    assert idempotency.reserve("notes", "k5", ObjectId(), {}) == (False, None)
+    assert _post(client, task_id, "k5").status_code == 503
+    assert mongo.db.notes.count_documents({}) == 0
+
+def test_legacy_record_is_replayed(client, monkeypatch):
+    task_id = _task(monkeypatch)
+    idempotency.ensure_indexes()
+    mongo.db.idempotency.insert_one({"collection": "notes", "idempotency_key": "old", "resource": {"id": "legacy"}})
+    res = _post(client, task_id, "old")
+    assert res.status_code == 200 and res.json == {"id": "legacy"}
+
+def test_ttl_index(client):
+    idempotency.ensure_indexes()
+    indexes = mongo.db.idempotency.index_information()
+    ttl = [i for i in indexes.values() if i["key"] == [("expires_at", 1)]]
+    assert ttl and ttl[0]["expireAfterSeconds"] == 0
@@ -0,0 +1,53 @@
+import datetime
+
+import pytest
+from bson.objectid import ObjectId
+
+import json_provider
+from app import app, mongo
+
+
+@pytest.mark.parametrize("name", ["std", "orjson"])
+def test_providers_handle_objectid_and_datetime(name):
+    if name == "orjson" and json_provider.orjson is None:
+        pytest.skip("orjson não instalado")
+    provider = json_provider.PROVIDERS[name](app)
+    oid = ObjectId()
+    when = datetime.datetime(2024, 1, 2, 3, 4, 5)
+    assert provider.loads(provider.dumps({"id": oid, "at": when})) == {"id": str(oid), "at": "2024-01-02T03:04:05"}
+    with app.app_context():
+        assert provider.response({"id": oid}).get_json() == {"id": str(oid)}
+    with pytest.raises(TypeError):
+        provider.dumps({"x": object()})
+
+def test_init_app_rejects_unknown_provider():
+    with pytest.raises(ValueError):
+        json_provider.init_app(app, "yaml")
+
+def test_list_routes_return_shaped_notes(client):
+    task_id = ObjectId()
+    legacy = mongo.db.notes.insert_one({"titulo": "antigo", "conteudo": "c", "task_id": task_id}).inserted_id
+    res = client.get("/notes?fields=title,content,task_id,autor")
+    assert res.json == [{"id": str(legacy), "title": "antigo", "content": "c", "task_id": str(task_id), "autor": None}]
+
+    res = client.get("/notes?stream=1&fields=title")
+    assert res.json == [{"id": str(legacy), "title": "antigo"}]
+
+def test_empty_title_falls_back_the_same_way_everywhere(client):
+    from app import note_shape, serialize_note
+    from storage import MemoryNotesStore
+
+    docs = [
+        {"_id": ObjectId(), "title": "", "titulo": "antigo", "content": "c"},
+        {"_id": ObjectId(), "title": None, "titulo": "antigo", "content": "c"},
+        {"_id": ObjectId(), "title": "", "content": "c"},
+    ]
+    mongo.db.notes.insert_many([dict(d) for d in docs])
+    expected = [serialize_note(d, ("title", "content")) for d in docs]
+    assert [e["title"] for e in expected] == ["antigo", "antigo", None]  # como o `title or titulo` de antes
+
+    assert client.get("/notes?fields=title,content").json == expected  # $project no Mongo
+    memory = MemoryNotesStore()
+    memory.insert_many([dict(d) for d in docs])
+    shaped = memory.list(shape=note_shape(("title", "content")))
+    assert [{**s, "id": str(s["id"])} for s in shaped] == expected
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+import auth
+from stubs import RSAIssuer, StubJWKSServer
+
+
+@pytest.fixture(scope="module")
+def issuers():
+    return RSAIssuer(bits=1024), RSAIssuer(bits=1024)
+
+
+@pytest.fixture
+def jwks_server(issuers, monkeypatch):
+    server = StubJWKSServer(issuers[0]).start()
+    monkeypatch.setattr(auth, "JWKS_URL", server.jwks_url)
+    yield server
+    server.stop()
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_cold_start_fetches_once(jwks_server, issuers):
+    jwks_server.delay = 0.2
+    cache = auth.JWKSCache()
+    barrier = threading.Barrier(10)
+    keys = []
+
+    def worker():
+        barrier.wait()
+        keys.append(cache.get_key(issuers[0].kid))
+
+    threads = [threading.Thread(target=worker) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert jwks_server.hits == 1
+    assert len(keys) == 10 and all(k is not None for k in keys)
+
+def test_stale_jwks_is_served_while_revalidating(jwks_server, issuers):
+    clock = [0.0]
+    cache = auth.JWKSCache(ttl=60, clock=lambda: clock[0])
+    cache.get()
+    assert jwks_server.hits == 1
+
+    jwks_server.delay = 0.3
+    clock[0] = 61.0
+    start = time.monotonic()
+    assert cache.get_key(issuers[0].kid) is not None
+    assert time.monotonic() - start < 0.2  # não esperou a rede
+    cache.get()
+    assert _wait_for(lambda: jwks_server.hits == 2)
+    time.sleep(0.4)
+    assert jwks_server.hits == 2  # um único refresh em segundo plano
+
+def test_unknown_kid_triggers_single_rate_limited_refetch(jwks_server, issuers):
+    clock = [0.0]
+    cache = auth.JWKSCache(min_refresh_interval=30, clock=lambda: clock[0])
+    cache.get()
+
+    # rotação: nova chave publicada depois do primeiro fetch
+    jwks_server.issuers.append(issuers[1])
+    assert cache.get_key(issuers[1].kid) is not None
+    assert jwks_server.hits == 2
+
+    assert cache.get_key("kid-inexistente") is None
+    assert cache.get_key("kid-inexistente") is None
+    assert jwks_server.hits == 2  # dentro do intervalo mínimo, sem novo fetch
+
+    clock[0] = 31.0
+    assert cache.get_key("kid-inexistente") is None
+    assert jwks_server.hits == 3
+
+def test_requires_auth_accepts_rotated_key(jwks_server, issuers, monkeypatch):
+    old, new = issuers
+    monkeypatch.setattr(auth, "AUTH0_DOMAIN", old.domain)
+    monkeypatch.setattr(auth, "API_AUDIENCE", old.audience)
+    monkeypatch.setattr(auth, "_jwks_cache", auth.JWKSCache())
+    auth._verified_tokens.clear()
+
+    assert auth.verify_token(old.token())["iss"] == old.issuer
+    jwks_server.issuers = [new]
+    assert auth.verify_token(new.token())["iss"] == new.issuer
+    assert jwks_server.hits == 2
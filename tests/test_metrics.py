@@ -0,0 +1,98 @@
+import os
+import subprocess
+import sys
+
+from bson.objectid import ObjectId
+from prometheus_client import REGISTRY
+
+import metrics
+from conftest import FakeTasksSession
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _sample(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_metrics_endpoint_exposes_route_histogram(client):
+    before = _sample("notes_http_request_duration_seconds_count",
+                     {"route": "/notes/<id>", "method": "DELETE", "status": "400"})
+    client.delete("/notes/xyz")
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["Content-Type"].startswith("text/plain")
+    assert b"notes_http_request_duration_seconds_bucket" in res.data
+    after = _sample("notes_http_request_duration_seconds_count",
+                    {"route": "/notes/<id>", "method": "DELETE", "status": "400"})
+    assert after == before + 1
+
+def test_metrics_endpoint_requires_allowed_ip_or_token(client, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "segredo")
+    remote = {"REMOTE_ADDR": "203.0.113.7"}
+    assert client.get("/metrics", environ_overrides=remote).status_code == 403
+    assert client.get("/metrics", environ_overrides=remote, headers={"Authorization": "Bearer errado"}).status_code == 403
+    assert client.get("/metrics", environ_overrides=remote, headers={"Authorization": "Bearer segredo"}).status_code == 200
+
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", None)
+    assert client.get("/metrics", environ_overrides=remote, headers={"Authorization": "Bearer "}).status_code == 403
+    monkeypatch.setattr(metrics, "METRICS_ALLOWED_IPS", frozenset({"203.0.113.7"}))
+    assert client.get("/metrics", environ_overrides=remote).status_code == 200
+
+def test_validate_task_stages(client, monkeypatch):
+    task_id = str(ObjectId())
+    monkeypatch.setattr("app._http_session", FakeTasksSession({task_id: {"titulo": "T"}}))
+    stage = lambda path: _sample("notes_stage_duration_seconds_count", {"stage": f"validate_task:{path}"})
+    before = {p: stage(p) for p in ("http_fallback", "cache")}
+
+    client.get(f"/tarefas/{task_id}/notes")
+    client.get(f"/tarefas/{task_id}/notes")
+    assert stage("http_fallback") == before["http_fallback"] + 1
+    assert stage("cache") == before["cache"] + 1
+
+def test_task_validation_cache_hits_and_misses(client, monkeypatch):
+    task_id = str(ObjectId())
+    monkeypatch.setattr("app._http_session", FakeTasksSession({task_id: {"titulo": "T"}}))
+    counter = lambda kind: _sample(f"notes_cache_{kind}_total", {"cache": "task_validation"})
+    before = {k: counter(k) for k in ("hits", "misses")}
+
+    client.get(f"/tarefas/{task_id}/notes")
+    client.get(f"/tarefas/{task_id}/notes")
+    assert counter("misses") == before["misses"] + 1
+    assert counter("hits") == before["hits"] + 1
+
+def test_mongo_listener_labels_command_and_collection():
+    class Started:
+        command_name = "find"
+        command = {"find": "notes", "filter": {}}
+        request_id = 7
+
+    class Succeeded:
+        command_name = "find"
+        request_id = 7
+        duration_micros = 2000
+
+    labels = {"command": "find", "collection": "notes", "outcome": "ok"}
+    before = _sample("notes_mongo_command_duration_seconds_count", labels)
+    listener = metrics.MongoMetricsListener()
+    listener.started(Started())
+    listener.succeeded(Succeeded())
+    assert _sample("notes_mongo_command_duration_seconds_count", labels) == before + 1
+
+def test_multiprocess_aggregation(tmp_path):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path), PYTHONPATH=ROOT)
+    worker = "import metrics; metrics.observe_request('/notes', 'GET', 200, 0.01)"
+    for _ in range(3):
+        subprocess.run([sys.executable, "-c", worker], env=env, check=True, cwd=ROOT)
+
+    scrape = "import metrics; print(metrics.render()[0].decode())"
+    out = subprocess.run([sys.executable, "-c", scrape], env=env, check=True, capture_output=True, text=True, cwd=ROOT).stdout
+    line = next(l for l in out.splitlines() if l.startswith("notes_http_request_duration_seconds_count"))
+    assert float(line.split()[-1]) == 3.0
+
+def test_import_creates_missing_multiproc_dir(tmp_path):
+    multiproc_dir = tmp_path / "prometheus"
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(multiproc_dir), NOTES_WORKER_INIT="post_fork", PYTHONPATH=ROOT)
+    subprocess.run([sys.executable, "-c", "import app"], env=env, check=True, cwd=ROOT)
+    assert multiproc_dir.is_dir()
+    assert list(multiproc_dir.iterdir()) == []  # nenhuma série criada no import
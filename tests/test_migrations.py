@@ -0,0 +1,103 @@
+import threading
+
+from pymongo.errors import OperationFailure
+
+import app as notes_app
+from app import mongo, bootstrap_database
+from migrations import LegacyFieldsMigration, ensure_indexes
+
+
+def _migration(**kwargs):
+    return LegacyFieldsMigration(get_db=lambda: mongo.db, pause=0, **kwargs)
+
+
+def test_ensure_indexes_replaces_single_task_id_index(client):
+    mongo.db.notes.create_index([("task_id", 1)])
+    ensure_indexes(mongo.db)
+    indexes = mongo.db.notes.index_information()
+    assert indexes["task_id_criado_em"]["key"] == [("task_id", 1), ("criado_em", 1)]
+    assert indexes["autor"]["key"] == [("autor", 1)]
+    assert "task_id_1" not in indexes
+    ensure_indexes(mongo.db)  # idempotente
+
+def test_bootstrap_creates_indexes_and_starts_migration(client, monkeypatch):
+    started = []
+    monkeypatch.setattr(notes_app.legacy_migration, "start", lambda migrate: started.append(migrate))
+    bootstrap_database()
+    assert "task_id_criado_em" in mongo.db.notes.index_information()
+    assert any(i["key"] == [("expires_at", 1)] for i in mongo.db.idempotency.index_information().values())
+    assert started == [True]
+
+def test_ensure_indexes_tolerates_index_dropped_concurrently(client, monkeypatch):
+    mongo.db.notes.create_index([("task_id", 1)])
+
+    def already_dropped(name):
+        raise OperationFailure("index not found with name [task_id_1]", code=27)
+    monkeypatch.setattr(mongo.db.notes, "drop_index", already_dropped)
+    ensure_indexes(mongo.db)
+    assert "autor" in mongo.db.notes.index_information()
+
+def test_migration_normalizes_legacy_fields_in_batches(client):
+    mongo.db.notes.insert_many(
+        [{"titulo": f"t{i}", "conteudo": f"c{i}"} for i in range(7)]
+        + [{"title": "novo", "titulo": "velho", "content": "ok"}, {"title": "intocada", "content": "x"}]
+    )
+    done = []
+    migration = _migration(batch_size=3, on_done=lambda: done.append(True))
+    assert migration.run() is True
+    assert done == [True] and migration.is_done()
+
+    assert mongo.db.notes.count_documents({"$or": [{"titulo": {"$exists": True}}, {"conteudo": {"$exists": True}}]}) == 0
+    assert mongo.db.notes.find_one({"title": "t3"})["content"] == "c3"
+    # title já preenchido não é sobrescrito pelo legado
+    assert mongo.db.notes.find_one({"content": "ok"})["title"] == "novo"
+    assert mongo.db.notes.count_documents({}) == 9
+
+def test_migration_skips_concurrently_edited_note(client, monkeypatch):
+    note_id = mongo.db.notes.insert_one({"titulo": "antigo", "conteudo": "c"}).inserted_id
+    migration = _migration()
+    real_find = mongo.db.notes.find
+
+    def find_then_edit(*args, **kwargs):
+        cursor = list(real_find(*args, **kwargs))
+        mongo.db.notes.update_one({"_id": note_id}, {"$set": {"title": "editada"}})
+        return FakeCursor(cursor)
+    monkeypatch.setattr(mongo.db.notes, "find", find_then_edit)
+    migrated, _ = migration.run_batch()
+    monkeypatch.undo()
+    assert migrated == 0
+    assert migration.run() is True
+    assert mongo.db.notes.find_one({"_id": note_id}) == {"_id": note_id, "title": "editada", "content": "c"}
+
+def test_migration_lease_allows_a_single_worker(client):
+    first, second = _migration(), _migration()
+    assert first.acquire_lease(60)
+    assert not second.acquire_lease(60)
+    assert second.run() is False
+
+def test_other_workers_switch_when_the_migration_finishes(client):
+    mongo.db.notes.insert_one({"titulo": "t", "conteudo": "c"})
+    done = threading.Event()
+    owner = _migration()
+    assert owner.acquire_lease(60)
+    watcher = _migration(on_done=done.set, poll_interval=0.01)
+    watcher.start()  # não consegue o lease: só acompanha
+    assert not done.wait(0.05)
+    assert owner.run() is True
+    assert done.wait(2)
+    watcher.stop()
+
+def test_finished_migration_switches_reads_to_new_fields(client, monkeypatch):
+    monkeypatch.setattr(notes_app, "NOTE_FIELDS", notes_app.NOTE_FIELDS)
+    mongo.db.migrations.insert_one({"_id": LegacyFieldsMigration.name, "done": True})
+    bootstrap_database()
+    assert notes_app.NOTE_FIELDS["title"] == ("title",)
+    assert notes_app.note_projection(("title", "content")) == {"_id": 1, "title": 1, "content": 1}
+
+
+class FakeCursor(list):
+    def sort(self, *args):
+        return self
+
+    def limit(self, n):
+        return FakeCursor(self[:n])
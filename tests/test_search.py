@@ -0,0 +1,201 @@
+import pytest
+from bson.objectid import ObjectId
+from pymongo.errors import OperationFailure
+
+import app as notes_app
+from conftest import FakeTasksSession
+from app import mongo
+from search import InvertedIndex, NoteSearch, TextIndexUnavailable, tokenize
+from storage import MongoNotesStore
+
+
+def _note(title, content, task_id=None, legacy=False):
+    doc = {"titulo": title, "conteudo": content} if legacy else {"title": title, "content": content}
+    doc["task_id"] = task_id or ObjectId()
+    return mongo.db.notes.insert_one(doc).inserted_id
+
+
+def test_tokenize_folds_case_and_accents():
+    assert tokenize("Reunião de PLANEJAMENTO, às 10h") == ["reuniao", "de", "planejamento", "as", "10h"]
+    assert tokenize(None) == []
+
+def test_inverted_index_ranks_title_above_content():
+    index = InvertedIndex()
+    index.add({"_id": 1, "title": "deploy", "content": "passos"})
+    index.add({"_id": 2, "title": "passos", "content": "deploy em produção"})
+    index.add({"_id": 3, "title": "outra", "content": "nada"})
+    assert [i for i, _ in index.search("deploy")] == [1, 2]
+
+    index.add({"_id": 1, "title": "renomeada", "content": "x"})
+    assert [i for i, _ in index.search("deploy")] == [2]
+    index.remove(2)
+    assert index.search("deploy") == []
+    assert len(index) == 2
+
+def test_search_endpoint(client):
+    task_a, task_b = ObjectId(), ObjectId()
+    best = _note("Deploy do serviço", "checklist de deploy", task_a)
+    legacy = _note("Deploy antigo", "texto", task_b, legacy=True)
+    content_only = _note("Reunião", "falar sobre o deploy", task_a)
+    _note("Compras", "pão e leite", task_a)
+
+    res = client.get("/notes/search?q=deploy")
+    assert res.status_code == 200
+    ids = [item["id"] for item in res.json["items"]]
+    assert ids[0] == str(best)
+    assert set(ids) == {str(best), str(legacy), str(content_only)}
+    assert ids[-1] == str(content_only)
+    assert res.json["next_offset"] is None
+    legacy_item = next(i for i in res.json["items"] if i["id"] == str(legacy))
+    assert legacy_item["title"] == "Deploy antigo" and legacy_item["score"] > 0
+
+    res = client.get(f"/notes/search?q=deploy&task_id={task_a}&fields=title")
+    assert [item["id"] for item in res.json["items"]] == [str(best), str(content_only)]
+    assert set(res.json["items"][0]) == {"id", "title", "score"}
+
+def test_search_pagination(client):
+    for i in range(5):
+        _note(f"nota {i}", "busca")
+    first = client.get("/notes/search?q=busca&limit=2").json
+    assert len(first["items"]) == 2 and first["next_offset"] == 2
+    seen = [i["id"] for i in first["items"]]
+    offset = first["next_offset"]
+    while offset is not None:
+        page = client.get(f"/notes/search?q=busca&limit=2&offset={offset}").json
+        seen += [i["id"] for i in page["items"]]
+        offset = page["next_offset"]
+    assert len(seen) == len(set(seen)) == 5
+
+def test_search_index_follows_writes(client, monkeypatch):
+    task_id = str(ObjectId())
+    mongo.db.task_snapshots.insert_one({"_id": ObjectId(task_id), "titulo": "T"})
+    monkeypatch.setattr("app._http_session", FakeTasksSession())
+    assert client.get("/notes/search?q=girafa").json["items"] == []  # monta o índice vazio
+
+    note_id = client.post("/notes", json={"title": "Girafa", "content": "c", "task_id": task_id}).json["id"]
+    client.post("/notes/bulk", json=[{"title": "Outra girafa", "content": "c", "task_id": task_id}])
+    assert len(client.get("/notes/search?q=girafa").json["items"]) == 2
+
+    client.put(f"/notes/{note_id}", json={"title": "Elefante", "content": "c"})
+    assert [i["title"] for i in client.get("/notes/search?q=girafa").json["items"]] == ["Outra girafa"]
+    assert client.get("/notes/search?q=elefante").json["items"][0]["id"] == note_id
+
+    client.delete(f"/notes/{note_id}")
+    assert client.get("/notes/search?q=elefante").json["items"] == []
+
+def test_search_invalid_params(client):
+    assert client.get("/notes/search").status_code == 400
+    assert client.get("/notes/search?q=a&task_id=xyz").status_code == 400
+    assert client.get("/notes/search?q=a&limit=0").status_code == 400
+    assert client.get("/notes/search?q=a&offset=-1").status_code == 400
+    assert client.get("/notes/search?q=a&fields=senha").status_code == 400
+
+
+class FakeCursor:
+    def __init__(self, calls, docs):
+        self.calls, self.docs = calls, docs
+
+    def __getattr__(self, name):
+        def chain(*args):
+            self.calls.append((name, args))
+            return self
+        return chain
+
+    def __iter__(self):
+        return iter(self.docs)
+
+
+class FakeTextNotes:
+    def __init__(self, docs=None, error=None):
+        self.calls, self.docs, self.error = [], docs or [], error
+
+    def find(self, flt, projection):
+        if self.error:
+            raise self.error
+        self.calls.append(("find", (flt, projection)))
+        return FakeCursor(self.calls, self.docs)
+
+
+class FakeDB:
+    def __init__(self, notes):
+        self.notes = notes
+
+
+def test_text_index_query():
+    task_id = ObjectId()
+    notes = FakeTextNotes(docs=[{"_id": 1, "title": "a", "score": 2.0}, {"_id": 2, "title": "b", "score": 1.0}])
+    docs, has_more = NoteSearch(MongoNotesStore(lambda: FakeDB(notes))).search("a b", {"_id": 1}, task_id=task_id, limit=1, offset=3)
+    assert docs == [{"_id": 1, "title": "a", "score": 2.0}] and has_more is True
+    score = {"$meta": "textScore"}
+    assert notes.calls == [
+        ("find", ({"$text": {"$search": "a b"}, "task_id": task_id}, {"_id": 1, "score": score})),
+        ("sort", ([("score", score), ("_id", 1)],)),
+        ("skip", (3,)),
+        ("limit", (2,)),
+    ]
+
+class NoTextIndexNotes:
+    """Coleção real do mongomock que responde a $text como um Mongo sem índice de texto."""
+
+    def __init__(self, collection, can_create=True):
+        self._collection = collection
+        self.can_create = can_create
+        self.text_docs = None  # quando preenchido, o índice de texto "existe"
+        self.scans = 0
+
+    def find(self, flt, projection=None):
+        if "$text" in flt and self.text_docs is not None:
+            return FakeCursor([], self.text_docs)
+        if "$text" in flt:
+            raise OperationFailure("text index required for $text query", code=27)
+        self.scans += 1
+        return self._collection.find(flt, projection)
+
+    def create_index(self, keys, **kwargs):
+        if not self.can_create:
+            raise OperationFailure("not authorized")
+        self.text_docs = [{"_id": 1, "title": "texto", "score": 1.0}]
+
+
+def test_missing_text_index_is_built_instead_of_scanning(client):
+    _note("sem índice", "x")
+    notes = NoTextIndexNotes(mongo.db.notes)
+    db = FakeDB(notes)
+    search = NoteSearch(MongoNotesStore(lambda: db))
+    with pytest.raises(TextIndexUnavailable):
+        search.search("indice", {"_id": 1, "title": 1})
+    assert notes.scans == 0  # nada de montar o índice em processo com o Mongo real
+
+    search._builder.join(2)  # criado em segundo plano; ensure_index libera o $text na hora
+    assert search.search("indice", {"_id": 1, "title": 1})[0][0]["title"] == "texto"
+
+def test_text_search_is_retried_after_backoff(client):
+    notes = NoTextIndexNotes(mongo.db.notes, can_create=False)
+    now = [0.0]
+    db = FakeDB(notes)
+    search = NoteSearch(MongoNotesStore(lambda: db), retry_after=5, clock=lambda: now[0])
+    with pytest.raises(TextIndexUnavailable):
+        search.search("indice", {"_id": 1, "title": 1})
+    search._builder.join(2)
+
+    # o índice aparece (criado por outro worker): só volta a ser consultado depois do backoff
+    notes.text_docs = [{"_id": 1, "title": "texto", "score": 1.0}]
+    with pytest.raises(TextIndexUnavailable) as unavailable:
+        search.search("indice", {"_id": 1, "title": 1})
+    assert unavailable.value.retry_after == 5
+    now[0] = 6.0
+    assert search.search("indice", {"_id": 1, "title": 1})[0][0]["title"] == "texto"
+    assert notes.scans == 0
+
+def test_search_route_returns_503_while_the_index_is_built(client, monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise TextIndexUnavailable(2.5)
+    monkeypatch.setattr(notes_app.note_search, "search", unavailable)
+    res = client.get("/notes/search?q=deploy")
+    assert res.status_code == 503 and res.headers["Retry-After"] == "3"
+
+def test_store_without_text_search_uses_memory_index(client):
+    _note("mongomock", "x")
+    store = MongoNotesStore(lambda: mongo.db)
+    assert store.supports_text_search is False
+    assert [d["title"] for d in NoteSearch(store).search("mongomock", {"_id": 1, "title": 1})[0]] == ["mongomock"]
@@ -0,0 +1,61 @@
+import threading
+import time
+
+import pytest
+from bson.objectid import ObjectId
+
+from conftest import FakeTasksSession
+from singleflight import SingleFlight
+from app import validate_task_id_hybrid, mongo
+
+
+def test_singleflight_shares_result_and_error():
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 42) == (42, False)
+
+    def boom():
+        raise RuntimeError("x")
+
+    with pytest.raises(RuntimeError):
+        flight.do("k", boom)
+    assert flight.in_flight() == 0
+
+
+class SlowTasksSession(FakeTasksSession):
+    def get(self, url, timeout=None):
+        time.sleep(0.2)
+        return super().get(url, timeout=timeout)
+
+
+def test_concurrent_validations_cause_one_upstream_call(client, monkeypatch):
+    task_id = str(ObjectId())
+    session = SlowTasksSession({task_id: {"titulo": "Nova task"}})
+    monkeypatch.setattr("app._http_session", session)
+
+    writes = []
+    original_replace_one = mongo.db.task_snapshots.replace_one
+
+    def counting_replace_one(*args, **kwargs):
+        writes.append(args[0])
+        return original_replace_one(*args, **kwargs)
+
+    monkeypatch.setattr(mongo.db.task_snapshots, "replace_one", counting_replace_one)
+
+    n = 16
+    barrier = threading.Barrier(n)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(validate_task_id_hybrid(task_id))
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(results) == n
+    assert all(r[0] is True for r in results)
+    assert len(session.calls) == 1
+    assert len(writes) == 1
@@ -0,0 +1,180 @@
+import datetime
+
+import mongomock
+import pytest
+from bson.objectid import ObjectId
+
+import app as notes_app
+from app import mongo
+from conftest import FakeTasksSession
+from idempotency import IdempotencyEngine
+from storage import create_stores
+
+
+@pytest.fixture(params=["mongo", "memory"])
+def stores(request):
+    db = mongomock.MongoClient()["storage_testdb"]
+    return create_stores(request.param, get_db=lambda: db)
+
+
+def test_notes_store_contract(stores):
+    notes, _, _ = stores
+    task_a, task_b = ObjectId(), ObjectId()
+    ids = [ObjectId() for _ in range(4)]
+    notes.insert({"_id": ids[0], "title": "a0", "task_id": task_a, "criado_em": "2024-01-02", "rev": 1})
+    failed = notes.insert_many([
+        {"_id": ids[1], "title": "a1", "task_id": task_a, "criado_em": "2024-01-01", "rev": 1},
+        {"_id": ids[0], "title": "duplicada"},
+        {"_id": ids[2], "title": "b", "task_id": task_b, "criado_em": "2024-01-01", "rev": 1},
+    ])
+    assert list(failed) == [1]
+
+    assert [n["_id"] for n in notes.list(limit=2)] == ids[:2]
+    assert [n["_id"] for n in notes.list(after=ids[0], limit=10)] == ids[1:3]
+    assert list(notes.list(limit=1, projection={"title": 1})) == [{"_id": ids[0], "title": "a0"}]
+    assert [n["title"] for n in notes.find_by_tasks([task_a])] == ["a1", "a0"]
+    assert [n["title"] for n in notes.find_by_tasks([task_b, task_a])] == ["a1", "a0", "b"]  # task_a < task_b
+    assert notes.exists(ids[2]) and not notes.exists(ids[3])
+    assert notes.existing_ids([ids[1], ids[3]]) == {ids[1]}
+
+    updated = notes.update(ids[1], {"title": "nova"})
+    assert updated["title"] == "nova" and updated["rev"] == 2
+    assert notes.update(ids[3], {"title": "x"}) is None
+    assert notes.delete(ids[1]) == {"_id": ids[1], "task_id": task_a}
+    assert notes.delete(ids[1]) is None
+    assert [n["_id"] for n in notes.find_by_tasks([task_a])] == [ids[0]]
+
+    assert notes.marker("notes") is None
+    notes.bump_markers([task_a])
+    notes.bump_markers([task_a, None])
+    assert notes.marker("notes")["version"] == 2
+    assert notes.marker(f"task:{task_a}")["version"] == 2
+    assert notes.marker(f"task:{task_b}") is None
+
+def test_notes_store_shape(stores):
+    notes, _, _ = stores
+    task = ObjectId()
+    ids = [ObjectId() for _ in range(3)]
+    notes.insert_many([
+        {"_id": ids[0], "title": "novo", "titulo": "velho", "task_id": task, "criado_em": "2024-01-02"},
+        {"_id": ids[1], "titulo": "só legado", "task_id": task, "criado_em": "2024-01-01"},
+        {"_id": ids[2], "title": "outra task", "task_id": ObjectId()},
+    ])
+    shape = {"id": ("_id",), "title": ("title", "titulo"), "autor": ("autor",)}
+    assert list(notes.list(limit=2, shape=shape)) == [
+        {"id": ids[0], "title": "novo", "autor": None},
+        {"id": ids[1], "title": "só legado", "autor": None},
+    ]
+    assert [n["id"] for n in notes.list(after=ids[0], shape=shape)] == ids[1:]
+    assert [n["id"] for n in notes.find_by_tasks([task], shape=shape)] == [ids[1], ids[0]]
+
+def test_notes_store_unverified(stores):
+    notes, _, _ = stores
+    task = ObjectId()
+    ids = [ObjectId() for _ in range(3)]
+    notes.insert_many([{"_id": i, "title": "t", "task_id": task, "task_unverified": True} for i in ids])
+    notes.delete(ids[2])
+    assert notes.find_unverified(10) == [{"_id": ids[0], "task_id": task}, {"_id": ids[1], "task_id": task}]
+    notes.settle_unverified([ids[0]])
+    notes.settle_unverified([ids[1]], task_missing=True)
+    assert notes.find_unverified(10) == []
+    found = {n["_id"]: n for n in notes.find_many(ids[:2])}
+    assert "task_missing" not in found[ids[0]] and found[ids[1]]["task_missing"] is True
+
+def test_snapshot_store_contract(stores):
+    _, snapshots, _ = stores
+    a, b = ObjectId(), ObjectId()
+    snapshots.upsert({"_id": a, "titulo": "A"})
+    snapshots.write([{"_id": a, "titulo": "A2"}, {"_id": b, "titulo": "B"}], [])
+    assert snapshots.get(a)["titulo"] == "A2"
+    snapshots.write([], [{"_id": b, "deleted": True}])
+    assert [s["_id"] for s in snapshots.get_many([a, b])] == [a] and snapshots.get(b) is None
+
+    # gravação condicional: um snapshot mais antigo não substitui o mais novo
+    snapshots.write([{"_id": a, "titulo": "A3", "atualizado_em": "2025-01-02"}], [])
+    snapshots.write([{"_id": a, "titulo": "A1", "atualizado_em": "2025-01-01"}], [])
+    snapshots.upsert({"_id": a, "titulo": "A0", "atualizado_em": "2024-12-31"})
+    assert snapshots.get(a)["titulo"] == "A3"
+
+    assert snapshots.sync_state("x") == {}
+    assert snapshots.acquire_lease("x", "w1", 30) and not snapshots.acquire_lease("x", "w2", 30)
+    snapshots.set_sync_cursor("x", "2025-01-01")
+    assert snapshots.sync_state("x")["cursor"] == "2025-01-01"
+
+def test_idempotency_store_contract(stores):
+    _, _, records = stores
+    engine = IdempotencyEngine(records, ttl=60)
+    assert engine.reserve("notes", "k", ObjectId(), {"id": "1"})[0] is True
+    reserved, existing = engine.reserve("notes", "k", ObjectId(), {"id": "2"})
+    assert not reserved and existing["resource"] == {"id": "1"}
+    assert set(engine.reserve_many("notes", [("k", ObjectId(), {}), ("k2", ObjectId(), {})])) == {"k"}
+
+    engine.mark_done(existing)
+    engine.release("notes", "k")  # já "done": continua reservada
+    assert records.find("notes", "k")["state"] == "done"
+    engine.release_many("notes", ["k2"])
+    assert records.find("notes", "k2") is None
+    assert engine.reserve("notes", "k3", ObjectId(), {})[0] is True
+    engine.resource_removed({"_id": ObjectId(), "idempotency_id": "notes:k3"})
+    assert records.find("notes", "k3")["state"] == "done"
+
+def test_memory_idempotency_records_expire():
+    _, _, records = create_stores("memory")
+    engine = IdempotencyEngine(records, ttl=60)
+    record = engine.new_record("notes", "k", ObjectId(), {})
+    record["expires_at"] = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+    assert records.insert(record)
+    assert records.find("notes", "k") is None
+    assert engine.reserve("notes", "k", ObjectId(), {})[0] is True
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_stores("cassandra")
+
+
+class NoDatabase:
+    def __getattr__(self, name):
+        raise AssertionError(f"o backend em memória não deveria acessar o Mongo ({name})")
+
+
+@pytest.fixture
+def memory_client(client, monkeypatch):
+    notes_app.use_storage("memory")
+    monkeypatch.setattr(mongo, "db", NoDatabase())
+    monkeypatch.setattr("app._http_session", FakeTasksSession())
+    yield client
+    notes_app.use_storage("mongo")
+
+
+def test_routes_on_memory_backend(memory_client):
+    client = memory_client
+    task_id = ObjectId()
+    notes_app.snapshot_store.upsert({"_id": task_id, "titulo": "T"})
+
+    res = client.post("/notes", json={"title": "Deploy", "content": "c", "task_id": str(task_id)},
+                      headers={"Idempotency-Key": "k"})
+    assert res.status_code == 201
+    note_id = res.json["id"]
+    replay = client.post("/notes", json={"title": "Deploy", "content": "c", "task_id": str(task_id)},
+                         headers={"Idempotency-Key": "k"})
+    assert replay.status_code == 200 and replay.json["id"] == note_id
+
+    bulk = client.post("/notes/bulk", json=[{"title": f"n{i}", "content": "c", "task_id": str(task_id)} for i in range(3)])
+    assert bulk.json["created"] == 3
+
+    page = client.get("/notes?limit=2").json
+    assert len(page["items"]) == 2 and page["next_cursor"]
+    assert len(client.get(f"/notes?after={page['next_cursor']}&limit=10").json["items"]) == 2
+    assert len(client.get("/notes?stream=1").json) == 4
+    assert len(client.get(f"/tarefas/{task_id}/notes").json) == 4
+    batch = client.post("/tarefas/notes:batchGet", json=[str(task_id), str(ObjectId())]).json["results"]
+    assert len(batch[str(task_id)]["notes"]) == 4 and list(batch.values())[1]["status"] == 404
+    assert client.get("/notes/search?q=deploy").json["items"][0]["id"] == note_id
+
+    etag = client.get("/notes").headers["ETag"]
+    assert client.get("/notes", headers={"If-None-Match": etag}).status_code == 304
+    assert client.put(f"/notes/{note_id}", json={"title": "Novo", "content": "c"}).status_code == 200
+    assert client.get("/notes", headers={"If-None-Match": etag}).status_code == 200
+    assert client.delete(f"/notes/{note_id}").status_code == 200
+    assert client.get("/notes/search?q=deploy").json["items"] == []
+    assert client.get("/ready").status_code == 200
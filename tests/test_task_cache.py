@@ -0,0 +1,89 @@
+from bson.objectid import ObjectId
+
+from conftest import FakeTasksSession
+from task_cache import TTLCache, TaskValidationCache
+from app import validate_task_id_hybrid, task_validation_cache, mongo
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" passa a ser o mais recente
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_ttl_cache_expiration():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("a", 1)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 1, 1)
+
+def test_ttl_cache_peek_does_not_count():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("a", 1)
+    assert cache.peek("a") == 1 and cache.peek("b") is None
+    clock.now = 5.0
+    assert cache.get("a") is None
+    assert cache.peek("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (0, 1, 1)
+
+def test_task_cache_negative_ttl_and_unavailable():
+    clock = FakeClock()
+    cache = TaskValidationCache(ttl=60, negative_ttl=2, clock=clock)
+    cache.store("ok", (True, "ok", {}))
+    cache.store("missing", (False, "not_found", None))
+    cache.store("down", (None, "unavailable", None))
+    assert cache.get("down") is None
+    clock.now = 3
+    assert cache.get("missing") is None
+    assert cache.get("ok") == (True, "ok", {})
+
+
+def test_validate_uses_cache_for_hot_tasks(client, monkeypatch):
+    task_id = str(ObjectId())
+    session = FakeTasksSession({task_id: {"titulo": "T"}})
+    monkeypatch.setattr("app._http_session", session)
+
+    assert validate_task_id_hybrid(task_id)[0] is True
+    mongo.db.task_snapshots.delete_many({})  # segunda chamada não deve tocar Mongo nem rede
+    assert validate_task_id_hybrid(task_id)[0] is True
+    assert len(session.calls) == 1
+    stats = task_validation_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)  # o miss da primeira consulta conta uma vez
+
+def test_validate_caches_not_found(client, monkeypatch):
+    session = FakeTasksSession()
+    monkeypatch.setattr("app._http_session", session)
+    task_id = str(ObjectId())
+
+    assert validate_task_id_hybrid(task_id) == (False, "not_found", None)
+    assert validate_task_id_hybrid(task_id) == (False, "not_found", None)
+    assert len(session.calls) == 1
+
+def test_validate_does_not_cache_unavailable(client, monkeypatch):
+    session = FakeTasksSession(status_code=502)
+    monkeypatch.setattr("app._http_session", session)
+    monkeypatch.setattr("app.TASKS_RETRIES", 0)  # uma chamada por validação
+    task_id = str(ObjectId())
+
+    assert validate_task_id_hybrid(task_id)[1] == "unavailable"
+    assert validate_task_id_hybrid(task_id)[1] == "unavailable"
+    assert len(session.calls) == 2
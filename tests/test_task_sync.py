@@ -0,0 +1,144 @@
+import pytest
+from bson.objectid import ObjectId
+
+from app import mongo, validate_task_id_hybrid
+from conftest import FakeResponse, FakeTasksSession
+from storage import MongoSnapshotStore
+from stubs import StubTasksService
+from task_sync import TaskSnapshotSync
+
+HEADERS = {"X-Internal-Token": "s3cret"}
+
+
+@pytest.fixture
+def events_client(client, monkeypatch):
+    monkeypatch.setattr("app.TASK_EVENTS_TOKEN", "s3cret")
+    return client
+
+
+def test_task_events_require_token(events_client):
+    event = {"type": "task.created", "task": {"id": str(ObjectId())}}
+    assert events_client.post("/internal/task-events", json=event).status_code == 403
+    assert events_client.post("/internal/task-events", json=event, headers={"X-Internal-Token": "x"}).status_code == 403
+
+def test_task_events_upsert_and_delete(events_client, monkeypatch):
+    a, b = str(ObjectId()), str(ObjectId())
+    res = events_client.post("/internal/task-events", headers=HEADERS, json={"events": [
+        {"type": "task.created", "task": {"id": a, "titulo": "A"}},
+        {"type": "task.updated", "task": {"id": a, "titulo": "A2"}},
+        {"type": "task.created", "task": {"id": b, "titulo": "B"}},
+        {"type": "task.created", "task": {"id": "nope"}},
+    ]})
+    assert res.status_code == 200
+    assert res.json == {"upserted": 2, "deleted": 0, "ignored": 1}
+    assert mongo.db.task_snapshots.find_one({"_id": ObjectId(a)})["titulo"] == "A2"
+
+    # a criação de nota agora não sai do processo
+    session = FakeTasksSession()
+    monkeypatch.setattr("app._http_session", session)
+    assert validate_task_id_hybrid(b)[0] is True
+    assert session.calls == []
+
+    res = events_client.post("/internal/task-events", headers=HEADERS, json={"type": "task.deleted", "task": {"id": b}})
+    assert res.json["deleted"] == 1
+    assert mongo.db.task_snapshots.count_documents({"deleted": {"$ne": True}}) == 1
+    assert validate_task_id_hybrid(b)[0] is not True
+
+def test_task_events_delivered_out_of_order(events_client):
+    a, b = str(ObjectId()), str(ObjectId())
+    # no mesmo lote: vale o maior atualizado_em, não a posição na lista
+    res = events_client.post("/internal/task-events", headers=HEADERS, json={"events": [
+        {"type": "task.updated", "task": {"id": a, "titulo": "A2", "atualizado_em": "2025-01-02T00:00:00Z"}},
+        {"type": "task.created", "task": {"id": a, "titulo": "A", "atualizado_em": "2025-01-01T00:00:00Z"}},
+        {"type": "task.deleted", "task": {"id": b, "atualizado_em": "2025-01-03T00:00:00Z"}},
+        {"type": "task.updated", "task": {"id": b, "titulo": "B", "atualizado_em": "2025-01-02T00:00:00Z"}},
+    ]})
+    assert res.json == {"upserted": 1, "deleted": 1, "ignored": 0}
+    store = MongoSnapshotStore(lambda: mongo.db)
+    assert store.get(ObjectId(a))["titulo"] == "A2"
+    assert store.get(ObjectId(b)) is None
+
+    # em lotes separados: o webhook atrasado/reenviado não volta a versão nem ressuscita a task
+    for event in ({"type": "task.updated", "task": {"id": a, "titulo": "A", "atualizado_em": "2025-01-01T00:00:00Z"}},
+                  {"type": "task.updated", "task": {"id": b, "titulo": "B", "atualizado_em": "2025-01-02T00:00:00Z"}}):
+        assert events_client.post("/internal/task-events", headers=HEADERS, json=event).status_code == 200
+    assert store.get(ObjectId(a))["titulo"] == "A2"
+    assert store.get(ObjectId(b)) is None
+
+    # uma versão mais nova ainda passa, inclusive depois da remoção
+    events_client.post("/internal/task-events", headers=HEADERS, json={
+        "type": "task.updated", "task": {"id": b, "titulo": "B2", "atualizado_em": "2025-01-04T00:00:00Z"}})
+    assert store.get(ObjectId(b))["titulo"] == "B2"
+
+def test_task_event_invalidates_negative_cache(events_client, monkeypatch):
+    task_id = str(ObjectId())
+    monkeypatch.setattr("app._http_session", FakeTasksSession())
+    assert validate_task_id_hybrid(task_id)[1] == "not_found"
+
+    events_client.post("/internal/task-events", headers=HEADERS, json={"type": "task.created", "task": {"id": task_id}})
+    assert validate_task_id_hybrid(task_id)[0] is True
+
+def test_incremental_pull_against_stub_service(client):
+    a, b = str(ObjectId()), str(ObjectId())
+    with StubTasksService({
+        a: {"titulo": "A", "atualizado_em": "2025-01-01T00:00:00Z"},
+        b: {"titulo": "B", "atualizado_em": "2025-01-02T00:00:00Z"},
+    }) as stub:
+        sync = TaskSnapshotSync(store=MongoSnapshotStore(lambda: mongo.db), base_url=stub.url, batch_size=1)
+        assert sync.pull_once() == 2
+        assert mongo.db.task_snapshots.count_documents({}) == 2
+        assert mongo.db.sync_state.find_one({"_id": "task_snapshots"})["cursor"] == "2025-01-02T00:00:00Z"
+
+        assert sync.pull_once() == 0  # nada novo desde o cursor
+
+        stub.tasks[a] = {"titulo": "A editada", "atualizado_em": "2025-01-03T00:00:00Z"}
+        assert sync.pull_once() == 1
+        assert mongo.db.task_snapshots.find_one({"_id": ObjectId(a)})["titulo"] == "A editada"
+
+def test_pull_pages_through_shared_timestamps_and_tombstones(client):
+    ts = "2025-01-01T00:00:00Z"
+    ids = sorted(str(ObjectId()) for _ in range(5))
+    with StubTasksService({i: {"titulo": i, "atualizado_em": ts} for i in ids}) as stub:
+        store = MongoSnapshotStore(lambda: mongo.db)
+        sync = TaskSnapshotSync(store=store, base_url=stub.url, page_size=2)
+        assert sync.pull_once() == 5  # 3 páginas, todas com o mesmo atualizado_em
+        assert mongo.db.task_snapshots.count_documents({}) == 5
+        state = mongo.db.sync_state.find_one({"_id": "task_snapshots"})
+        assert (state["cursor"], state["cursor_id"]) == (ts, ids[-1])
+
+        # task nova com o mesmo timestamp do cursor (id maior) e uma removida (tombstone)
+        late = "f" * 24
+        stub.tasks[late] = {"titulo": "atrasada", "atualizado_em": ts}
+        stub.tasks[ids[0]] = {"deleted": True, "atualizado_em": "2025-01-02T00:00:00Z"}
+        assert sync.pull_once() == 2
+        assert mongo.db.task_snapshots.find_one({"_id": ObjectId(late)})["titulo"] == "atrasada"
+        assert mongo.db.task_snapshots.find_one({"_id": ObjectId(ids[0])})["deleted"] is True
+        assert MongoSnapshotStore(lambda: mongo.db).get(ObjectId(ids[0])) is None
+        assert sync.pull_once() == 0
+
+def test_pull_stops_when_service_ignores_the_cursor(client):
+    page = [{"id": str(ObjectId()), "atualizado_em": "2025-01-01"} for _ in range(2)]
+
+    class SamePage(FakeResponse):
+        def raise_for_status(self):
+            pass
+
+    class IgnoresCursor:
+        calls = 0
+
+        def get(self, url, params=None, timeout=None):
+            self.calls += 1
+            return SamePage(200, page)
+
+    session = IgnoresCursor()
+    sync = TaskSnapshotSync(store=MongoSnapshotStore(lambda: mongo.db), base_url="http://unused",
+                            session=session, page_size=2)
+    assert sync.pull_once() == 2
+    assert session.calls == 2  # segunda página igual, sem avanço do cursor: para
+
+def test_lease_allows_a_single_puller(client):
+    first = TaskSnapshotSync(store=MongoSnapshotStore(lambda: mongo.db), base_url="http://unused")
+    second = TaskSnapshotSync(store=MongoSnapshotStore(lambda: mongo.db), base_url="http://unused")
+    assert first.acquire_lease(30) is True
+    assert second.acquire_lease(30) is False
+    assert first.acquire_lease(30) is True  # renovação pelo dono
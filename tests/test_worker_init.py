@@ -0,0 +1,60 @@
+import os
+import runpy
+
+import app as notes_app
+
+CONF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+
+def _load_conf(monkeypatch, **env):
+    for name in ("NOTES_WORKER_INIT", "MONGO_MAX_POOL_SIZE", "TASKS_HTTP_POOL_SIZE", "GUNICORN_WORKER_CLASS",
+                 "GUNICORN_WORKERS", "WEB_CONCURRENCY", "GUNICORN_THREADS", "GUNICORN_PRELOAD",
+                 "PROMETHEUS_MULTIPROC_DIR", "NOTES_METRICS_DIR_MASTER"):
+        monkeypatch.delenv(name, raising=False)  # restaurados no fim do teste, inclusive os gravados pelo conf
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return runpy.run_path(CONF)
+
+
+def test_gunicorn_conf_defaults(monkeypatch):
+    conf = _load_conf(monkeypatch, GUNICORN_THREADS="16")
+    assert conf["worker_class"] == "gthread" and conf["preload_app"] is True
+    assert conf["threads"] == 16 and conf["workers"] >= 3
+    assert os.environ["NOTES_WORKER_INIT"] == "post_fork"
+    assert os.environ["MONGO_MAX_POOL_SIZE"] == "24"
+    assert os.environ["TASKS_HTTP_POOL_SIZE"] == "16"
+
+def test_gunicorn_conf_env_overrides(monkeypatch):
+    conf = _load_conf(monkeypatch, WEB_CONCURRENCY="3", GUNICORN_PRELOAD="false", MONGO_MAX_POOL_SIZE="7")
+    assert conf["workers"] == 3 and conf["preload_app"] is False
+    assert os.environ["MONGO_MAX_POOL_SIZE"] == "7"
+
+def test_gunicorn_conf_prepares_missing_multiproc_dir(monkeypatch, tmp_path):
+    multiproc_dir = tmp_path / "prometheus"
+    _load_conf(monkeypatch, PROMETHEUS_MULTIPROC_DIR=str(multiproc_dir))
+    assert multiproc_dir.is_dir()  # antes do preload importar o app
+
+    (multiproc_dir / "counter_1.db").write_bytes(b"")
+    _load_conf(monkeypatch, PROMETHEUS_MULTIPROC_DIR=str(multiproc_dir))
+    assert list(multiproc_dir.iterdir()) == []  # novo master: começa limpo
+
+def test_init_worker_runs_once_per_process():
+    session, client = notes_app._http_session, notes_app.mongo.cx
+    assert session is not None and notes_app.task_sync.session is not session
+    notes_app.init_worker()
+    assert notes_app._http_session is session and notes_app.mongo.cx is client
+    assert notes_app._http_session is session
+
+def test_create_app_builds_a_new_app(client):
+    built = notes_app.create_app()
+    assert built is not notes_app.app
+    assert notes_app._http_session is not None  # recursos do processo não são recriados
+    res = built.test_client().get("/health", headers={"Origin": "http://localhost:5173"})
+    assert res.status_code == 200 and res.json == {"status": "ok", "service": "notes"}
+    assert res.headers["Access-Control-Allow-Origin"] == "http://localhost:5173"
+    assert {"/notes", "/metrics"} <= {rule.rule for rule in built.url_map.iter_rules()}
+
+def test_http_session_pool_size(monkeypatch):
+    monkeypatch.setattr(notes_app, "TASKS_HTTP_POOL_SIZE", 32)
+    session = notes_app.make_http_session(retries=0)
+    assert session.get_adapter("http://tasks")._pool_maxsize == 32
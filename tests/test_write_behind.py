@@ -0,0 +1,180 @@
+import mongomock
+import pytest
+from bson.objectid import ObjectId
+
+import app as notes_app
+from change_markers import compute_etag, task_marker
+from storage import MongoNotesStore, create_stores
+from write_behind import WriteBehindNotesStore
+
+
+class FailingWrites:
+    """Embrulha um NotesStore e faz NotesStore.write falhar enquanto `down` for verdadeiro."""
+
+    def __init__(self, store):
+        self.store = store
+        self.down = True
+
+    def write(self, updates, deletes):
+        if self.down:
+            raise RuntimeError("mongo fora")
+        return self.store.write(updates, deletes)
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+@pytest.fixture(params=["mongo", "memory"])
+def notes(request):
+    db = mongomock.MongoClient()["write_behind_testdb"]
+    store, _, _ = create_stores(request.param, get_db=lambda: db)
+    return store
+
+
+def _seed(store, count=2, task_id=None):
+    task_id = task_id or ObjectId()
+    ids = [ObjectId() for _ in range(count)]
+    store.insert_many([{"_id": i, "title": f"n{k}", "content": "c", "task_id": task_id, "criado_em": "2024-01-01", "rev": 1}
+                       for k, i in enumerate(ids)])
+    return ids, task_id
+
+
+def test_updates_are_coalesced_into_one_write(notes):
+    ids, task_id = _seed(notes)
+    flushes = []
+    store = WriteBehindNotesStore(notes, interval=60, on_flush=lambda r, w, s: flushes.append((r, w)))
+    for k in range(5):
+        updated = store.update(ids[0], {"title": f"v{k}"})
+    assert updated["title"] == "v4" and updated["rev"] == 6
+    assert store.update(ObjectId(), {"title": "x"}) is None
+
+    # read-your-writes: o overlay mostra a versão pendente, o banco ainda não
+    assert next(iter(store.find_many([ids[0]])))["title"] == "v4"
+    assert [n["title"] for n in store.list()] == ["v4", "n1"]
+    assert [n["title"] for n in store.find_by_tasks([task_id])] == ["v4", "n1"]
+    assert next(iter(notes.find_many([ids[0]])))["title"] == "n0"
+
+    assert store.flush() == 1
+    assert flushes == [({"update": 5, "delete": 0}, {"update": 1, "delete": 0})]
+    doc = next(iter(notes.find_many([ids[0]])))
+    assert doc["title"] == "v4" and doc["rev"] == 6
+    assert store.snapshot()["coalescing_ratio"] == 5.0
+    store.close()
+
+def test_delete_after_update_drops_the_update(notes):
+    ids, task_id = _seed(notes)
+    store = WriteBehindNotesStore(notes, interval=60)
+    store.update(ids[0], {"title": "editada"})
+    assert store.delete(ids[0]) == {"_id": ids[0], "task_id": task_id}
+    assert store.delete(ids[0]) is None
+    assert store.update(ids[0], {"title": "de novo"}) is None
+    assert not store.exists(ids[0])
+    assert store.existing_ids(ids) == {ids[1]}
+    assert [n["_id"] for n in store.list()] == [ids[1]]
+
+    # sem escrita pendente, o delete vai direto ao banco
+    assert store.delete(ids[1]) == {"_id": ids[1], "task_id": task_id}
+    assert notes.exists(ids[0])
+    store.close()
+    assert not notes.exists(ids[0]) and not notes.exists(ids[1])
+
+def test_shaped_listing_is_overlaid(notes):
+    ids, task_id = _seed(notes)
+    store = WriteBehindNotesStore(notes, interval=60)
+    store.update(ids[1], {"title": "nova"})
+    shape = {"id": ["_id"], "title": ["title", "titulo"]}
+    titles = {n["id"]: n["title"] for n in store.list(shape=shape)}
+    assert titles[ids[1]] == "nova" and titles[ids[0]] == "n0"
+    store.close()
+
+def test_failed_flush_requeues_under_newer_writes(notes):
+    ids, _ = _seed(notes)
+    backend = FailingWrites(notes)
+    store = WriteBehindNotesStore(backend, interval=60)
+    store.update(ids[0], {"title": "a", "content": "x"})
+    with pytest.raises(RuntimeError):
+        store.flush()
+    store.update(ids[0], {"title": "b"})
+    assert store.snapshot()["failed_flushes"] == 1
+
+    backend.down = False
+    assert store.flush() == 1
+    doc = next(iter(notes.find_many([ids[0]])))
+    assert (doc["title"], doc["content"], doc["rev"]) == ("b", "x", 3)
+    assert store.snapshot()["requests"] == 2
+    store.close()
+
+def test_size_threshold_wakes_the_flusher(notes):
+    ids, _ = _seed(notes, count=3)
+    store = WriteBehindNotesStore(notes, interval=60, max_pending=2)
+    for note_id in ids:
+        store.update(note_id, {"title": "lote"})
+    store._thread.join(0.05)  # a thread acorda com o limite atingido, sem esperar o intervalo
+    for _ in range(100):
+        if all(n["title"] == "lote" for n in notes.find_many(ids)):
+            break
+        store._thread.join(0.02)
+    assert [n["title"] for n in notes.find_many(ids)] == ["lote"] * 3
+    store.close()
+
+
+@pytest.fixture
+def write_behind_client(client, monkeypatch):
+    monkeypatch.setattr(notes_app, "NOTES_WRITE_BEHIND", True)
+    monkeypatch.setattr(notes_app, "NOTES_WRITE_BEHIND_INTERVAL", 60)
+    notes_app.use_storage("mongo")
+    yield client
+    monkeypatch.setattr(notes_app, "NOTES_WRITE_BEHIND", False)
+    notes_app.use_storage("mongo")
+
+
+def test_routes_with_write_behind(write_behind_client):
+    client = write_behind_client
+    note_id = ObjectId()
+    notes_app.mongo.db.notes.insert_one({"_id": note_id, "title": "t", "content": "c", "task_id": ObjectId(), "rev": 1})
+
+    for k in range(3):
+        res = client.put(f"/notes/{note_id}", json={"title": f"v{k}", "content": "c"})
+        assert res.status_code == 200
+    assert res.headers["ETag"] == f'"{note_id}-4"'
+    assert client.get("/notes").json[0]["title"] == "v2"
+    assert notes_app.mongo.db.notes.find_one({"_id": note_id})["title"] == "t"
+    assert client.get("/ready").json["write_behind"]["pending"] == 1
+
+    notes_app.flush_pending_writes()
+    assert notes_app.mongo.db.notes.find_one({"_id": note_id})["title"] == "v2"
+
+    assert client.delete(f"/notes/{note_id}").status_code == 200
+    assert client.delete(f"/notes/{note_id}").status_code == 404
+    assert client.put(f"/notes/{ObjectId()}", json={"title": "x"}).status_code == 404
+
+def test_pending_deletes_do_not_shorten_the_page(notes):
+    ids, task_id = _seed(notes, count=5)
+    store = WriteBehindNotesStore(notes, interval=60)
+    store.update(ids[1], {"title": "editada"})
+    store.delete(ids[1])
+    store.update(ids[2], {"title": "editada"})
+    store.delete(ids[2])
+    # a rota pede limit+1 para saber se há próxima página
+    page = list(store.list(limit=3))
+    assert [n["_id"] for n in page] == [ids[0], ids[3], ids[4]]
+    assert [n["_id"] for n in store.list(after=ids[0], limit=1)] == [ids[3]]
+    store.close()
+
+def test_flush_changes_the_etag_seen_by_another_worker():
+    db = mongomock.MongoClient()["write_behind_testdb"]
+    store = WriteBehindNotesStore(MongoNotesStore(lambda: db), interval=60)
+    other = MongoNotesStore(lambda: db)  # outro worker: sem a fila deste
+    ids, task_id = _seed(other)
+
+    store.update(ids[0], {"title": "nova"})
+    store.bump_markers([task_id])  # o que a rota faz ao enfileirar
+    # o outro worker lê o banco antigo já com o marcador novo...
+    stale = compute_etag(other.marker(task_marker(task_id)), "/tarefas")
+    assert next(iter(other.find_many([ids[0]])))["title"] == "n0"
+
+    store.flush()
+    # ...e o flush muda o ETag de novo, então essa leitura não é servida como atual
+    assert compute_etag(other.marker(task_marker(task_id)), "/tarefas") != stale
+    assert next(iter(other.find_many([ids[0]])))["title"] == "nova"
+    store.close()
@@ -0,0 +1,357 @@
+# write_behind.py (modo write-behind para PUT/DELETE de notas)
+#
+# Com NOTES_WRITE_BEHIND=true, app.py embrulha o NotesStore em WriteBehindNotesStore:
+#   - update() responde a partir de uma cópia da nota em memória e só enfileira o $set; PUTs
+#     repetidos na mesma nota (autosave) viram uma única operação. Só o primeiro PUT de uma
+#     rajada lê a nota do banco (para responder 404 e devolver a nota atualizada).
+#   - delete() de uma nota com escrita pendente também entra na fila (e descarta o update);
+#     sem escrita pendente vai direto ao banco, como antes.
+#   - a fila é gravada em lote (NotesStore.write -> bulk_write não ordenado) a cada `interval`
+#     segundos ou assim que `max_pending` notas esperam; com o dobro disso (banco lento ou fora)
+#     a própria requisição grava a fila antes de enfileirar a sua escrita.
+#   - as leituras do worker passam por um overlay com as escritas pendentes (read-your-writes);
+#     list()/text_search() com `limit` buscam a mais o número de remoções pendentes, para que a
+#     página (e o limit+1 que indica a próxima) não encolha com as notas omitidas.
+#   - os marcadores de mudança (ETag) das tasks do lote são incrementados de novo depois que o
+#     flush grava: um worker que leu o banco antigo depois do incremento da requisição não fica
+#     com um ETag que já corresponde à versão nova.
+# Limites: o overlay é por processo (outro worker vê o banco, atrasado em até `interval`), entre
+# workers vale a última escrita, e o que estiver na fila se perde se o processo morrer sem o
+# flush de saída (worker_exit em gunicorn.conf.py / atexit em app.py).
+import logging
+import threading
+import time
+
+from idempotency import RESOURCE_FIELD
+from storage import NotesStore, _project, _shape
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()  # _modify(load=False): nota sem escrita pendente
+
+
+class _Pending:
+    """Escrita pendente de uma nota: documento atual (para o overlay) e o $set acumulado."""
+
+    __slots__ = ("doc", "fields", "deleted", "updates", "deletes")
+
+    def __init__(self, doc):
+        self.doc = doc        # substituído (nunca alterado) a cada update: leitores usam a referência
+        self.fields = {}
+        self.deleted = False
+        self.updates = 0      # requisições absorvidas (métrica de coalescência)
+        self.deletes = 0
+
+
+def _id_key(shape):
+    """Campo da resposta que carrega o _id no `shape` (None se o formato não o inclui)."""
+    return next((field for field, sources in shape.items() if tuple(sources) == ("_id",)), None)
+
+
+class WriteBehindNotesStore(NotesStore):
+    """
+    NotesStore que adia update/delete de `store` (ver o cabeçalho do módulo). Os demais métodos
+    delegam para `store`, com as leituras ajustadas pelas escritas pendentes.
+    `on_flush(requests, writes, seconds)`: {op: requisições absorvidas} e {op: operações gravadas}
+    de cada flush bem-sucedido (metrics.write_behind_flush).
+    """
+
+    def __init__(self, store, interval=0.5, max_pending=500, on_flush=None):
+        self.store = store
+        self.interval = interval
+        self.max_pending = max_pending
+        self._on_flush = on_flush
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # um flush por vez
+        self._pending = {}   # note_id -> _Pending
+        self._flushing = {}  # lote sendo gravado: continua visível no overlay até terminar
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._thread = None
+        self._requests = 0
+        self._writes = 0
+        self._failed_flushes = 0
+
+    # -----------------------------------------------------------------
+    # Escritas
+    # -----------------------------------------------------------------
+    def _modify(self, note_id, apply, load=True):
+        """
+        Aplica `apply(entry)` (com o lock) à entrada pendente de `note_id` e retorna o resultado.
+        A entrada parte da versão em flush ou, com `load`, da nota lida do banco. Retorna None se
+        a nota não existe (ou já foi removida) e `_MISSING` se não há entrada e `load` é falso.
+        """
+        if len(self._pending) >= 2 * self.max_pending:
+            self.flush()  # a thread não está dando conta: grava antes de enfileirar (contrapressão)
+        loaded = None
+        while True:
+            with self._lock:
+                entry = self._pending.get(note_id)
+                if entry is None:
+                    base = self._flushing.get(note_id)
+                    if base is not None:
+                        if base.deleted:
+                            return None
+                        entry = _Pending(base.doc)
+                    elif loaded is not None:
+                        entry = _Pending(loaded)
+                if entry is not None:
+                    if entry.deleted:
+                        return None
+                    self._pending[note_id] = entry
+                    result = apply(entry)
+                    pending = len(self._pending)
+                    break
+            if not load:
+                return _MISSING
+            # sem cópia em memória: lê do banco (fora do lock) e tenta de novo
+            loaded = next(iter(self.store.find_many([note_id])), None)
+            if loaded is None:
+                return None
+
+        self._ensure_flusher()
+        if pending >= self.max_pending:
+            self._wake.set()
+        return result
+
+    def update(self, note_id, fields):
+        def apply(entry):
+            doc = {**entry.doc, **fields}
+            doc["rev"] = entry.doc.get("rev", 0) + 1
+            entry.doc = doc
+            # rev absoluto (e não $inc): regravar um lote após falha não incrementa duas vezes
+            entry.fields.update(fields, rev=doc["rev"])
+            entry.updates += 1
+            return dict(doc)
+
+        return self._modify(note_id, apply)
+
+    def delete(self, note_id):
+        def apply(entry):
+            entry.deleted = True
+            entry.fields = {}
+            entry.deletes += 1
+            return _project(entry.doc, {"task_id": 1, RESOURCE_FIELD: 1})
+
+        result = self._modify(note_id, apply, load=False)
+        if result is _MISSING:
+            return self.store.delete(note_id)
+        return result
+
+    # -----------------------------------------------------------------
+    # Flush
+    # -----------------------------------------------------------------
+    def flush(self):
+        """Grava a fila em um NotesStore.write; retorna quantas notas foram gravadas."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+                self._flushing = batch
+            updates = [(note_id, e.fields) for note_id, e in batch.items() if not e.deleted and e.fields]
+            deletes = [note_id for note_id, e in batch.items() if e.deleted]
+            started = time.perf_counter()
+            try:
+                failed = self.store.write(updates, deletes)
+            except Exception:
+                with self._lock:
+                    self._requeue(batch)
+                    self._flushing = {}
+                    self._failed_flushes += 1
+                raise
+            seconds = time.perf_counter() - started
+            with self._lock:
+                self._flushing = {}
+            try:
+                self.store.bump_markers({e.doc.get("task_id") for e in batch.values()})
+            except Exception as e:
+                logger.warning("Write-behind: falha ao atualizar marcadores de mudança: %s", e)
+
+        if failed:
+            logger.warning("Write-behind: %d escrita(s) de notas falharam: %s", len(failed),
+                           "; ".join(f"{note_id}: {msg}" for note_id, msg in list(failed.items())[:20]))
+        requests = {"update": sum(e.updates for e in batch.values()),
+                    "delete": sum(e.deletes for e in batch.values())}
+        writes = {"update": len(updates), "delete": len(deletes)}
+        with self._lock:
+            self._requests += requests["update"] + requests["delete"]
+            self._writes += writes["update"] + writes["delete"]
+        if self._on_flush is not None:
+            self._on_flush(requests, writes, seconds)
+        return len(batch)
+
+    def _requeue(self, batch):
+        """(com o lock) Devolve à fila um lote que falhou, por baixo das escritas mais novas."""
+        for note_id, old in batch.items():
+            entry = self._pending.get(note_id)
+            if entry is None:
+                self._pending[note_id] = old
+                continue
+            # o delete mais novo vence (update pendente seria descartado de qualquer forma)
+            if not entry.deleted:
+                entry.fields = {**old.fields, **entry.fields}
+            entry.updates += old.updates
+            entry.deletes += old.deletes
+
+    # -----------------------------------------------------------------
+    # Thread de fundo
+    # -----------------------------------------------------------------
+    def _run(self):
+        while not self._closed.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("Write-behind: flush falhou (nova tentativa em %ss): %s", self.interval, e)
+
+    def _ensure_flusher(self):
+        # iniciada sob demanda: depois de um fork (gunicorn com preload) o worker cria a sua
+        thread = self._thread
+        if (thread is None or not thread.is_alive()) and not self._closed.is_set():
+            with self._lock:
+                if self._thread is thread:
+                    self._thread = threading.Thread(target=self._run, name="notes-write-behind", daemon=True)
+                    self._thread.start()
+
+    def close(self, timeout=5.0):
+        """Para a thread e grava o que estiver na fila (saída do worker)."""
+        self._closed.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        return self.flush()
+
+    def snapshot(self):
+        """Estado para /ready: fila atual e razão de coalescência (requisições por escrita)."""
+        with self._lock:
+            return {
+                "pending": len(self._pending) + len(self._flushing),
+                "requests": self._requests,
+                "writes": self._writes,
+                "coalescing_ratio": round(self._requests / self._writes, 2) if self._writes else None,
+                "failed_flushes": self._failed_flushes,
+            }
+
+    # -----------------------------------------------------------------
+    # Leituras com overlay
+    # -----------------------------------------------------------------
+    def _view(self):
+        """{note_id: documento atual ou None se removido} das escritas pendentes (None se não há)."""
+        with self._lock:
+            if not self._pending and not self._flushing:
+                return None
+            view = {note_id: None if e.deleted else e.doc for note_id, e in self._flushing.items()}
+            view.update((note_id, None if e.deleted else e.doc) for note_id, e in self._pending.items())
+            return view
+
+    def _overlay(self, results, id_key, render, view=None, limit=None):
+        view = view if view is not None else self._view()
+        if view is None or id_key is None:
+            return results
+        return _overlaid(results, view, id_key, render, limit)
+
+    def _fetch_limit(self, view, limit):
+        """`limit` mais as remoções pendentes, que o overlay omite do resultado do banco."""
+        if view is None or limit is None:
+            return limit
+        return limit + sum(doc is None for doc in view.values())
+
+    def list(self, after=None, limit=None, projection=None, batch_size=None, shape=None):
+        view = self._view()
+        results = self.store.list(after=after, limit=self._fetch_limit(view, limit), projection=projection,
+                                  batch_size=batch_size, shape=shape)
+        if shape is not None:
+            return self._overlay(results, _id_key(shape), lambda doc, _item: _shape(doc, shape), view, limit)
+        return self._overlay(results, "_id", lambda doc, _item: _project(doc, projection), view, limit)
+
+    def find_by_tasks(self, task_ids, projection=None, shape=None):
+        results = self.store.find_by_tasks(task_ids, projection=projection, shape=shape)
+        if shape is not None:
+            return self._overlay(results, _id_key(shape), lambda doc, _item: _shape(doc, shape))
+        return self._overlay(results, "_id", lambda doc, _item: _project(doc, projection))
+
+    def find_many(self, note_ids, projection=None):
+        return self._overlay(self.store.find_many(note_ids, projection), "_id",
+                             lambda doc, _item: _project(doc, projection))
+
+    def text_search(self, query, projection, task_id=None, skip=0, limit=20):
+        view = self._view()
+        results = self.store.text_search(query, projection, task_id=task_id, skip=skip,
+                                         limit=self._fetch_limit(view, limit))
+        return list(self._overlay(results, "_id", lambda doc, item: {**_project(doc, projection), "score": item["score"]},
+                                  view, limit))
+
+    def exists(self, note_id):
+        view = self._view()
+        if view is not None and note_id in view:
+            return view[note_id] is not None
+        return self.store.exists(note_id)
+
+    def existing_ids(self, note_ids):
+        found = self.store.existing_ids(note_ids)
+        view = self._view()
+        if view is None:
+            return found
+        return {i for i in found if view.get(i, True) is not None}
+
+    # -----------------------------------------------------------------
+    # Delegação direta
+    # -----------------------------------------------------------------
+    @property
+    def source(self):
+        return self.store.source
+
+    @property
+    def supports_text_search(self):
+        return self.store.supports_text_search
+
+    def insert(self, doc):
+        return self.store.insert(doc)
+
+    def insert_many(self, docs):
+        return self.store.insert_many(docs)
+
+    def write(self, updates, deletes):
+        return self.store.write(updates, deletes)
+
+    def find_unverified(self, limit):
+        return self.store.find_unverified(limit)
+
+    def settle_unverified(self, note_ids, task_missing=False):
+        return self.store.settle_unverified(note_ids, task_missing=task_missing)
+
+    def bump_markers(self, task_ids):
+        return self.store.bump_markers(task_ids)
+
+    def marker(self, name):
+        return self.store.marker(name)
+
+    def ensure_text_index(self, name, weights, language):
+        return self.store.ensure_text_index(name, weights, language)
+
+
+def _overlaid(results, view, id_key, render, limit=None):
+    """
+    Itera `results` trocando as notas com escrita pendente pela versão em memória (ou omitindo),
+    até `limit` itens.
+    """
+    count = 0
+    try:
+        for item in results:
+            note_id = item.get(id_key)
+            if note_id not in view:
+                yield item
+            elif view[note_id] is not None:
+                yield render(view[note_id], item)
+            else:
+                continue
+            count += 1
+            if count == limit:
+                break
+    finally:
+        close = getattr(results, "close", None)  # cursores do Mongo
+        if close is not None:
+            close()